@@ -1,24 +1,52 @@
 # attendance_mcp_server.py
 import os
 import sys
+import sqlite3
 import logging
 from mcp.server.fastmcp import FastMCP
-from recog_utils import mark_attendance_from_image_path
+
+# Shared instrumentation lives at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from instrumentation import METRICS
+from recog_utils import mark_attendance_from_image_path, sync_attendance_to_lms
 
 # IMPORTANT: MCP servers must not print to STDOUT.
 logging.basicConfig(stream=sys.stderr, level=logging.INFO)
 logging.info("Attendance MCP server started")
 
 mcp = FastMCP("attendance-mcp")
+METRICS.service = "attendance"
+METRICS.ratio("faces_per_image", "faces", "images")
 
 @mcp.tool()
-def mark_attendance(image_path: str, write_csv: bool = True) -> dict:
+def mark_attendance(image_path: str, write_csv: bool = True, sync_lms: bool = False) -> dict:
     """
     Identify faces in a single image and (optionally) append to today's CSV.
+    With sync_lms the people marked are also written to the LMS database.
+    """
+    logging.info(f"mark_attendance called with image_path={image_path}, write_csv={write_csv}, sync_lms={sync_lms}")
+    try:
+        return mark_attendance_from_image_path(image_path, write_csv=write_csv, sync_lms=sync_lms)
+    except sqlite3.Error as e:
+        return {"ok": False, "error": f"❌ LMS sync failed: {e}"}
+
+@mcp.tool()
+def sync_attendance(csv_path: str = "") -> dict:
+    """
+    Write a day's attendance ledger (today's by default) into the LMS database
+    in a single transaction. Already-synced rows are skipped.
+    """
+    try:
+        return sync_attendance_to_lms(csv_path or None)
+    except sqlite3.Error as e:
+        return {"ok": False, "error": f"❌ LMS sync failed: {e}"}
+
+@mcp.tool()
+def metrics() -> dict:
+    """
+    Per-stage latency (detect_embed, classify, ledger, lms_sync) and counters.
     """
-    logging.info(f"mark_attendance called with image_path={image_path}, write_csv={write_csv}")
-    result = mark_attendance_from_image_path(image_path, write_csv=write_csv)
-    return result
+    return METRICS.snapshot()
 
 if __name__ == "__main__":
     # Run over stdio so Claude Desktop can talk to it
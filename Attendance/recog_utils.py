@@ -1,5 +1,6 @@
 # recog_utils.py
 import os
+import sys
 import cv2
 import pickle
 import numpy as np
@@ -7,11 +8,25 @@ import pandas as pd
 from datetime import date, datetime
 from deepface import DeepFace
 
+# Shared instrumentation lives at the repository root; the LMS sync reuses
+# the sqlite-mcp connection pool
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+sys.path.insert(0, os.path.join(REPO_ROOT, "sqlite-mcp"))
+from instrumentation import METRICS
+from sqlite_pool import SQLitePool
+
 # -------- Paths (edit if you keep models elsewhere) ----------
 ROOT = os.path.dirname(os.path.abspath(__file__))
 ATT_DIR = os.path.join(ROOT, "Attendance")
 KNN_PATH = os.path.join(ROOT, "knn_model.clf")
 
+# -------- LMS database the ledger is synced into ----------
+# Must name an existing database: a wrong path would otherwise create an
+# empty one wherever the server happens to run
+LMS_DB = os.getenv("ATTENDANCE_LMS_DB") or os.getenv("SQLITE_MCP_DB")
+LMS_TABLE = os.getenv("ATTENDANCE_LMS_TABLE", "attendance_log")
+
 os.makedirs(ATT_DIR, exist_ok=True)
 
 # Load KNN model
@@ -34,14 +49,71 @@ def _append_attendance_csv(name: str) -> None:
         with open(csv_path, "a", encoding="utf-8") as f:
             f.write(f"{name},{datetime.now().strftime('%H:%M:%S')}\n")
 
+# -------- LMS sync ----------
+_lms_pool = None
+
+def _lms() -> SQLitePool:
+    global _lms_pool
+    if _lms_pool is None:
+        _lms_pool = SQLitePool(LMS_DB)
+    return _lms_pool
+
+def _csv_date(csv_path: str):
+    # Attendance-MM_DD_YY.csv -> YYYY-MM-DD; None for any other file name
+    name = os.path.basename(csv_path)
+    if not (name.startswith("Attendance-") and name.endswith(".csv")):
+        return None
+    try:
+        return datetime.strptime(name[len("Attendance-"):-len(".csv")], "%m_%d_%y").date().isoformat()
+    except ValueError:
+        return None
+
+def sync_attendance_to_lms(csv_path: str = None, names=None) -> dict:
+    """
+    Copy a day's ledger (today's by default) into the LMS database in one
+    transaction. Rows already synced are skipped; names limits the sync to
+    those people.
+    """
+    if not LMS_DB:
+        return {"ok": False, "error": "Set ATTENDANCE_LMS_DB (or SQLITE_MCP_DB) to the LMS database path"}
+    if not os.path.isfile(LMS_DB):
+        return {"ok": False, "error": f"LMS database not found: {os.path.abspath(LMS_DB)}"}
+    csv_path = csv_path or _today_csv_path()
+    if not os.path.exists(csv_path):
+        return {"ok": False, "error": f"Ledger not found: {csv_path}"}
+    day = _csv_date(csv_path)
+    if day is None:
+        return {"ok": False, "error": f"Ledger name must be Attendance-MM_DD_YY.csv: {os.path.basename(csv_path)}"}
+    df = pd.read_csv(csv_path)
+    if not {"Name", "Time"} <= set(df.columns):
+        return {"ok": False, "error": f"Ledger needs Name and Time columns: {csv_path}"}
+    if names is not None:
+        df = df[df["Name"].isin(list(names))]
+    rows = [[str(name), day, str(time)] for name, time in zip(df["Name"], df["Time"])]
+
+    statements = [{"sql": f"CREATE TABLE IF NOT EXISTS {LMS_TABLE} ("
+                          "name TEXT NOT NULL, date TEXT NOT NULL, time TEXT, "
+                          "PRIMARY KEY (name, date))"}]
+    statements += [{"sql": f"INSERT OR IGNORE INTO {LMS_TABLE} (name, date, time) VALUES (?, ?, ?)",
+                    "params": row} for row in rows]
+    with METRICS.span("lms_sync"):
+        batch = _lms().execute_batch(statements)
+    METRICS.incr("lms_rows", batch["changes"])
+    return {"ok": True, "db": _lms().path, "table": LMS_TABLE, "date": day,
+            "rows": len(rows), "inserted": batch["changes"]}
+
 def detect_and_embed_faces(image_bgr):
+    # One represent() call, as encode_faces.py used to build knn_model.clf:
+    # detection and embedding are timed together so the embeddings stay
+    # exactly what the classifier was trained on
     rgb = cv2.cvtColor(image_bgr, cv2.COLOR_BGR2RGB)
-    reps = DeepFace.represent(
-        img_path=rgb,
-        model_name="Facenet",
-        enforce_detection=False,
-        detector_backend="opencv"
-    )
+    with METRICS.span("detect_embed"):
+        reps = DeepFace.represent(
+            img_path=rgb,
+            model_name="Facenet",
+            enforce_detection=False,
+            detector_backend="opencv"
+        )
     faces = []
     if isinstance(reps, list):
         for r in reps:
@@ -50,9 +122,10 @@ def detect_and_embed_faces(image_bgr):
             box = (int(fa.get("x", 0)), int(fa.get("y", 0)),
                    int(fa.get("w", 0)), int(fa.get("h", 0)))
             faces.append({"embedding": emb, "box": box})
+    METRICS.incr("faces", len(faces))
     return faces
 
-def mark_attendance_from_image_path(image_path: str, write_csv: bool = True):
+def mark_attendance_from_image_path(image_path: str, write_csv: bool = True, sync_lms: bool = False):
     if not os.path.exists(image_path):
         return {"ok": False, "error": f"Image not found: {image_path}"}
 
@@ -60,20 +133,24 @@ def mark_attendance_from_image_path(image_path: str, write_csv: bool = True):
     if img is None:
         return {"ok": False, "error": f"Failed to read image: {image_path}"}
 
+    METRICS.incr("images")
     faces = detect_and_embed_faces(img)
     results = []
     unique_marked = set()
 
     for f in faces:
         embedding = f["embedding"].reshape(1, -1)
-        name = KNN.predict(embedding)[0]  # no unknown logic
+        with METRICS.span("classify"):
+            name = KNN.predict(embedding)[0]  # no unknown logic
         results.append({
             "label": name,
             "box": {"x": f["box"][0], "y": f["box"][1], "w": f["box"][2], "h": f["box"][3]}
         })
 
         if write_csv and name not in unique_marked:
-            _append_attendance_csv(name)
+            with METRICS.span("ledger"):
+                _append_attendance_csv(name)
+            METRICS.incr("ledger_writes")
             unique_marked.add(name)
 
     out = {
@@ -82,4 +159,6 @@ def mark_attendance_from_image_path(image_path: str, write_csv: bool = True):
         "recognized": results,
         "csv_path": _today_csv_path() if write_csv else None
     }
+    if write_csv and sync_lms and unique_marked:
+        out["lms"] = sync_attendance_to_lms(out["csv_path"], unique_marked)
     return out
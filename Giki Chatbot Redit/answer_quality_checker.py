@@ -6,17 +6,13 @@ Uses scoring and semantic analysis to determine if an answer is sufficient
 
 import re
 from typing import Dict, List, Tuple
-from langchain_openai import ChatOpenAI
-import os
 
 class AnswerQualityChecker:
-    def __init__(self):
-        self.llm = ChatOpenAI(
-            model="deepseek/deepseek-r1-0528-qwen3-8b:free",
-            base_url="https://openrouter.ai/api/v1",
-            api_key=os.getenv("OPENAI_API_KEY"),
-            temperature=0.1
-        )
+    def __init__(self, llm=None):
+        if llm is None:
+            from llm_gateway import get_gateway
+            llm = get_gateway().chat(0.1, "quality_check")
+        self.llm = llm
         
         # Quality indicators
         self.positive_indicators = [
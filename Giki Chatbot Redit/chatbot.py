@@ -1,73 +1,136 @@
 import os
+import sys
+import time
+import shutil
+import asyncio
+import threading
 import pdfplumber
 import docx
 import re
 import json
 from pathlib import Path
-from typing import List
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
 import numpy as np
-import praw
 
 from langchain.docstore.document import Document
-from langchain_community.vectorstores import FAISS
-from langchain_community.embeddings import HuggingFaceEmbeddings
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain.chains import RetrievalQA
+from langchain.retrievers import ContextualCompressionRetriever
+from langchain_core.retrievers import BaseRetriever
 from langchain.prompts import PromptTemplate
-from langchain_openai import ChatOpenAI
-
-# keyword extraction
-from keybert import KeyBERT
 
 # Import our intelligent quality checker
 from answer_quality_checker import AnswerQualityChecker
+from reddit_index import RedditIndex, REDDIT_DUMP_PATH, comment_threads, post_url
+from hybrid_retriever import BM25Index, CrossEncoderReranker, HybridRetriever
+from embedding_service import EmbeddingService
+from llm_gateway import LLM_BASE_URL, get_gateway
+from context_compressor import ContextCompressor
+from vector_index import build_vectorstore, index_exists, load_vectorstore, publish_index, staging_dir
+from collection_manager import Collection, CollectionManager, EmptyCollectionError
+
+# Shared instrumentation lives at the repository root
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from instrumentation import METRICS
 
 INDEX_PATH = "faiss_index"
+# flat, hnsw, sq8 (int8 scalar quantization) or ivfpq; see vector_index.py
+INDEX_TYPE = os.getenv("GIKI_INDEX_TYPE", "flat")
+
+# "hybrid" fuses BM25 with FAISS, "similarity" is vector search only.
+# Setting GIKI_RERANKER to a cross-encoder model name enables reranking
+# within a per-query latency budget.
+RETRIEVER_MODE = os.getenv("GIKI_RETRIEVER", "hybrid")
+RERANKER_MODEL = os.getenv("GIKI_RERANKER", "")
+RERANK_BUDGET_MS = int(os.getenv("GIKI_RERANK_BUDGET_MS", "150"))
+
+# Approximate token budgets for the document and Reddit prompt contexts.
+# Retrieved chunks are merged, deduplicated and cut down to the sentences
+# closest to the question; 0 stuffs them verbatim as before.
+CONTEXT_TOKEN_BUDGET = int(os.getenv("GIKI_CONTEXT_TOKEN_BUDGET", "600"))
+REDDIT_CONTEXT_TOKEN_BUDGET = int(os.getenv("GIKI_REDDIT_CONTEXT_TOKEN_BUDGET", "400"))
+
+# Relevance score (0-1) of the best retrieved chunk below which the Reddit
+# fallback is started speculatively, in parallel with answer generation.
+LOW_RETRIEVAL_SCORE = 0.35
+
+# Start of the prompt's "not found" reply (see prompt_template)
+NOT_FOUND_MARKER = "i don't have that information"
+
+# Local Reddit index matches scoring below this fall through to the live API,
+# which can be switched off entirely for offline use.
+REDDIT_INDEX_MIN_SCORE = 0.3
+REDDIT_LIVE_FALLBACK = os.getenv("GIKI_REDDIT_LIVE_FALLBACK", "1") == "1"
+
+REDDIT_ANSWER_PREFIX = "⚠️ Not found in official documents. Based on Reddit discussions:\n\n"
 
 # -----------------------------
 # OpenRouter API Setup
 # -----------------------------
 os.environ["OPENROUTER_API_KEY"] = os.getenv("OPENROUTER_API_KEY")
 os.environ["OPENAI_API_KEY"] = os.environ["OPENROUTER_API_KEY"]
-os.environ["OPENAI_API_BASE"] = "https://openrouter.ai/api/v1"
+os.environ["OPENAI_API_BASE"] = LLM_BASE_URL
 os.environ["OPENAI_API_HEADERS"] = '{"HTTP-Referer":"https://huggingface.co", "X-Title":"GIKI-RAG-bot"}'
 
 # -----------------------------
 # Reddit Setup (OAuth)
 # -----------------------------
-reddit = praw.Reddit(
-    client_id=os.getenv("REDDIT_CLIENT_ID"),
-    client_secret=os.getenv("REDDIT_CLIENT_SECRET"),
-    refresh_token=os.getenv("REDDIT_REFRESH_TOKEN"),
-    user_agent=os.getenv("REDDIT_USER_AGENT")
-)
+_reddit = None
+
+
+def get_reddit():
+    """PRAW client, created on first use so importing this module stays cheap"""
+    global _reddit
+    if _reddit is None:
+        import praw
+        _reddit = praw.Reddit(
+            client_id=os.getenv("REDDIT_CLIENT_ID"),
+            client_secret=os.getenv("REDDIT_CLIENT_SECRET"),
+            refresh_token=os.getenv("REDDIT_REFRESH_TOKEN"),
+            user_agent=os.getenv("REDDIT_USER_AGENT")
+        )
+    return _reddit
 
 # -----------------------------
-# Keyword Extractor
+# Embedding Service + Keyword Extractor
 # -----------------------------
-kw_model = KeyBERT("all-MiniLM-L6-v2")
+_embeddings_lock = threading.Lock()
+_embeddings = None
+
+
+def get_embeddings() -> EmbeddingService:
+    """One MiniLM instance per process, shared by the vector store, KeyBERT and the Reddit search"""
+    global _embeddings
+    with _embeddings_lock:
+        if _embeddings is None:
+            _embeddings = EmbeddingService().load()
+    return _embeddings
+
 
 def extract_keywords(query: str, top_k=3):
-    keywords = kw_model.extract_keywords(query, keyphrase_ngram_range=(1,2), stop_words='english', top_n=top_k)
-    return [kw for kw, score in keywords]
+    return get_embeddings().extract_keywords(query, top_k=top_k)
+
 
+def _cancelled(cancel: Optional[threading.Event]) -> bool:
+    return cancel is not None and cancel.is_set()
 
-def search_reddit_semantic(query: str, subreddit="giki", top_n=5, embeddings_model=None):
+
+def search_reddit_live(query: str, subreddit="giki", top_n=5, embeddings_model=None, cancel=None):
     """
     Fetch latest posts from r/giki and return top_n most semantically similar ones.
-    Uses keyword extraction for better search.
+    Uses keyword extraction for better search. Setting the cancel event stops
+    the search between API calls (it then returns []).
     """
     # Step 1: Extract clean keywords/phrases
     keyphrases = extract_keywords(query, top_k=3)
     search_terms = keyphrases if keyphrases else [query]
 
-    print(keyphrases)
-
-
     posts = []
     try:
         for term in search_terms:
-            for submission in reddit.subreddit(subreddit).search(term, limit=20):
+            if _cancelled(cancel):
+                return []
+            for submission in get_reddit().subreddit(subreddit).search(term, limit=20):
                 posts.append({
                     "title": submission.title,
                     "selftext": submission.selftext,
@@ -76,107 +139,252 @@ def search_reddit_semantic(query: str, subreddit="giki", top_n=5, embeddings_mod
     except Exception:
         return []
 
-    if not posts or embeddings_model is None:
+    if not posts or embeddings_model is None or _cancelled(cancel):
         return []
 
     # Combine title + body
     post_texts = [f"{p['title']}\n{p['selftext']}" for p in posts]
 
     # Compute embeddings
-    post_embeddings = embeddings_model.embed_documents(post_texts)
-    query_embedding = embeddings_model.embed_query(query)
+    post_embeddings = np.asarray(embeddings_model.embed_documents(post_texts))
+    query_embedding = np.asarray(embeddings_model.embed_query(query))  # cached since retrieval
 
     # Cosine similarity
-    similarities = [
-        np.dot(query_embedding, p_emb) / (np.linalg.norm(query_embedding) * np.linalg.norm(p_emb))
-        for p_emb in post_embeddings
-    ]
+    similarities = post_embeddings @ query_embedding / (
+        np.linalg.norm(post_embeddings, axis=1) * np.linalg.norm(query_embedding) + 1e-12
+    )
 
     # Top N results
     top_indices = np.argsort(similarities)[::-1][:top_n]
     return [posts[i] for i in top_indices]
 
 
+def search_reddit_semantic(query: str, subreddit="giki", top_n=5, embeddings_model=None, reddit_index=None,
+                           cancel=None):
+    """
+    Return the top_n r/giki posts most semantically similar to the query.
+    Searches the local Reddit index first; the live API is only used as a
+    last resort when the index has no good match (see REDDIT_LIVE_FALLBACK).
+    A speculative caller sets the cancel event once the result isn't needed.
+    """
+    if reddit_index is not None and len(reddit_index):
+        posts = reddit_index.search(query, top_n=top_n)
+        if posts and posts[0]["score"] >= REDDIT_INDEX_MIN_SCORE:
+            return posts
+
+    if not REDDIT_LIVE_FALLBACK or _cancelled(cancel):
+        return []
+    return search_reddit_live(query, subreddit=subreddit, top_n=top_n, embeddings_model=embeddings_model,
+                              cancel=cancel)
+
+
 # -----------------------------
 # Document Processor
 # -----------------------------
 class GIKIDocumentProcessor:
-    def __init__(self, data_folder="data"):
+    """
+    Splits documents along their structure: PDFs by page and heading, Word
+    files by heading style, Reddit dumps by post and comment thread. Chunks
+    never cross a page or post, and carry page/heading/post_id metadata.
+    """
+
+    # Lines this much larger than the body font are treated as headings
+    HEADING_SIZE_RATIO = 1.15
+    BULLET_GLYPHS = "▪●•"
+
+    def __init__(self, data_folder="data", chunk_size=800, chunk_overlap=80):
         self.data_folder = data_folder
+        self.chunk_size = chunk_size
         self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=500,
-            chunk_overlap=50,
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap,
             length_function=len,
             separators=["\n\n", "\n", ".", "!", "?", ",", " ", ""]
         )
 
-    def extract_text_from_pdf(self, file_path: str) -> str:
+    # -----------------------------
+    # Sections
+    # -----------------------------
+    # A section is {"text", "metadata", "prefix"}: prefix (a heading or post
+    # title) is repeated at the top of every chunk the section ends up in.
+    @staticmethod
+    def _section(text: str, prefix: str = "", **metadata) -> Dict:
+        return {"text": text.strip(), "prefix": prefix,
+                "metadata": {k: v for k, v in metadata.items() if v is not None}}
+
+    def _join_lines(self, lines: List[str]) -> str:
+        """Rejoin wrapped PDF lines; bullets and sentence ends start a new line"""
         text = ""
+        for line in lines:
+            line = re.sub(r'\s+', ' ', line).strip()
+            if not line:
+                continue
+            if line[0] in self.BULLET_GLYPHS:
+                line = "• " + line[1:].strip()
+            if not text:
+                text = line
+            elif line.startswith("• ") or text[-1] in ".:?!":
+                text += "\n" + line
+            else:
+                text += " " + line
+        return text
+
+    @staticmethod
+    def _repeated_lines(pages: List[List[Dict]]) -> set:
+        """Running headers/footers: lines found on at least half of the pages"""
+        if len(pages) < 4:
+            return set()
+        counts = Counter()
+        for lines in pages:
+            counts.update({line["text"].strip() for line in lines})
+        return {text for text, n in counts.items() if n >= len(pages) / 2}
+
+    def extract_sections_from_pdf(self, file_path: str) -> List[Dict]:
         try:
             with pdfplumber.open(file_path) as pdf:
-                for page_num, page in enumerate(pdf.pages):
-                    page_text = page.extract_text()
-                    if page_text:
-                        page_text = re.sub(r'\s+', ' ', page_text)
-                        text += f"\n[Page {page_num + 1}]\n{page_text}\n"
+                pages = [page.extract_text_lines() for page in pdf.pages]
         except Exception:
-            pass
-        return text
-
-    def extract_text_from_docx(self, file_path: str) -> str:
-        text = ""
+            return []
+
+        boilerplate = self._repeated_lines(pages)
+        line_size = lambda line: max((c.get("size", 0) for c in line.get("chars", [])), default=0)
+        sizes = sorted(line_size(line) for lines in pages for line in lines)
+        body_size = sizes[len(sizes) // 2] if sizes else 0
+
+        sections, heading, heading_size = [], None, 0
+
+        def flush(body, page_num):
+            # A heading with nothing under it yet carries over to the next section
+            if body and not (len(body) == 1 and body[0] is heading):
+                sections.append(self._section(self._join_lines(body), heading or "",
+                                              page=page_num, heading=heading))
+
+        for page_num, lines in enumerate(pages, start=1):
+            body = []
+            for line in lines:
+                text = line["text"].strip()
+                if not text or text in boilerplate:
+                    continue
+                size = line_size(line)
+                if not (body_size and size >= body_size * self.HEADING_SIZE_RATIO
+                        and len(text) <= 120 and re.search(r'[A-Za-z]', text)):
+                    body.append(text)
+                elif (body and body[-1] is heading and abs(size - heading_size) < 0.5
+                      and len(heading) + len(text) < 120):
+                    # Wrapped heading: same font size on the next line
+                    heading = f"{heading} {text}"
+                    body[-1] = heading
+                else:
+                    # A heading-only body (e.g. the document title) is kept as text
+                    carried = body if len(body) == 1 and body[0] is heading else []
+                    flush(body, page_num)
+                    heading, heading_size = text, size
+                    body = carried + [heading]
+            flush(body, page_num)
+        return sections
+
+    def extract_sections_from_docx(self, file_path: str) -> List[Dict]:
         try:
             doc = docx.Document(file_path)
-            for paragraph in doc.paragraphs:
-                if paragraph.text.strip():
-                    text += paragraph.text + "\n"
         except Exception:
-            pass
-        return text
+            return []
+
+        sections, heading, body = [], None, []
+        for paragraph in doc.paragraphs:
+            text = paragraph.text.strip()
+            if not text:
+                continue
+            style = paragraph.style.name if paragraph.style is not None else ""
+            if style.startswith("Heading") or style == "Title":
+                if body:
+                    sections.append(self._section("\n".join(body), heading or "", heading=heading))
+                heading, body = text, [text]
+            else:
+                body.append(text)
+        if body:
+            sections.append(self._section("\n".join(body), heading or "", heading=heading))
+        return sections
 
-    def extract_text_from_txt(self, file_path: str) -> str:
+    def extract_sections_from_txt(self, file_path: str) -> List[Dict]:
         try:
             with open(file_path, 'r', encoding='utf-8') as file:
-                return file.read()
+                text = file.read()
         except Exception:
-            return ""
+            return []
+        return [self._section(text)] if text.strip() else []
 
-    def extract_text_from_json(self, file_path: str) -> str:
-        """Extract text from JSON files containing Reddit posts"""
+    def extract_sections_from_json(self, file_path: str) -> List[Dict]:
+        """One section per Reddit post body and one per comment thread"""
         try:
             with open(file_path, 'r', encoding='utf-8') as file:
                 data = json.load(file)
-            
-            text = ""
-            if isinstance(data, list):
-                for i, post in enumerate(data):
-                    if isinstance(post, dict):
-                        # Extract title and selftext
-                        title = post.get('title', '')
-                        selftext = post.get('selftext', '')
-                        author = post.get('author', '')
-                        post_id = post.get('id', '')
-                        
-                        # Combine post content
-                        post_content = f"Title: {title}\nContent: {selftext}"
-                        
-                        # Add comments if available
-                        comments = post.get('comments', [])
-                        if comments:
-                            post_content += "\nComments:\n"
-                            for comment in comments:
-                                if isinstance(comment, dict):
-                                    comment_body = comment.get('body', '')
-                                    comment_author = comment.get('author', '')
-                                    if comment_body:
-                                        post_content += f"- {comment_author}: {comment_body}\n"
-                        
-                        text += f"\n[Reddit Post {i+1} - ID: {post_id}]\n{post_content}\n"
-            
-            return text
-        except Exception as e:
-            # print(f"Error processing JSON file {file_path}: {str(e)}")
-            return ""
+        except Exception:
+            return []
+
+        sections = []
+        for post in data if isinstance(data, list) else []:
+            if not isinstance(post, dict):
+                continue
+            post_id = post.get('id', '')
+            title = post.get('title', '')
+            prefix = f"Title: {title}"
+            metadata = {"post_id": post_id, "heading": title,
+                        "url": post.get('url') or post_url(post_id)}
+
+            sections.append(self._section(f"Content: {post.get('selftext', '')}", prefix, **metadata))
+            for n, thread in enumerate(comment_threads(post.get('comments', []))):
+                # Replies are indented under the comment that starts the thread
+                replies = "\n".join(
+                    f"{'  ' if i else ''}- {c.get('author', '')}: {c['body']}" for i, c in enumerate(thread)
+                )
+                sections.append(self._section(f"Comments:\n{replies}" if n == 0 else replies,
+                                              prefix, **metadata))
+        return sections
+
+    # -----------------------------
+    # Chunking
+    # -----------------------------
+    def chunk_sections(self, sections: List[Dict]) -> List[Tuple[str, Dict]]:
+        """
+        Pack consecutive sections of the same page/post into chunks of up to
+        chunk_size; only a section that is too long on its own gets split.
+        """
+        chunks = []
+        current, current_meta, current_key = "", None, None
+
+        def flush():
+            if current.strip():
+                chunks.append((current, current_meta))
+
+        for section in sections:
+            meta = section["metadata"]
+            key = (meta.get("page"), meta.get("post_id"))
+            prefix = section["prefix"]
+            text = section["text"]
+            # PDF/Word sections already open with their heading
+            head = "" if not prefix or prefix in text[:len(prefix) + 200] else prefix + "\n"
+
+            if current and key == current_key and len(current) + len(text) + 2 <= self.chunk_size:
+                current += "\n\n" + text
+                continue
+
+            flush()
+            current_key = key
+            if len(head) + len(text) <= self.chunk_size:
+                current, current_meta = head + text, meta
+                continue
+
+            pieces = self.text_splitter.split_text(text)
+            for piece in pieces[:-1]:
+                # Continuation pieces get the heading/title back for context
+                if prefix and not piece.startswith(prefix):
+                    piece = f"{prefix}\n{piece}"
+                chunks.append((piece, meta))
+            last = pieces[-1] if pieces else ""
+            current = last if not prefix or last.startswith(prefix) else f"{prefix}\n{last}"
+            current_meta = meta
+        flush()
+        return chunks
 
     def load_documents(self) -> List[Document]:
         documents = []
@@ -185,36 +393,31 @@ class GIKIDocumentProcessor:
         if not data_path.exists():
             return documents
 
-        supported_extensions = {'.pdf', '.docx', '.txt', '.json'}
-
-        for file_path in data_path.iterdir():
-            if file_path.is_file() and file_path.suffix.lower() in supported_extensions:
-                if file_path.suffix.lower() == '.pdf':
-                    text = self.extract_text_from_pdf(str(file_path))
-                elif file_path.suffix.lower() == '.docx':
-                    text = self.extract_text_from_docx(str(file_path))
-                elif file_path.suffix.lower() == '.txt':
-                    text = self.extract_text_from_txt(str(file_path))
-                elif file_path.suffix.lower() == '.json':
-                    text = self.extract_text_from_json(str(file_path))
-                else:
-                    continue
-
-                if text.strip():
-                    chunks = self.text_splitter.split_text(text)
-
-                    for i, chunk in enumerate(chunks):
-                        if chunk.strip():
-                            documents.append(
-                                Document(
-                                    page_content=chunk,
-                                    metadata={
-                                        "source": file_path.name,
-                                        "chunk_id": i,
-                                        "file_type": file_path.suffix.lower()
-                                    }
-                                )
-                            )
+        extractors = {
+            '.pdf': self.extract_sections_from_pdf,
+            '.docx': self.extract_sections_from_docx,
+            '.txt': self.extract_sections_from_txt,
+            '.json': self.extract_sections_from_json,
+        }
+
+        for file_path in sorted(data_path.iterdir()):
+            extract = extractors.get(file_path.suffix.lower())
+            if not file_path.is_file() or extract is None:
+                continue
+
+            chunks = self.chunk_sections(extract(str(file_path)))
+            for i, (chunk, metadata) in enumerate(chunks):
+                documents.append(
+                    Document(
+                        page_content=chunk,
+                        metadata={
+                            "source": file_path.name,
+                            "chunk_id": i,
+                            "file_type": file_path.suffix.lower(),
+                            **metadata
+                        }
+                    )
+                )
         return documents
 
 
@@ -223,16 +426,38 @@ class GIKIDocumentProcessor:
 # -----------------------------
 class GIKIbot:
     def __init__(self):
-        self.qa_chain = None
+        self.llm = None
         self.vectorstore = None
+        self.retriever = None
+        self.reddit_index = None
         self.processor = GIKIDocumentProcessor()
-        self.quality_checker = AnswerQualityChecker()
-
-        self.embeddings = HuggingFaceEmbeddings(
-            model_name="sentence-transformers/all-MiniLM-L6-v2",
-            model_kwargs={'device': 'cpu'},
-            encode_kwargs={'normalize_embeddings': True}
+        self.reranker = None
+        # Named document collections sharing this bot's models; the
+        # attributes above mirror the default one
+        self.collections = CollectionManager(
+            self._load_collection, default_data=self.processor.data_folder, default_index=INDEX_PATH
         )
+        # Milliseconds spent in each startup phase, reported by the health tool
+        self.startup_timings = {}
+
+        # Shared connection pool and metrics for every LLM call
+        self.gateway = get_gateway()
+
+        started = time.perf_counter()
+        self.quality_checker = AnswerQualityChecker(self.gateway.chat(0.1, "quality_check"))
+        self._record_phase("quality_checker", started)
+
+        started = time.perf_counter()
+        self.embeddings = get_embeddings()
+        self._record_phase("embedding_model", started)
+
+        METRICS.gauge("query_embedding_cache_hits", lambda: self.embeddings.cache_hits)
+        METRICS.gauge("query_embedding_cache_misses", lambda: self.embeddings.cache_misses)
+        METRICS.gauge("query_embedding_lookups", lambda: self.embeddings.cache_hits + self.embeddings.cache_misses)
+        METRICS.ratio("query_embedding_cache_hit_rate", "query_embedding_cache_hits", "query_embedding_lookups")
+        METRICS.ratio("fallback_rate", "reddit_fallbacks", "questions")
+        METRICS.ratio("declined_rate", "declined_answers", "questions")
+        METRICS.ratio("speculative_reddit_wasted_rate", "speculative_reddit_cancelled", "speculative_reddit_started")
 
         self.prompt_template = """You are a helpful assistant for GIKI (Ghulam Ishaq Khan Institute of Engineering Sciences and Technology).
 Answer questions based on official GIKI documents: prospectus, fee structure, academic rules, and handbook.
@@ -255,121 +480,343 @@ Answer:"""
             input_variables=["context", "question"]
         )
 
-    def initialize_system(self):
-        try:
-            if os.path.exists(INDEX_PATH):
-                self.vectorstore = FAISS.load_local(
-                    INDEX_PATH,
-                    self.embeddings,
-                    allow_dangerous_deserialization=True
-                )
-            else:
-                documents = self.processor.load_documents()
-                if not documents:
-                    return "❌ No documents found. Add files to the 'data' folder."
+    def _build_retriever(self, vectorstore, index_path: str) -> BaseRetriever:
+        bm25 = None
+        if RETRIEVER_MODE == "hybrid":
+            bm25 = BM25Index.load(index_path)
+            if bm25 is None:
+                # Index saved before BM25 existed
+                bm25 = BM25Index.from_vectorstore(vectorstore)
+                bm25.save(index_path)
+
+        retriever = HybridRetriever(vectorstore=vectorstore, bm25=bm25, reranker=self.reranker, k=5)
+        if CONTEXT_TOKEN_BUDGET <= 0:
+            return retriever
+        return ContextualCompressionRetriever(
+            base_compressor=ContextCompressor(embeddings=self.embeddings, token_budget=CONTEXT_TOKEN_BUDGET),
+            base_retriever=retriever
+        )
 
-                self.vectorstore = FAISS.from_documents(documents, self.embeddings)
-                self.vectorstore.save_local(INDEX_PATH)
+    def _build_index(self, collection: Collection, progress=None):
+        """
+        Build a collection's index into a staging directory and atomically
+        publish it; a failed build leaves the current index untouched.
+        progress(phase, done, total) reports how far along the build is.
+        """
+        progress = progress or (lambda phase, done=0, total=0: None)
+        staging = staging_dir(collection.index_path)
+        try:
+            progress("load_documents", 0, 0)
+            documents = GIKIDocumentProcessor(collection.data_folder).load_documents()
+            if not documents:
+                raise EmptyCollectionError(f"No documents found in {collection.data_folder}")
+
+            vectorstore = build_vectorstore(documents, self.embeddings, staging, INDEX_TYPE,
+                                            metadata={"collection": collection.name}, progress=progress)
+            # Keyword index over the same chunks, built alongside FAISS
+            progress("bm25", 0, 0)
+            BM25Index.from_vectorstore(vectorstore).save(staging)
+            vectorstore.docstore.close()
+
+            progress("swap", 0, 0)
+            publish_index(staging, collection.index_path)
+        finally:
+            if os.path.exists(staging):
+                shutil.rmtree(staging, ignore_errors=True)
+
+    def _load_collection(self, collection: Collection):
+        """Load a collection's index, building it from its data folder if missing"""
+        started = time.perf_counter()
+        if not index_exists(collection.index_path):
+            self._build_index(collection)
+        vectorstore = load_vectorstore(collection.index_path, self.embeddings)
+        collection.timings["vector_index"] = round((time.perf_counter() - started) * 1000, 1)
+
+        started = time.perf_counter()
+        retriever = self._build_retriever(vectorstore, collection.index_path)
+        collection.timings["retriever"] = round((time.perf_counter() - started) * 1000, 1)
+
+        collection.vectorstore = vectorstore
+        collection.retriever = retriever
+
+    def _use_default(self, collection: Collection):
+        self.vectorstore = collection.vectorstore
+        self.retriever = collection.retriever
+
+    @property
+    def ready(self) -> bool:
+        """True once initialize_system() has the LLM and the default collection's retriever"""
+        return self.llm is not None and self.retriever is not None
+
+    def ensure_index(self, name=None) -> bool:
+        """Build a collection's index if it is missing; True if one was built"""
+        collection = self.collections.describe(name)
+        if index_exists(collection.index_path):
+            return False
+        self._build_index(collection)
+        return True
+
+    def rebuild_collection_index(self, name=None, progress=None) -> Collection:
+        """
+        Rebuild one collection's index from its files and switch to it.
+        Queries keep using the current index until the new one is loaded;
+        other collections are untouched.
+        """
+        target = self.collections.describe(name)
+        fresh = Collection(target.name, target.data_folder, target.index_path)
+        self._build_index(fresh, progress)
+        if progress:
+            progress("load", 0, 0)
+        self._load_collection(fresh)
+        self.collections.put(fresh)
+        if fresh.name == self.collections.default.name:
+            self._use_default(fresh)
+        return fresh
+
+    def _record_phase(self, phase: str, started: float):
+        self.startup_timings[phase] = round((time.perf_counter() - started) * 1000, 1)
 
+    def initialize_system(self):
+        try:
             # Initialize LLM
-            llm = ChatOpenAI(
-                model="deepseek/deepseek-r1-0528-qwen3-8b:free",
-                base_url="https://openrouter.ai/api/v1",
-                api_key=os.getenv("OPENAI_API_KEY"),
-                default_headers={
-                    "HTTP-Referer": "https://huggingface.co",
-                    "X-Title": "GIKI-RAG-bot"
-                },
-                temperature=0.1
-            )
-
-            self.qa_chain = RetrievalQA.from_chain_type(
-                llm=llm,
-                chain_type="stuff",
-                retriever=self.vectorstore.as_retriever(
-                    search_type="similarity",
-                    search_kwargs={"k": 5}
-                ),
-                return_source_documents=True,
-                chain_type_kwargs={"prompt": self.custom_prompt}
-            )
+            started = time.perf_counter()
+            self.llm = self.gateway.chat(0.1, "answer")
+            if RERANKER_MODEL:
+                try:
+                    self.reranker = CrossEncoderReranker(RERANKER_MODEL, budget_ms=RERANK_BUDGET_MS)
+                except Exception:
+                    self.reranker = None  # sentence-transformers missing or model unavailable
+            self._record_phase("llm", started)
+
+            # Default collection: data/ and faiss_index/
+            default = self.collections.get()
+            self.startup_timings.update(default.timings)
+            self._use_default(default)
+
+            # Local Reddit index used by the fallback path
+            started = time.perf_counter()
+            self.reddit_index = RedditIndex(self.embeddings)
+            if not self.reddit_index.load() and os.path.exists(REDDIT_DUMP_PATH):
+                self.reddit_index.build_from_dump(REDDIT_DUMP_PATH)
+            self._record_phase("reddit_index", started)
 
             return "✅ System ready! Ask questions now."
+        except EmptyCollectionError:
+            return "❌ No documents found. Add files to the 'data' folder."
         except Exception as e:
             return f"❌ Error initializing system: {str(e)}"
-    def ask_question(self, question: str) -> str:
-        if not self.qa_chain:
+
+    def _reddit_llm(self):
+        return self.gateway.chat(0.2, "reddit_answer")
+
+    def _reddit_excerpts(self, question: str, top_posts):
+        """(title, excerpt, url) per post, compressed to the question when enabled"""
+        posts = [p for p in top_posts if p['selftext']]
+        if REDDIT_CONTEXT_TOKEN_BUDGET <= 0:
+            return [(p['title'], f"{p['selftext'][:500]}...", p['url']) for p in posts]
+
+        compressor = ContextCompressor(embeddings=self.embeddings, token_budget=REDDIT_CONTEXT_TOKEN_BUDGET)
+        docs = compressor.compress_text(
+            question,
+            [p['selftext'] for p in posts],
+            [{"source": p['url'], "title": p['title']} for p in posts]
+        )
+        return [(d.metadata['title'], d.page_content, d.metadata['source']) for d in docs]
+
+    @staticmethod
+    def _reddit_prompt(question: str, excerpts) -> str:
+        """Prompt over _reddit_excerpts(); the same excerpts give the answer's sources"""
+        reddit_context = "\n\n".join([
+            f"**{title}**\n{excerpt}\n(Source: {url})"
+            for title, excerpt, url in excerpts
+        ])
+        return (
+            f"Answer the following question using the Reddit discussions:\n\n"
+            f"Question: {question}\n\nReddit Posts:\n{reddit_context}\n\nAnswer:"
+        )
+
+    @staticmethod
+    def _format_reddit_answer(reddit_answer: str, excerpts) -> str:
+        # Only posts whose text reached the prompt are cited
+        reddit_sources = dict.fromkeys(f"🌐 r/giki: {title[:60]}..." for title, _, _ in excerpts)
+
+        reddit_source_text = "\n\nReddit Sources:\n" + "\n".join(reddit_sources) if reddit_sources else ""
+        return f"{REDDIT_ANSWER_PREFIX}{reddit_answer}{reddit_source_text}"
+
+    @staticmethod
+    def _document_citations(source_docs) -> List[str]:
+        """One line per source, with the cited pages; Reddit chunks cite their post"""
+        pages = {}
+        for doc in source_docs:
+            if doc.metadata.get("post_id"):
+                pages.setdefault(f"🌐 r/giki: {doc.metadata.get('heading', '')[:60]}... ({doc.metadata.get('url', '')})", set())
+                continue
+            cited = pages.setdefault(f"📄 {doc.metadata['source']}", set())
+            if doc.metadata.get("page"):
+                cited.add(doc.metadata["page"])
+        return [
+            f"{source} (p. {', '.join(str(p) for p in sorted(cited))})" if cited else source
+            for source, cited in pages.items()
+        ]
+
+    @staticmethod
+    def _format_document_answer(answer: str, source_docs, reddit_missed: bool = False) -> str:
+        sources = GIKIbot._document_citations(source_docs)
+        source_text = "\n\nSources:\n" + "\n".join(sources) if sources else ""
+        if reddit_missed:
+            return f"⚠️ {answer}\n\n(No additional information found on Reddit){source_text}"
+        return f"{answer}{source_text}"
+
+    def ask_question(self, question: str, collection=None) -> str:
+        if not self.ready:
             return "⚠️ System not initialized yet."
 
         if not question.strip():
             return "⚠️ Please enter a valid question."
 
+        METRICS.incr("questions")
         try:
-            response = self.qa_chain.invoke({"query": question})
-            answer = response["result"]
-            source_docs = response["source_documents"]
+            target = self.collections.get(collection)
+            with METRICS.span("retrieval"):
+                source_docs = target.retriever.invoke(question)
+
+            prompt = self.custom_prompt.format(
+                context="\n\n".join(doc.page_content for doc in source_docs),
+                question=question
+            )
+            with METRICS.span("llm"):
+                answer = self.llm.invoke(prompt).content
 
             # Use intelligent quality checker to assess answer
-            #print("🔍 Assessing answer quality...")
-            quality_assessment = self.quality_checker.assess_answer_quality(question, answer)
-            
-            # Debug: Print quality assessment details
-          #  print(f"🔍 Overall score: {quality_assessment['overall_score']:.2f}/10")
-          #  print(f"🔍 AI assessment: {quality_assessment['ai_assessment']['ai_sufficient']}")
-          #  print(f"🔍 AI reason: {quality_assessment['ai_assessment']['ai_reason']}")
-          #  print(f"🔍 Basic scores: {quality_assessment['basic_scores']}")
-           
+            with METRICS.span("judge"):
+                quality_assessment = self.quality_checker.assess_answer_quality(question, answer)
             needs_fallback = not quality_assessment['is_sufficient']
-            
-
-           # print(f"🔍 Fallback triggered! Overall score: {quality_assessment['overall_score']:.2f}")
-          # print(f"🔍 Reason: {quality_assessment['ai_assessment']['ai_reason']}")
 
             if needs_fallback:
-                # print("📡 Document answer insufficient, searching Reddit...")
-                top_posts = search_reddit_semantic(question, embeddings_model=self.embeddings)
-                if top_posts:
-                    # Build Reddit context
-                    reddit_context = "\n\n".join([
-                        f"**{p['title']}**\n{p['selftext'][:500]}...\n(Source: {p['url']})"
-                        for p in top_posts if p['selftext']
-                    ])
-                    
-                    # Get Reddit-based answer
-                    llm = ChatOpenAI(
-                        model="deepseek/deepseek-r1-0528-qwen3-8b:free",
-                        base_url="https://openrouter.ai/api/v1",
-                        api_key=os.getenv("OPENAI_API_KEY"),
-                        temperature=0.2
+                METRICS.incr("reddit_fallbacks")
+                with METRICS.span("fallback"):
+                    top_posts = search_reddit_semantic(
+                        question, embeddings_model=self.embeddings, reddit_index=self.reddit_index
                     )
-                    reddit_answer = llm.invoke(
-                        f"Answer the following question using the Reddit discussions:\n\n"
-                        f"Question: {question}\n\nReddit Posts:\n{reddit_context}\n\nAnswer:"
-                    ).content
-                    
-                    # Build Reddit sources
-                    reddit_sources = set()
-                    for post in top_posts:
-                        reddit_sources.add(f"🌐 r/giki: {post['title'][:60]}...")
-                    
-                    reddit_source_text = "\n\nReddit Sources:\n" + "\n".join(reddit_sources) if reddit_sources else ""
-                    
-                    return f"⚠️ Not found in official documents. Based on Reddit discussions:\n\n{reddit_answer}{reddit_source_text}"
-                else:
-                    # No Reddit posts found either - return original answer with document sources
-                    sources = set()
-                    for doc in source_docs:
-                        sources.add(f"📄 {doc.metadata['source']}")
-                    source_text = "\n\nSources:\n" + "\n".join(sources) if sources else ""
-                    return f"⚠️ {answer}\n\n(No additional information found on Reddit){source_text}"
+                    excerpts = self._reddit_excerpts(question, top_posts) if top_posts else []
+                    if excerpts:
+                        # Get Reddit-based answer
+                        reddit_answer = self._reddit_llm().invoke(
+                            self._reddit_prompt(question, excerpts)
+                        ).content
+                        return self._format_reddit_answer(reddit_answer, excerpts)
+                # No Reddit posts found either - return original answer with document sources
+                METRICS.incr("reddit_misses")
+                return self._format_document_answer(answer, source_docs, reddit_missed=True)
             else:
                 # Good document answer - return with document sources
-                sources = set()
-                for doc in source_docs:
-                    sources.add(f"📄 {doc.metadata['source']}")
-                source_text = "\n\nSources:\n" + "\n".join(sources) if sources else ""
-                return f"{answer}{source_text}"
-            
+                return self._format_document_answer(answer, source_docs)
+
         except Exception as e:
+            METRICS.incr("errors")
             return f"❌ Error: {str(e)}"
 
+    async def ask_question_stream(self, question: str, on_token=None, collection=None) -> str:
+        """
+        Async variant of ask_question. Answer tokens are passed to the
+        on_token coroutine as they arrive. When retrieval scores are weak the
+        Reddit search starts in parallel with generation, and whichever
+        branch turns out to be unnecessary is cancelled: the Reddit search
+        runs on a worker thread and stops at its next check of the cancel
+        event (the local index search itself is not interrupted).
+        collection names the document collection to answer from (default: giki).
+        """
+        if not self.ready:
+            return "⚠️ System not initialized yet."
+
+        if not question.strip():
+            return "⚠️ Please enter a valid question."
+
+        METRICS.incr("questions")
+        reddit_task = None
+        reddit_cancel = threading.Event()
+
+        def start_reddit_search():
+            return asyncio.create_task(asyncio.to_thread(
+                search_reddit_semantic, question,
+                embeddings_model=self.embeddings, reddit_index=self.reddit_index, cancel=reddit_cancel
+            ))
+
+        async def emit(text: str):
+            if on_token and text:
+                await on_token(text)
+
+        try:
+            # Loading a cold collection blocks, so keep it off the event loop
+            target = await asyncio.to_thread(self.collections.get, collection)
+            with METRICS.span("retrieval"):
+                source_docs = await target.retriever.ainvoke(question)
+            top_score = max(
+                (doc.metadata.get("relevance_score") or 0.0 for doc in source_docs), default=0.0
+            )
+
+            # Weak retrieval: the documents probably don't cover this, so
+            # start the Reddit search speculatively while the LLM generates.
+            if top_score < LOW_RETRIEVAL_SCORE:
+                METRICS.incr("speculative_reddit_started")
+                reddit_task = start_reddit_search()
+
+            prompt = self.custom_prompt.format(
+                context="\n\n".join(doc.page_content for doc in source_docs),
+                question=question
+            )
+
+            answer = ""
+            declined = False
+            with METRICS.span("llm"):
+                async for chunk in self.llm.astream(prompt):
+                    answer += chunk.content
+                    await emit(chunk.content)
+                    # The model is declining to answer from the documents; stop
+                    # generating and skip the judge, the fallback is needed anyway.
+                    if answer.lower().lstrip().startswith(NOT_FOUND_MARKER):
+                        declined = True
+                        break
+
+            if declined:
+                METRICS.incr("declined_answers")
+                needs_fallback = True
+            else:
+                with METRICS.span("judge"):
+                    quality_assessment = await asyncio.to_thread(
+                        self.quality_checker.assess_answer_quality, question, answer
+                    )
+                needs_fallback = not quality_assessment['is_sufficient']
+
+            if not needs_fallback:
+                return self._format_document_answer(answer, source_docs)
+
+            METRICS.incr("reddit_fallbacks")
+            with METRICS.span("fallback"):
+                if reddit_task is None:
+                    reddit_task = start_reddit_search()
+                top_posts = await reddit_task
+                reddit_task = None
+
+                excerpts = await asyncio.to_thread(self._reddit_excerpts, question, top_posts) if top_posts else []
+                if not excerpts:
+                    METRICS.incr("reddit_misses")
+                    return self._format_document_answer(answer, source_docs, reddit_missed=True)
+
+                await emit(f"\n\n{REDDIT_ANSWER_PREFIX}")
+                reddit_answer = ""
+                async for chunk in self._reddit_llm().astream(self._reddit_prompt(question, excerpts)):
+                    reddit_answer += chunk.content
+                    await emit(chunk.content)
+                return self._format_reddit_answer(reddit_answer, excerpts)
+
+        except Exception as e:
+            METRICS.incr("errors")
+            return f"❌ Error: {str(e)}"
+        finally:
+            # Covers a good document answer as well as errors/cancellation
+            if reddit_task is not None:
+                METRICS.incr("speculative_reddit_cancelled")
+                # Cancelling the task alone leaves the thread running
+                reddit_cancel.set()
+                reddit_task.cancel()
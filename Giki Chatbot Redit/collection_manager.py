@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+Named Document Collections
+Lets one server answer from several document sets (departments, courses)
+while sharing the embedding model and LLM. Each collection has its own data
+folder and index directory (with the index manifest); the most recently
+used ones stay loaded and cold ones are evicted.
+
+Layout:
+    data/, faiss_index/                      the default "giki" collection
+    collections/<name>/data/                 source files of <name>
+    collections/<name>/index/                its FAISS + BM25 index
+"""
+
+import os
+import re
+import time
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+
+COLLECTIONS_ROOT = os.getenv("GIKI_COLLECTIONS_DIR", "collections")
+DEFAULT_COLLECTION = "giki"
+MAX_RESIDENT_COLLECTIONS = int(os.getenv("GIKI_MAX_RESIDENT_COLLECTIONS", "4"))
+
+COLLECTION_NAME = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_-]{0,63}$")
+
+
+class CollectionError(Exception):
+    pass
+
+
+class EmptyCollectionError(CollectionError):
+    pass
+
+
+class Collection:
+    def __init__(self, name: str, data_folder: str, index_path: str):
+        self.name = name
+        self.data_folder = data_folder
+        self.index_path = index_path
+
+        # Filled in by the loader
+        self.vectorstore = None
+        self.retriever = None
+        self.timings: Dict[str, float] = {}
+        self.loaded_at = None
+        self.last_used = None
+
+    @property
+    def loaded(self) -> bool:
+        return self.retriever is not None
+
+
+class CollectionManager:
+    """
+    LRU cache of loaded collections. loader(collection) loads (or builds)
+    the collection's index and sets its vectorstore and retriever.
+    The default collection is never evicted.
+    """
+
+    def __init__(self, loader: Callable[[Collection], None], root=COLLECTIONS_ROOT,
+                 max_resident=MAX_RESIDENT_COLLECTIONS, default_data="data", default_index="faiss_index"):
+        self.loader = loader
+        self.root = root
+        self.max_resident = max(1, max_resident)
+        self.default = Collection(DEFAULT_COLLECTION, default_data, default_index)
+
+        self._resident: "OrderedDict[str, Collection]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_locks: Dict[str, threading.Lock] = {}
+        self.loads = 0
+        self.evictions = 0
+
+    # -----------------------------
+    # Lookup
+    # -----------------------------
+    def names(self) -> List[str]:
+        names = [DEFAULT_COLLECTION]
+        if os.path.isdir(self.root):
+            names += sorted(
+                name for name in os.listdir(self.root)
+                if COLLECTION_NAME.match(name) and name != DEFAULT_COLLECTION
+                and os.path.isdir(os.path.join(self.root, name))
+            )
+        return names
+
+    def describe(self, name: Optional[str]) -> Collection:
+        """The (possibly unloaded) collection for a name; raises CollectionError if unknown"""
+        name = name or DEFAULT_COLLECTION
+        if name == DEFAULT_COLLECTION:
+            return self.default
+        if not COLLECTION_NAME.match(name):
+            raise CollectionError(f"Invalid collection name: {name!r}")
+        with self._lock:
+            if name in self._resident:
+                return self._resident[name]
+        base = os.path.join(self.root, name)
+        if not os.path.isdir(base):
+            raise CollectionError(f"Unknown collection: {name!r}")
+        return Collection(name, os.path.join(base, "data"), os.path.join(base, "index"))
+
+    def get(self, name: Optional[str] = None) -> Collection:
+        """Return a loaded collection, loading it (and evicting cold ones) if needed"""
+        collection = self.describe(name)
+        with self._lock:
+            resident = self._resident.get(collection.name)
+            if resident is not None and resident.loaded:
+                self._resident.move_to_end(collection.name)
+                resident.last_used = time.time()
+                return resident
+            load_lock = self._load_locks.setdefault(collection.name, threading.Lock())
+
+        # Loading can take seconds; only callers of the same collection wait
+        with load_lock:
+            with self._lock:
+                resident = self._resident.get(collection.name)
+            if resident is not None and resident.loaded:
+                collection = resident
+            else:
+                self.loader(collection)
+                collection.loaded_at = time.time()
+                self.loads += 1
+
+        with self._lock:
+            collection.last_used = time.time()
+            self._resident[collection.name] = collection
+            self._resident.move_to_end(collection.name)
+            self._evict_locked()
+        return collection
+
+    def _evict_locked(self):
+        while len(self._resident) > self.max_resident:
+            for name in self._resident:
+                if name != DEFAULT_COLLECTION:
+                    # In-flight queries keep their own reference to it
+                    del self._resident[name]
+                    self.evictions += 1
+                    break
+            else:
+                return
+
+    def evict(self, name: str):
+        with self._lock:
+            if self._resident.pop(name, None) is not None:
+                self.evictions += 1
+
+    def put(self, collection: Collection):
+        """Make an already-loaded collection resident (replacing any old copy)"""
+        with self._lock:
+            if collection.name == DEFAULT_COLLECTION:
+                self.default = collection
+            collection.last_used = time.time()
+            self._resident[collection.name] = collection
+            self._resident.move_to_end(collection.name)
+            self._evict_locked()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            resident = list(self._resident)
+        return {
+            "collections": self.names(),
+            "resident": resident,
+            "max_resident": self.max_resident,
+            "loads": self.loads,
+            "evictions": self.evictions
+        }
+
+
+class RebuildJob:
+    """Background rebuild of one collection, with progress for a status tool"""
+
+    def __init__(self, collection: str):
+        self.collection = collection
+        self.state = "queued"
+        self.phase = None
+        self.done = 0
+        self.total = 0
+        self.message = None
+        self.started_at = None
+        self.finished_at = None
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self.state in ("queued", "running")
+
+    def progress(self, phase: str, done: int = 0, total: int = 0):
+        with self._lock:
+            self.phase, self.done, self.total = phase, done, total
+
+    def run(self, rebuild: Callable):
+        """rebuild(name, progress=...) does the work; exceptions mark the job failed"""
+        self.state = "running"
+        self.started_at = time.time()
+        try:
+            rebuild(self.collection, progress=self.progress)
+            self.state = "done"
+            self.message = f"✅ Collection '{self.collection}' rebuilt."
+        except Exception as e:
+            self.state = "failed"
+            self.message = f"❌ {e}"
+        finally:
+            self.finished_at = time.time()
+
+    def start(self, rebuild: Callable):
+        threading.Thread(target=self.run, args=(rebuild,), name=f"rebuild-{self.collection}",
+                         daemon=True).start()
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            progress = {"phase": self.phase, "done": self.done, "total": self.total}
+        end = self.finished_at or time.time()
+        return {
+            "collection": self.collection,
+            "state": self.state,
+            "progress": progress,
+            "message": self.message,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "elapsed_s": round(end - self.started_at, 1) if self.started_at else None
+        }
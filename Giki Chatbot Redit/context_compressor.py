@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Context Compression
+Shrinks retrieved chunks before they are stuffed into a prompt: merges
+adjacent chunks from the same page, drops duplicated sentences, keeps only
+the sentences most similar to the question and enforces a token budget.
+"""
+
+import re
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+from langchain.docstore.document import Document
+from langchain_core.documents import BaseDocumentCompressor
+
+# Rough chars-per-token ratio for English prose; the hosted model's
+# tokenizer isn't available locally and only the order of magnitude matters
+CHARS_PER_TOKEN = 4
+
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?;])\s+|\n+|\s+(?=[•▪●-]\s)")
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def split_sentences(text: str, max_chars=400) -> List[str]:
+    """Sentences, with overly long ones (tables, bullet runs) cut on whitespace"""
+    sentences = []
+    for sentence in SENTENCE_BOUNDARY.split(text):
+        sentence = sentence.strip()
+        while len(sentence) > max_chars:
+            cut = sentence.rfind(" ", 0, max_chars)
+            cut = cut if cut > 0 else max_chars
+            sentences.append(sentence[:cut])
+            sentence = sentence[cut:].strip()
+        if sentence:
+            sentences.append(sentence)
+    return sentences
+
+
+def merge_overlap(left: str, right: str, max_overlap=200) -> str:
+    """Join two consecutive chunks, dropping the splitter's overlap if present"""
+    for size in range(min(max_overlap, len(left), len(right)), 10, -1):
+        if left.endswith(right[:size]):
+            return left + right[size:]
+    return f"{left} {right}"
+
+
+def _normalize(sentence: str) -> str:
+    return re.sub(r"[^a-z0-9]+", " ", sentence.lower()).strip()
+
+
+class ContextCompressor(BaseDocumentCompressor):
+    """
+    Retrieved documents in, one compressed document per passage out.
+    A passage is a run of adjacent chunks from the same source page or Reddit
+    post; it keeps the first chunk's metadata and the best relevance_score of
+    its chunks.
+    """
+
+    embeddings: object
+    token_budget: int = 600
+    min_similarity: float = 0.25
+    # Always keep this many sentences, however weak, so the prompt isn't empty
+    min_sentences: int = 3
+
+    # -----------------------------
+    # Passages
+    # -----------------------------
+    @staticmethod
+    def _passage_key(doc: Document):
+        return doc.metadata.get("source"), doc.metadata.get("page"), doc.metadata.get("post_id")
+
+    def merge_passages(self, documents: Sequence[Document]) -> List[Document]:
+        """Merge chunks with consecutive chunk_ids from the same source page"""
+        groups: Dict = {}
+        for rank, doc in enumerate(documents):
+            groups.setdefault(self._passage_key(doc), []).append((rank, doc))
+
+        passages = []
+        for members in groups.values():
+            members.sort(key=lambda m: (m[1].metadata.get("chunk_id") is None, m[1].metadata.get("chunk_id") or 0))
+            run = []
+            for rank, doc in members:
+                chunk_id = doc.metadata.get("chunk_id")
+                previous = run[-1][1].metadata.get("chunk_id") if run else None
+                if run and (chunk_id is None or previous is None or chunk_id != previous + 1):
+                    passages.append(self._join(run))
+                    run = []
+                run.append((rank, doc))
+            if run:
+                passages.append(self._join(run))
+
+        # Best-ranked chunk decides where the passage goes
+        passages.sort(key=lambda p: p[0])
+        return [doc for _, doc in passages]
+
+    @staticmethod
+    def _join(run):
+        text = run[0][1].page_content
+        for _, doc in run[1:]:
+            text = merge_overlap(text, doc.page_content)
+
+        scores = [d.metadata.get("relevance_score") for _, d in run]
+        scores = [s for s in scores if s is not None]
+        metadata = {**run[0][1].metadata,
+                    "relevance_score": max(scores) if scores else None}
+        if len(run) > 1:
+            metadata["chunk_ids"] = [d.metadata.get("chunk_id") for _, d in run]
+        return min(rank for rank, _ in run), Document(page_content=text, metadata=metadata)
+
+    # -----------------------------
+    # Sentence selection
+    # -----------------------------
+    def compress_documents(self, documents: Sequence[Document], query: str, callbacks=None) -> Sequence[Document]:
+        passages = self.merge_passages(documents)
+
+        # (passage index, position, sentence), duplicates across passages dropped
+        sentences, seen = [], set()
+        for p, passage in enumerate(passages):
+            for position, sentence in enumerate(split_sentences(passage.page_content)):
+                key = _normalize(sentence)
+                if not key or key in seen:
+                    continue
+                seen.add(key)
+                sentences.append((p, position, sentence))
+        if not sentences:
+            return []
+
+        scores = self._similarities(query, [s for _, _, s in sentences])
+
+        chosen, used = [], 0
+        for i in np.argsort(-scores):
+            if len(chosen) >= self.min_sentences and scores[i] < self.min_similarity:
+                break
+            cost = estimate_tokens(sentences[i][2]) + 1
+            if chosen and used + cost > self.token_budget:
+                continue  # a shorter sentence may still fit
+            chosen.append(i)
+            used += cost
+
+        # Back to reading order within each passage
+        kept: Dict[int, List] = {}
+        for i in sorted(chosen, key=lambda i: sentences[i][:2]):
+            kept.setdefault(sentences[i][0], []).append(sentences[i][2])
+
+        return [
+            Document(page_content=" ".join(kept[p]), metadata=passage.metadata)
+            for p, passage in enumerate(passages) if p in kept
+        ]
+
+    def _similarities(self, query: str, sentences: List[str]) -> np.ndarray:
+        if hasattr(self.embeddings, "query_vector"):
+            q = np.asarray(self.embeddings.query_vector(query), dtype=np.float32)
+        else:
+            q = np.asarray(self.embeddings.embed_query(query), dtype=np.float32)
+        vectors = np.asarray(self.embeddings.embed_documents(sentences), dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1) * max(float(np.linalg.norm(q)), 1e-12)
+        return (vectors @ q) / np.maximum(norms, 1e-12)
+
+    def compress_text(self, query: str, texts: List[str], metadatas: Optional[List[Dict]] = None) -> List[Document]:
+        """Same as compress_documents for plain strings (e.g. Reddit posts)"""
+        metadatas = metadatas or [{} for _ in texts]
+        return list(self.compress_documents(
+            [Document(page_content=t, metadata=m) for t, m in zip(texts, metadatas)], query
+        ))
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Shared Embedding Service
+One sentence-transformer per process for retrieval, keyword extraction and
+Reddit reranking. Query embeddings are cached, so a question is encoded once
+no matter how many pipeline stages look at it.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+DEFAULT_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+
+
+class EmbeddingService(Embeddings):
+    def __init__(self, model_name=DEFAULT_MODEL_NAME, device="cpu", query_cache_size=256):
+        self.model_name = model_name
+        self.device = device
+        self.query_cache_size = query_cache_size
+
+        self._model = None
+        self._kw_model = None
+        self._lock = threading.Lock()
+        self._query_cache = OrderedDict()
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    @property
+    def model(self):
+        """The sentence-transformer, loaded on first use"""
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    from sentence_transformers import SentenceTransformer
+                    self._model = SentenceTransformer(self.model_name, device=self.device)
+        return self._model
+
+    def load(self):
+        self.model
+        return self
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        return self.model.encode(texts, normalize_embeddings=True, convert_to_numpy=True)
+
+    # -----------------------------
+    # LangChain Embeddings interface
+    # -----------------------------
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        return self._encode(list(texts)).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.query_vector(text).tolist()
+
+    # -----------------------------
+    # Cached query embeddings
+    # -----------------------------
+    def query_vector(self, text: str) -> np.ndarray:
+        """Normalized query embedding, served from the LRU cache when possible"""
+        with self._lock:
+            vector = self._query_cache.get(text)
+            if vector is not None:
+                self._query_cache.move_to_end(text)
+                self.cache_hits += 1
+                return vector
+            self.cache_misses += 1
+
+        vector = self._encode([text])[0]
+        vector.setflags(write=False)  # shared between callers
+        with self._lock:
+            self._query_cache[text] = vector
+            self._query_cache.move_to_end(text)
+            while len(self._query_cache) > self.query_cache_size:
+                self._query_cache.popitem(last=False)
+        return vector
+
+    # -----------------------------
+    # Keyword extraction
+    # -----------------------------
+    def extract_keywords(self, query: str, top_k=3) -> List[str]:
+        """KeyBERT keyphrases, reusing the cached query embedding as the document embedding"""
+        if self._kw_model is None:
+            from keybert import KeyBERT
+            model = self.model
+            with self._lock:
+                if self._kw_model is None:
+                    self._kw_model = KeyBERT(model=model)
+
+        keywords = self._kw_model.extract_keywords(
+            query,
+            keyphrase_ngram_range=(1, 2),
+            stop_words='english',
+            top_n=top_k,
+            doc_embeddings=self.query_vector(query).reshape(1, -1)
+        )
+        return [kw for kw, score in keywords]
+
+    def stats(self) -> dict:
+        return {
+            "model": self.model_name,
+            "loaded": self._model is not None,
+            "query_cache_size": len(self._query_cache),
+            "query_cache_hits": self.cache_hits,
+            "query_cache_misses": self.cache_misses
+        }
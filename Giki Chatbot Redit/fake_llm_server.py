@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Fake OpenAI-Compatible LLM Server
+Answers /v1/chat/completions (streaming and non-streaming) with deterministic
+replies and configurable latency, so benchmarks and tests can run offline.
+
+    python fake_llm_server.py --port 8555 --latency-ms 300 --token-ms 5
+    GIKI_LLM_BASE_URL=http://127.0.0.1:8555/v1 python server.py
+"""
+
+import json
+import time
+import zlib
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeLLMConfig:
+    def __init__(self, latency_ms=300, token_ms=5, insufficient_rate=0.25):
+        self.latency_ms = latency_ms          # time to first token
+        self.token_ms = token_ms              # delay between streamed tokens
+        self.insufficient_rate = insufficient_rate  # share of answers the judge rejects
+
+
+def _last_user_message(payload) -> str:
+    for message in reversed(payload.get("messages", [])):
+        if message.get("role") == "user":
+            content = message.get("content", "")
+            if isinstance(content, list):
+                content = " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+            return content
+    return ""
+
+
+def fake_reply(prompt: str, config: FakeLLMConfig) -> str:
+    """Deterministic reply shaped like what each GIKI call site expects"""
+    if "Sufficient: [Yes/No]" in prompt:
+        # Quality judge: reject a stable fraction of questions so the fallback path runs
+        question = prompt.split("Question:", 1)[-1].split("Answer:", 1)[0].strip()
+        rejected = (zlib.crc32(question.encode()) % 100) < config.insufficient_rate * 100
+        score = 3 if rejected else 8
+        return (f"Relevance: {score}\nCompleteness: {score}\nSpecificity: {score}\n"
+                f"Helpfulness: {score}\nSufficient: {'No' if rejected else 'Yes'}\n"
+                f"Reason: fake judge")
+
+    context = prompt.split("Context:", 1)[-1].split("Question:", 1)[0].strip()
+    if not context:
+        context = prompt.split("Reddit Posts:", 1)[-1].split("Answer:", 1)[0].strip()
+    excerpt = " ".join(context.split()[:60])
+    return (f"According to the provided documents, {excerpt}\n\n"
+            f"- Based on the handbook policy outlined above.\n- Source: document context.")
+
+
+class FakeLLMHandler(BaseHTTPRequestHandler):
+    config = FakeLLMConfig()
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass  # keep benchmark output clean
+
+    def _send_json(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path.rstrip("/").endswith("/models"):
+            return self._send_json(200, {"object": "list", "data": [{"id": "fake-model", "object": "model"}]})
+        self._send_json(404, {"error": {"message": "not found"}})
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            return self._send_json(404, {"error": {"message": "not found"}})
+
+        length = int(self.headers.get("Content-Length", 0))
+        payload = json.loads(self.rfile.read(length) or b"{}")
+        prompt = _last_user_message(payload)
+        reply = fake_reply(prompt, self.config)
+        model = payload.get("model", "fake-model")
+        usage = {
+            "prompt_tokens": len(prompt.split()),
+            "completion_tokens": len(reply.split()),
+            "total_tokens": len(prompt.split()) + len(reply.split())
+        }
+
+        time.sleep(self.config.latency_ms / 1000)
+
+        if not payload.get("stream"):
+            return self._send_json(200, {
+                "id": "chatcmpl-fake",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": reply},
+                             "finish_reason": "stop"}],
+                "usage": usage
+            })
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+
+        def event(delta, finish_reason=None, **extra):
+            chunk = {
+                "id": "chatcmpl-fake",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+                **extra
+            }
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            self.wfile.flush()
+
+        try:
+            event({"role": "assistant", "content": ""})
+            for i, word in enumerate(reply.split(" ")):
+                event({"content": word if i == 0 else " " + word})
+                time.sleep(self.config.token_ms / 1000)
+            event({}, finish_reason="stop", usage=usage)
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # client cancelled the stream
+        self.close_connection = True
+
+
+def start_fake_llm_server(host="127.0.0.1", port=0, config=None):
+    """Start the server on a daemon thread. Returns (server, base_url)."""
+    handler = type("ConfiguredFakeLLMHandler", (FakeLLMHandler,), {"config": config or FakeLLMConfig()})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/v1"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Deterministic OpenAI-compatible stub.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8555)
+    parser.add_argument("--latency-ms", type=int, default=300, help="time to first token")
+    parser.add_argument("--token-ms", type=int, default=5, help="delay between streamed tokens")
+    parser.add_argument("--insufficient-rate", type=float, default=0.25,
+                        help="fraction of answers the fake judge rejects")
+    args = parser.parse_args()
+
+    FakeLLMHandler.config = FakeLLMConfig(args.latency_ms, args.token_ms, args.insufficient_rate)
+    server = ThreadingHTTPServer((args.host, args.port), FakeLLMHandler)
+    print(f"Fake LLM server on http://{args.host}:{args.port}/v1")
+    server.serve_forever()
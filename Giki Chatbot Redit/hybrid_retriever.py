@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Hybrid BM25 + Vector Retriever
+Fuses an inverted BM25 index with FAISS similarity search using reciprocal
+rank fusion, with an optional local cross-encoder reranking pass.
+"""
+
+import os
+import re
+import json
+import math
+import time
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from langchain.docstore.document import Document
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.retrievers import BaseRetriever
+
+BM25_FILE = "bm25.json"
+
+# Keeps course codes, amounts and form names together: "cs-101", "es111", "1,20,000", "f-3"
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[-.,/][a-z0-9]+)*")
+
+STOP_WORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "can", "do", "does", "for", "from",
+    "how", "i", "in", "is", "it", "of", "on", "or", "that", "the", "this", "to", "was",
+    "what", "when", "where", "which", "who", "will", "with", "my", "me", "we", "you"
+}
+
+
+def tokenize(text: str) -> List[str]:
+    tokens = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        if token in STOP_WORDS:
+            continue
+        tokens.append(token)
+        # Also index the parts of compound tokens so "cs-101" matches "cs 101"
+        if any(sep in token for sep in "-./,"):
+            tokens.extend(p for p in re.split(r"[-./,]", token) if p and p not in STOP_WORDS)
+    return tokens
+
+
+# -----------------------------
+# BM25
+# -----------------------------
+class BM25Index:
+    def __init__(self, doc_ids: List[str], postings: Dict[str, List[Tuple[int, int]]],
+                 doc_lengths: List[int], k1=1.5, b=0.75):
+        self.doc_ids = doc_ids
+        self.postings = postings
+        self.doc_lengths = doc_lengths
+        self.k1 = k1
+        self.b = b
+        self.avg_length = (sum(doc_lengths) / len(doc_lengths)) if doc_lengths else 0.0
+
+    def __len__(self):
+        return len(self.doc_ids)
+
+    @classmethod
+    def from_texts(cls, texts: List[str], doc_ids: List[str]) -> "BM25Index":
+        postings = defaultdict(list)
+        doc_lengths = []
+        for i, text in enumerate(texts):
+            counts = Counter(tokenize(text))
+            doc_lengths.append(sum(counts.values()))
+            for term, tf in counts.items():
+                postings[term].append((i, tf))
+        return cls(list(doc_ids), dict(postings), doc_lengths)
+
+    @classmethod
+    def from_vectorstore(cls, vectorstore) -> "BM25Index":
+        """Build from the documents already stored in a FAISS vectorstore"""
+        doc_ids = [vectorstore.index_to_docstore_id[i] for i in range(len(vectorstore.index_to_docstore_id))]
+        texts = [vectorstore.docstore.search(doc_id).page_content for doc_id in doc_ids]
+        return cls.from_texts(texts, doc_ids)
+
+    def save(self, index_path: str):
+        os.makedirs(index_path, exist_ok=True)
+        tmp = os.path.join(index_path, BM25_FILE + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({
+                "doc_ids": self.doc_ids,
+                "doc_lengths": self.doc_lengths,
+                "postings": self.postings,
+                "k1": self.k1,
+                "b": self.b
+            }, f)
+        os.replace(tmp, os.path.join(index_path, BM25_FILE))
+
+    @classmethod
+    def load(cls, index_path: str) -> Optional["BM25Index"]:
+        try:
+            with open(os.path.join(index_path, BM25_FILE), "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        postings = {term: [tuple(p) for p in plist] for term, plist in data["postings"].items()}
+        return cls(data["doc_ids"], postings, data["doc_lengths"], data.get("k1", 1.5), data.get("b", 0.75))
+
+    def search(self, query: str, k=20) -> List[Tuple[str, float]]:
+        """Return up to k (docstore id, score) pairs, best first"""
+        n = len(self.doc_ids)
+        scores = defaultdict(float)
+        for term in set(tokenize(query)):
+            plist = self.postings.get(term)
+            if not plist:
+                continue
+            idf = math.log(1 + (n - len(plist) + 0.5) / (len(plist) + 0.5))
+            for i, tf in plist:
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[i] / (self.avg_length or 1))
+                scores[i] += idf * tf * (self.k1 + 1) / (tf + norm)
+
+        best = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+        return [(self.doc_ids[i], score) for i, score in best]
+
+
+# -----------------------------
+# Reranker
+# -----------------------------
+class CrossEncoderReranker:
+    """
+    Scores (query, passage) pairs with a small local cross-encoder. Scoring
+    stops once the latency budget is spent; unscored candidates keep their
+    fused order behind the scored ones.
+    """
+
+    def __init__(self, model_name="cross-encoder/ms-marco-MiniLM-L-6-v2", budget_ms=150, batch_size=4):
+        from sentence_transformers import CrossEncoder
+        self.model = CrossEncoder(model_name, device="cpu")
+        self.budget_ms = budget_ms
+        self.batch_size = batch_size
+
+    def rerank(self, query: str, docs: List[Document]) -> List[Document]:
+        started = time.perf_counter()
+        scored = []
+        for start in range(0, len(docs), self.batch_size):
+            if (time.perf_counter() - started) * 1000 >= self.budget_ms:
+                break
+            batch = docs[start:start + self.batch_size]
+            scores = self.model.predict([(query, doc.page_content) for doc in batch])
+            scored.extend(zip(batch, scores))
+
+        scored.sort(key=lambda item: item[1], reverse=True)
+        return [doc for doc, _ in scored] + docs[len(scored):]
+
+
+# -----------------------------
+# Hybrid retriever
+# -----------------------------
+class HybridRetriever(BaseRetriever):
+    """
+    Reciprocal rank fusion of FAISS similarity search and BM25. Without a
+    BM25 index it is plain similarity search. Every returned document
+    carries its vector relevance score (0-1, None for BM25-only hits) in
+    metadata["relevance_score"].
+    """
+
+    vectorstore: object
+    bm25: Optional[BM25Index] = None
+    reranker: Optional[CrossEncoderReranker] = None
+    k: int = 5
+    fetch_k: int = 20
+    rrf_k: int = 60
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        vector_hits = self.vectorstore.similarity_search_with_relevance_scores(query, k=self.fetch_k)
+
+        docs: Dict[str, Document] = {}
+        relevance: Dict[str, float] = {}
+        fused = defaultdict(float)
+        for rank, (doc, score) in enumerate(vector_hits):
+            key = doc.id or doc.page_content
+            docs[key] = doc
+            relevance[key] = float(score)
+            fused[key] += 1.0 / (self.rrf_k + rank + 1)
+
+        if self.bm25 is not None:
+            for rank, (doc_id, _) in enumerate(self.bm25.search(query, k=self.fetch_k)):
+                doc = self.vectorstore.docstore.search(doc_id)
+                if not isinstance(doc, Document):
+                    continue
+                # Indexes saved by older LangChain versions have no Document.id
+                key = doc.id or doc.page_content
+                docs.setdefault(key, doc)
+                fused[key] += 1.0 / (self.rrf_k + rank + 1)
+
+        ranked = [docs[key] for key, _ in sorted(fused.items(), key=lambda item: item[1], reverse=True)]
+        if self.reranker is not None:
+            ranked = self.reranker.rerank(query, ranked[:self.fetch_k])
+
+        # Copy so the shared docstore documents aren't mutated
+        return [
+            Document(
+                id=doc.id,
+                page_content=doc.page_content,
+                metadata={**doc.metadata, "relevance_score": relevance.get(doc.id or doc.page_content)}
+            )
+            for doc in ranked[:self.k]
+        ]
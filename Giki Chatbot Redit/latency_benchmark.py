@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+GIKI Bot Latency Benchmark
+Runs a fixed question set through every stage of GIKIbot.ask_question against
+a local fake LLM server, so results are reproducible offline, and emits JSON
+for tracking regressions.
+
+    python latency_benchmark.py --output bench.json
+    python latency_benchmark.py --clients 1 4 8 --skip-build
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+import platform
+import resource
+import statistics
+from contextlib import contextmanager
+
+from fake_llm_server import FakeLLMConfig, start_fake_llm_server
+from retrieval_benchmark import BENCHMARK_QUESTIONS
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def summarize(samples):
+    if not samples:
+        return {"n": 0}
+    ordered = sorted(samples)
+    return {
+        "n": len(ordered),
+        "mean_ms": round(statistics.fmean(ordered), 2),
+        "p50_ms": round(ordered[len(ordered) // 2], 2),
+        "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 2),
+        "max_ms": round(ordered[-1], 2)
+    }
+
+
+def rss_mb() -> float:
+    """Current resident set size (Linux), falling back to the peak"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError):
+        return peak_rss_mb()
+
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if sys.platform == "darwin" else peak / 1024
+
+
+def dir_size_mb(path: str) -> float:
+    total = 0
+    for root, _, files in os.walk(path):
+        total += sum(os.path.getsize(os.path.join(root, name)) for name in files)
+    return total / 2**20
+
+
+class StageTimer:
+    def __init__(self):
+        self.samples = {}
+
+    @contextmanager
+    def stage(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.samples.setdefault(name, []).append((time.perf_counter() - started) * 1000)
+
+    def report(self):
+        return {name: summarize(samples) for name, samples in self.samples.items()}
+
+
+# -----------------------------
+# Index build
+# -----------------------------
+def bench_index_build(bot, index_type="flat"):
+    from hybrid_retriever import BM25Index
+    from vector_index import build_vectorstore, read_manifest
+
+    timer = StageTimer()
+    rss_before = rss_mb()
+    with tempfile.TemporaryDirectory() as index_dir:
+        with timer.stage("load_and_chunk"):
+            documents = bot.processor.load_documents()
+        with timer.stage("embed_faiss_and_save"):
+            vectorstore = build_vectorstore(documents, bot.embeddings, index_dir, index_type)
+        with timer.stage("bm25"):
+            BM25Index.from_vectorstore(vectorstore).save(index_dir)
+        size = dir_size_mb(index_dir)
+        manifest = read_manifest(index_dir)
+
+    return {
+        "chunks": len(documents),
+        "index_type": manifest["index_type"],
+        "recall_at_k": manifest["recall_at_k"],
+        "stages_ms": {name: round(samples[0], 2) for name, samples in timer.samples.items()},
+        "total_ms": round(sum(s[0] for s in timer.samples.values()), 2),
+        "rss_before_mb": round(rss_before, 1),
+        "rss_after_mb": round(rss_mb(), 1),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "index_size_mb": round(size, 2)
+    }
+
+
+# -----------------------------
+# Per-stage latency
+# -----------------------------
+def bench_stages(bot, questions, rounds=1):
+    import chatbot
+
+    timer = StageTimer()
+    for _ in range(rounds):
+        for question, _ in questions:
+            with timer.stage("embed_query"):
+                query_embedding = bot.embeddings.embed_query(question)
+            with timer.stage("faiss_search"):
+                bot.vectorstore.similarity_search_with_score_by_vector(query_embedding, k=5)
+            with timer.stage("retrieval"):
+                docs = bot.retriever.invoke(question)
+            with timer.stage("prompt_build"):
+                prompt = bot.custom_prompt.format(
+                    context="\n\n".join(doc.page_content for doc in docs), question=question
+                )
+            with timer.stage("llm"):
+                answer = bot.llm.invoke(prompt).content
+            with timer.stage("quality_check"):
+                bot.quality_checker.assess_answer_quality(question, answer)
+            with timer.stage("keyword_extraction"):
+                chatbot.extract_keywords(question)
+            with timer.stage("reddit_path"):
+                posts = chatbot.search_reddit_semantic(
+                    question, embeddings_model=bot.embeddings, reddit_index=bot.reddit_index
+                )
+                if posts:
+                    bot._reddit_llm().invoke(bot._reddit_prompt(question, bot._reddit_excerpts(question, posts)))
+            with timer.stage("end_to_end"):
+                bot.ask_question(question)
+    return timer.report()
+
+
+# -----------------------------
+# Concurrent MCP clients
+# -----------------------------
+async def _run_clients(open_session, clients, questions, requests_per_client):
+    latencies, errors = [], 0
+
+    async def client(session, offset):
+        nonlocal errors
+        for i in range(requests_per_client):
+            question = questions[(offset + i) % len(questions)][0]
+            started = time.perf_counter()
+            try:
+                result = await session.call_tool("ask_giki", {"question": question})
+                if result.isError:
+                    errors += 1
+            except Exception:
+                errors += 1
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    elapsed = await open_session(clients, client)
+    total = clients * requests_per_client
+    return {
+        "clients": clients,
+        "requests": total,
+        "errors": errors,
+        "wall_s": round(elapsed, 2),
+        "requests_per_s": round(total / elapsed, 3),
+        "latency": summarize(latencies)
+    }
+
+
+async def bench_throughput(client_counts, questions, requests_per_client, env, url=None):
+    """
+    Over stdio one server process serves all clients through a single session
+    with concurrent requests; with --url each client gets its own HTTP session.
+    """
+    from mcp import ClientSession, StdioServerParameters
+    from mcp.client.stdio import stdio_client
+
+    async def stdio_sessions(clients, client):
+        params = StdioServerParameters(command=sys.executable, args=["server.py"], env=env, cwd=HERE)
+        async with stdio_client(params) as (read, write):
+            async with ClientSession(read, write) as session:
+                await session.initialize()
+                # Server startup isn't part of throughput
+                started = time.perf_counter()
+                await asyncio.gather(*(client(session, n) for n in range(clients)))
+                return time.perf_counter() - started
+
+    async def http_sessions(clients, client):
+        from mcp.client.streamable_http import streamablehttp_client
+
+        async def one(n):
+            async with streamablehttp_client(url) as (read, write, _):
+                async with ClientSession(read, write) as session:
+                    await session.initialize()
+                    await client(session, n)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one(n) for n in range(clients)))
+        return time.perf_counter() - started
+
+    open_session = http_sessions if url else stdio_sessions
+    return [await _run_clients(open_session, clients, questions, requests_per_client)
+            for clients in client_counts]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark GIKIbot latency offline.")
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    parser.add_argument("--rounds", type=int, default=1, help="passes over the question set")
+    parser.add_argument("--llm-latency-ms", type=int, default=300)
+    parser.add_argument("--llm-token-ms", type=int, default=5)
+    parser.add_argument("--clients", type=int, nargs="*", default=[1, 4, 8],
+                        help="concurrent MCP client counts to measure")
+    parser.add_argument("--requests-per-client", type=int, default=4)
+    parser.add_argument("--url", help="benchmark a running streamable-http server instead of stdio")
+    parser.add_argument("--skip-build", action="store_true", help="skip the index build benchmark")
+    parser.add_argument("--index-type", default="flat", help="FAISS index type for the build benchmark")
+    args = parser.parse_args()
+
+    os.chdir(HERE)
+    fake_server, llm_url = start_fake_llm_server(
+        config=FakeLLMConfig(args.llm_latency_ms, args.llm_token_ms)
+    )
+    # Everything the bot needs to run offline against the stub
+    os.environ["GIKI_LLM_BASE_URL"] = llm_url
+    os.environ["GIKI_REDDIT_LIVE_FALLBACK"] = "0"
+    os.environ.setdefault("OPENROUTER_API_KEY", "benchmark")
+    for var in ("REDDIT_CLIENT_ID", "REDDIT_CLIENT_SECRET", "REDDIT_USER_AGENT"):
+        os.environ.setdefault(var, "benchmark")
+
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "questions": len(BENCHMARK_QUESTIONS),
+        "fake_llm": {"latency_ms": args.llm_latency_ms, "token_ms": args.llm_token_ms}
+    }
+
+    started = time.perf_counter()
+    from chatbot import GIKIbot
+    bot = GIKIbot()
+    report["startup_ms"] = round((time.perf_counter() - started) * 1000, 2)
+
+    if not args.skip_build:
+        report["index_build"] = bench_index_build(bot, args.index_type)
+
+    init_msg = bot.initialize_system()
+    if not bot.ready:
+        sys.exit(f"Bot failed to initialize: {init_msg}")
+
+    report["stages"] = bench_stages(bot, BENCHMARK_QUESTIONS, rounds=args.rounds)
+    if args.clients:
+        report["throughput"] = asyncio.run(bench_throughput(
+            args.clients, BENCHMARK_QUESTIONS, args.requests_per_client, dict(os.environ), url=args.url
+        ))
+
+    fake_server.shutdown()
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
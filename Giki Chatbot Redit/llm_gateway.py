@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+"""
+LLM Gateway
+Hands out ChatOpenAI clients that share one keep-alive HTTP connection pool,
+with a concurrency limit, timeouts, retries with backoff and per-call latency
+and token metrics. Every LLM call in the bot goes through here.
+"""
+
+import os
+import time
+import asyncio
+import threading
+from typing import Dict, Optional
+
+import httpx
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_openai import ChatOpenAI
+
+# GIKI_LLM_BASE_URL points the bot at another OpenAI-compatible server;
+# GIKI_LLM_BACKEND=fake starts fake_llm_server.py in-process instead
+LLM_BASE_URL = os.getenv("GIKI_LLM_BASE_URL", "https://openrouter.ai/api/v1")
+LLM_MODEL = os.getenv("GIKI_LLM_MODEL", "deepseek/deepseek-r1-0528-qwen3-8b:free")
+
+LLM_MAX_CONCURRENCY = int(os.getenv("GIKI_LLM_MAX_CONCURRENCY", "8"))
+LLM_TIMEOUT_SECONDS = float(os.getenv("GIKI_LLM_TIMEOUT", "60"))
+LLM_MAX_RETRIES = int(os.getenv("GIKI_LLM_MAX_RETRIES", "3"))
+
+DEFAULT_HEADERS = {
+    "HTTP-Referer": "https://huggingface.co",
+    "X-Title": "GIKI-RAG-bot"
+}
+
+
+# -----------------------------
+# Concurrency limit
+# -----------------------------
+class ConcurrencyLimit:
+    """
+    One cap on in-flight LLM requests shared by the sync and async HTTP
+    clients. A request holds its slot until its response body is closed
+    (for a stream, until the stream ends); calls over the cap wait.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self._slots = threading.BoundedSemaphore(limit)
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.peak = 0
+        self.waited = 0
+
+    def _acquired(self, waited: bool):
+        with self._lock:
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+            self.waited += waited
+
+    def acquire(self):
+        waited = not self._slots.acquire(blocking=False)
+        if waited:
+            self._slots.acquire()
+        self._acquired(waited)
+
+    async def acquire_async(self):
+        # Polled rather than awaited on a thread, so a cancelled call never
+        # leaves a thread behind that takes a slot later
+        delay, waited = 0.002, False
+        while not self._slots.acquire(blocking=False):
+            waited = True
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 0.05)
+        self._acquired(waited)
+
+    def release(self):
+        with self._lock:
+            self.in_flight -= 1
+        self._slots.release()
+
+
+class _ReleasingStream(httpx.SyncByteStream):
+    def __init__(self, stream, release):
+        self._stream = stream
+        self._release = release
+
+    def __iter__(self):
+        yield from self._stream
+
+    def close(self):
+        try:
+            self._stream.close()
+        finally:
+            release, self._release = self._release, None
+            if release:
+                release()
+
+
+class _AsyncReleasingStream(httpx.AsyncByteStream):
+    def __init__(self, stream, release):
+        self._stream = stream
+        self._release = release
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self):
+        try:
+            await self._stream.aclose()
+        finally:
+            release, self._release = self._release, None
+            if release:
+                release()
+
+
+class LimitedTransport(httpx.BaseTransport):
+    def __init__(self, transport: httpx.BaseTransport, limit: ConcurrencyLimit):
+        self._transport = transport
+        self._limit = limit
+
+    def handle_request(self, request):
+        self._limit.acquire()
+        try:
+            response = self._transport.handle_request(request)
+        except BaseException:
+            self._limit.release()
+            raise
+        response.stream = _ReleasingStream(response.stream, self._limit.release)
+        return response
+
+    def close(self):
+        self._transport.close()
+
+
+class AsyncLimitedTransport(httpx.AsyncBaseTransport):
+    def __init__(self, transport: httpx.AsyncBaseTransport, limit: ConcurrencyLimit):
+        self._transport = transport
+        self._limit = limit
+
+    async def handle_async_request(self, request):
+        await self._limit.acquire_async()
+        try:
+            response = await self._transport.handle_async_request(request)
+        except BaseException:
+            self._limit.release()
+            raise
+        response.stream = _AsyncReleasingStream(response.stream, self._limit.release)
+        return response
+
+    async def aclose(self):
+        await self._transport.aclose()
+
+
+# -----------------------------
+# Metrics
+# -----------------------------
+class LLMMetrics(BaseCallbackHandler):
+    """Latency and token counts per call purpose (answer, quality_check, ...)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._started: Dict = {}
+        self.by_purpose: Dict[str, Dict] = {}
+
+    def _bucket(self, purpose: str) -> Dict:
+        return self.by_purpose.setdefault(purpose, {
+            "calls": 0, "errors": 0, "total_ms": 0.0, "max_ms": 0.0,
+            "prompt_tokens": 0, "completion_tokens": 0
+        })
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, metadata=None, **kwargs):
+        purpose = (metadata or {}).get("llm_purpose", "other")
+        with self._lock:
+            self._started[run_id] = (purpose, time.perf_counter())
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        with self._lock:
+            purpose, started = self._started.pop(run_id, ("other", None))
+            bucket = self._bucket(purpose)
+            bucket["calls"] += 1
+            if started is not None:
+                elapsed = (time.perf_counter() - started) * 1000
+                bucket["total_ms"] += elapsed
+                bucket["max_ms"] = max(bucket["max_ms"], elapsed)
+
+            prompt_tokens, completion_tokens = _token_usage(response)
+            bucket["prompt_tokens"] += prompt_tokens
+            bucket["completion_tokens"] += completion_tokens
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        with self._lock:
+            purpose, _ = self._started.pop(run_id, ("other", None))
+            self._bucket(purpose)["errors"] += 1
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                purpose: {**bucket,
+                          "total_ms": round(bucket["total_ms"], 1),
+                          "max_ms": round(bucket["max_ms"], 1),
+                          "avg_ms": round(bucket["total_ms"] / bucket["calls"], 1) if bucket["calls"] else 0.0}
+                for purpose, bucket in self.by_purpose.items()
+            }
+
+
+def _token_usage(response):
+    """(prompt, completion) tokens from a streamed or non-streamed LLMResult"""
+    for generations in response.generations:
+        for generation in generations:
+            usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+            if usage:
+                return usage.get("input_tokens", 0), usage.get("output_tokens", 0)
+    usage = (response.llm_output or {}).get("token_usage") or {}
+    return usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0)
+
+
+# -----------------------------
+# Gateway
+# -----------------------------
+class LLMGateway:
+    """
+    One ConcurrencyLimit caps concurrent LLM calls across the sync and
+    async clients (a stream holds its slot until it ends); calls over the
+    cap queue for a slot instead of failing. Retries with exponential
+    backoff are handled by the OpenAI client.
+    """
+
+    def __init__(self, base_url=None, api_key=None, model=LLM_MODEL,
+                 max_concurrency=LLM_MAX_CONCURRENCY, timeout=LLM_TIMEOUT_SECONDS,
+                 max_retries=LLM_MAX_RETRIES):
+        self._fake_server = None
+        if base_url is None and os.getenv("GIKI_LLM_BACKEND") == "fake":
+            from fake_llm_server import start_fake_llm_server
+            self._fake_server, base_url = start_fake_llm_server()
+
+        self.base_url = base_url or LLM_BASE_URL
+        self.api_key = api_key or os.getenv("OPENROUTER_API_KEY") or os.getenv("OPENAI_API_KEY") or "unset"
+        self.model = model
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.max_retries = max_retries
+
+        self.limit = ConcurrencyLimit(max_concurrency)
+        limits = httpx.Limits(max_connections=max_concurrency,
+                              max_keepalive_connections=max_concurrency,
+                              keepalive_expiry=60)
+        # The limit is taken before a connection is requested, so the pool
+        # always has one free: no pool timeout, queued calls just wait
+        http_timeout = httpx.Timeout(timeout, pool=None)
+        self.http_client = httpx.Client(
+            transport=LimitedTransport(httpx.HTTPTransport(limits=limits), self.limit),
+            timeout=http_timeout)
+        self.http_async_client = httpx.AsyncClient(
+            transport=AsyncLimitedTransport(httpx.AsyncHTTPTransport(limits=limits), self.limit),
+            timeout=http_timeout)
+
+        self.metrics = LLMMetrics()
+        self._clients: Dict = {}
+        self._lock = threading.Lock()
+
+    def chat(self, temperature=0.1, purpose="answer") -> ChatOpenAI:
+        """A cached ChatOpenAI for this temperature/purpose on the shared pool"""
+        key = (temperature, purpose)
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                client = ChatOpenAI(
+                    model=self.model,
+                    base_url=self.base_url,
+                    api_key=self.api_key,
+                    default_headers=DEFAULT_HEADERS,
+                    temperature=temperature,
+                    timeout=self.timeout,
+                    max_retries=self.max_retries,
+                    http_client=self.http_client,
+                    http_async_client=self.http_async_client,
+                    stream_usage=True,
+                    callbacks=[self.metrics],
+                    metadata={"llm_purpose": purpose}
+                )
+                self._clients[key] = client
+        return client
+
+    def stats(self) -> Dict:
+        return {
+            "base_url": self.base_url,
+            "model": self.model,
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self.limit.in_flight,
+            "peak_in_flight": self.limit.peak,
+            "queued_calls": self.limit.waited,
+            "timeout_s": self.timeout,
+            "max_retries": self.max_retries,
+            "calls": self.metrics.snapshot()
+        }
+
+
+_gateway: Optional[LLMGateway] = None
+_gateway_lock = threading.Lock()
+
+
+def get_gateway() -> LLMGateway:
+    """Process-wide gateway shared by the bot and the quality checker"""
+    global _gateway
+    with _gateway_lock:
+        if _gateway is None:
+            _gateway = LLMGateway()
+    return _gateway
@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+"""
+Incremental r/giki Crawler
+Appends new posts and comments to a JSONL log, remembering a high-water mark
+so each run only fetches what is new. Compaction merges the log into the
+posts JSON used by the document index and updates the local Reddit index.
+
+    python reddit_crawler.py crawl --workers 4
+    python reddit_crawler.py compact
+"""
+
+import os
+import json
+import time
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, Iterable, List
+
+from reddit_index import REDDIT_DUMP_PATH, post_url
+
+CRAWL_LOG_PATH = os.path.join("data", "giki_posts.jsonl")
+CRAWL_STATE_PATH = os.path.join("data", "crawler_state.json")
+
+
+def reddit_from_env():
+    import praw
+    return praw.Reddit(
+        client_id=os.getenv("REDDIT_CLIENT_ID"),
+        client_secret=os.getenv("REDDIT_CLIENT_SECRET"),
+        refresh_token=os.getenv("REDDIT_REFRESH_TOKEN"),
+        user_agent=os.getenv("REDDIT_USER_AGENT")
+    )
+
+
+def comment_record(comment) -> Dict:
+    return {
+        "id": comment.id,
+        "parent_id": comment.parent_id,
+        "body": comment.body,
+        "author": str(comment.author),
+        "created_utc": comment.created_utc
+    }
+
+
+# -----------------------------
+# Rate limiting
+# -----------------------------
+class RateLimitPacer:
+    """
+    Spreads requests evenly over Reddit's rate-limit window using the
+    remaining/reset values PRAW reports after every response.
+    """
+
+    def __init__(self, min_remaining=5, max_delay=60.0):
+        self.min_remaining = min_remaining
+        self.max_delay = max_delay
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+
+    def wait(self, reddit):
+        limits = getattr(getattr(reddit, "auth", None), "limits", None) or {}
+        remaining = limits.get("remaining")
+        reset = limits.get("reset_timestamp")
+
+        with self._lock:
+            now = time.time()
+            if remaining is None or reset is None:
+                delay = 0.0
+            elif remaining <= self.min_remaining:
+                delay = reset - now  # budget exhausted, wait for the window to reset
+            else:
+                delay = (reset - now) / remaining
+            delay = min(max(delay, 0.0), self.max_delay)
+
+            # Hand out slots one after another so concurrent workers don't burst
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + delay
+        sleep_for = slot - time.time()
+        if sleep_for > 0:
+            time.sleep(sleep_for)
+
+
+# -----------------------------
+# Crawler
+# -----------------------------
+class SubredditCrawler:
+    def __init__(self, reddit_factory: Callable = reddit_from_env, subreddit="giki",
+                 log_path=CRAWL_LOG_PATH, state_path=CRAWL_STATE_PATH,
+                 workers=4, retries=3):
+        self.reddit_factory = reddit_factory
+        self.subreddit = subreddit
+        self.log_path = log_path
+        self.state_path = state_path
+        self.workers = workers
+        self.retries = retries
+        self.pacer = RateLimitPacer()
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+
+    # PRAW clients aren't thread-safe, so every worker thread gets its own
+    def _reddit(self):
+        if not hasattr(self._local, "reddit"):
+            self._local.reddit = self.reddit_factory()
+        return self._local.reddit
+
+    def load_state(self) -> Dict:
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {"post_hwm": 0.0, "post_hwm_id": None,
+                    "comment_hwm": 0.0, "comment_hwm_id": None,
+                    "compacted_bytes": 0}
+
+    def save_state(self, state: Dict):
+        os.makedirs(os.path.dirname(self.state_path) or ".", exist_ok=True)
+        tmp = self.state_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(tmp, self.state_path)
+
+    def _append(self, records: Iterable[Dict]):
+        lines = "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records)
+        if not lines:
+            return
+        with self._write_lock:
+            os.makedirs(os.path.dirname(self.log_path) or ".", exist_ok=True)
+            with open(self.log_path, "a", encoding="utf-8") as f:
+                f.write(lines)
+                f.flush()
+
+    def _logged_post_ids(self, since_bytes=0) -> set:
+        """Ids of full post records already in the log, used to resume an interrupted run"""
+        ids = set()
+        try:
+            with open(self.log_path, "r", encoding="utf-8") as f:
+                f.seek(since_bytes)
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue  # partial line from a crash
+                    if "title" in record:
+                        ids.add(record["id"])
+        except OSError:
+            pass
+        return ids
+
+    def _with_retries(self, fn, *args):
+        from prawcore.exceptions import TooManyRequests, ServerError, RequestException
+
+        for attempt in range(self.retries + 1):
+            try:
+                self.pacer.wait(self._reddit())
+                return fn(*args)
+            except (TooManyRequests, ServerError, RequestException):
+                if attempt == self.retries:
+                    raise
+                time.sleep(2 ** attempt)
+
+    def _fetch_post(self, post_id: str) -> Dict:
+        """Expand every comment of one post (runs on a worker thread)"""
+        def fetch():
+            submission = self._reddit().submission(id=post_id)
+            submission.comments.replace_more(limit=None)
+            return {
+                "id": submission.id,
+                "title": submission.title,
+                "selftext": submission.selftext,
+                "author": str(submission.author),
+                "created_utc": submission.created_utc,
+                "url": post_url(submission.id, self.subreddit),
+                "comments": [comment_record(c) for c in submission.comments.list()]
+            }
+        return self._with_retries(fetch)
+
+    def crawl_posts(self, state: Dict, limit=None) -> int:
+        """
+        Fetch posts newer than the post high-water mark, expanding comments
+        concurrently. A run stopped by limit before it reached the old mark
+        saves where it got to and the next run continues from there.
+        """
+        already_logged = self._logged_post_ids(state.get("compacted_bytes", 0))
+        subreddit = self._reddit().subreddit(self.subreddit)
+        resume_after = state.get("post_resume_after")
+        params = {"after": resume_after} if resume_after else {}
+
+        pending = []
+        newest = tuple(state.get("post_pending_hwm") or (state["post_hwm"], state["post_hwm_id"]))
+        listed, reached_mark, oldest = 0, False, None
+        for submission in subreddit.new(limit=limit, params=params):
+            listed += 1
+            if submission.created_utc < state["post_hwm"] or submission.id == state["post_hwm_id"]:
+                reached_mark = True
+                break  # listing is newest-first, everything older was crawled before
+            oldest = submission
+            if submission.created_utc > newest[0]:
+                newest = (submission.created_utc, submission.id)
+            if submission.id not in already_logged:
+                pending.append(submission.id)
+
+        fetched = 0
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            futures = [pool.submit(self._fetch_post, post_id) for post_id in pending]
+            for future in as_completed(futures):
+                self._append([future.result()])
+                fetched += 1
+
+        # Only advance the mark once the whole gap down to it has been written
+        if reached_mark or limit is None or listed < limit:
+            state["post_hwm"], state["post_hwm_id"] = newest
+            state.pop("post_pending_hwm", None)
+            state.pop("post_resume_after", None)
+        else:
+            state["post_pending_hwm"] = list(newest)
+            state["post_resume_after"] = oldest.fullname if oldest else resume_after
+        self.save_state(state)
+        return fetched
+
+    def crawl_comments(self, state: Dict, limit=None) -> int:
+        """Fetch new comments on older posts using the subreddit-wide comment listing"""
+        by_post: Dict[str, List[Dict]] = {}
+        newest = (state["comment_hwm"], state["comment_hwm_id"])
+
+        self.pacer.wait(self._reddit())
+        for comment in self._reddit().subreddit(self.subreddit).comments(limit=limit):
+            if comment.created_utc < state["comment_hwm"] or comment.id == state["comment_hwm_id"]:
+                break
+            if comment.created_utc > newest[0]:
+                newest = (comment.created_utc, comment.id)
+            post_id = comment.link_id.split("_", 1)[-1]
+            by_post.setdefault(post_id, []).append(comment_record(comment))
+
+        # Partial records: no title, merged into the full post at compaction
+        self._append({"id": post_id, "comments": comments} for post_id, comments in by_post.items())
+        state["comment_hwm"], state["comment_hwm_id"] = newest
+        self.save_state(state)
+        return sum(len(c) for c in by_post.values())
+
+    def crawl(self, limit=None) -> Dict:
+        state = self.load_state()
+        started = time.time()
+        posts = self.crawl_posts(state, limit=limit)
+        if not state["comment_hwm"]:
+            # A first crawl expanded every comment that existed when it started
+            state["comment_hwm"] = started
+            self.save_state(state)
+            return {"posts": posts, "comments": 0}
+        return {"posts": posts, "comments": self.crawl_comments(state, limit=limit)}
+
+    # -----------------------------
+    # Compaction
+    # -----------------------------
+    def compact(self, dump_path=REDDIT_DUMP_PATH, reddit_index=None) -> Dict:
+        """
+        Merge the log into the existing posts JSON (one record per post),
+        rewrite the log compacted, write the merged posts JSON for the
+        document index and feed changed posts into the Reddit vector index.
+        """
+        state = self.load_state()
+        # Posts dumped before the log existed (or by an older crawler) are kept
+        try:
+            with open(dump_path, "r", encoding="utf-8") as f:
+                posts: Dict[str, Dict] = {p["id"]: p for p in json.load(f)}
+        except (OSError, ValueError):
+            posts = {}
+        touched = set()
+        offset = 0
+        try:
+            with open(self.log_path, "r", encoding="utf-8") as f:
+                for line in iter(f.readline, ""):
+                    offset += len(line.encode("utf-8"))
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue
+                    post = posts.setdefault(record["id"], {"id": record["id"], "comments": []})
+                    comments = {c["id"]: c for c in post["comments"]}
+                    comments.update((c["id"], c) for c in record.get("comments", []))
+                    post.update({k: v for k, v in record.items() if k != "comments"})
+                    post["comments"] = sorted(comments.values(), key=lambda c: c.get("created_utc", 0))
+                    if offset > state.get("compacted_bytes", 0):
+                        touched.add(record["id"])
+        except OSError:
+            if not posts:
+                return {"posts": 0, "updated": 0}
+
+        # Comments whose post was never crawled have nothing to attach to
+        merged = sorted((p for p in posts.values() if "title" in p),
+                        key=lambda p: p.get("created_utc", 0), reverse=True)
+
+        tmp = self.log_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            for post in merged:
+                f.write(json.dumps(post, ensure_ascii=False) + "\n")
+        with self._write_lock:
+            os.replace(tmp, self.log_path)
+        state["compacted_bytes"] = os.path.getsize(self.log_path)
+        self.save_state(state)
+
+        tmp = dump_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(merged, f, ensure_ascii=False)
+        os.replace(tmp, dump_path)
+
+        changed = [p for p in merged if p["id"] in touched]
+        if reddit_index is not None:
+            if len(reddit_index) or reddit_index.load():
+                reddit_index.add_posts(changed)
+            else:
+                reddit_index.build(merged)
+        return {"posts": len(merged), "updated": len(changed)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Incrementally crawl r/giki.")
+    parser.add_argument("command", choices=["crawl", "compact"])
+    parser.add_argument("--workers", type=int, default=4, help="concurrent comment expansions")
+    parser.add_argument("--limit", type=int, default=None, help="max listing items per run")
+    parser.add_argument("--no-index", action="store_true",
+                        help="compact: don't update the local Reddit index")
+    args = parser.parse_args()
+
+    crawler = SubredditCrawler(workers=args.workers)
+    if args.command == "crawl":
+        counts = crawler.crawl(limit=args.limit)
+        print(f"Fetched {counts['posts']} new posts and {counts['comments']} new comments")
+    else:
+        index = None
+        if not args.no_index:
+            from reddit_index import RedditIndex, _load_embeddings
+            index = RedditIndex(_load_embeddings())
+        counts = crawler.compact(reddit_index=index)
+        print(f"Compacted {counts['posts']} posts ({counts['updated']} updated) into {REDDIT_DUMP_PATH}")
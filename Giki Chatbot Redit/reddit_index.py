@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+"""
+Local Reddit Corpus Index
+Chunks r/giki posts and comments, precomputes their embeddings and answers
+queries with a single vectorized search instead of live PRAW searches.
+
+Build from the fetched dump and keep it fresh with incremental syncs:
+    python reddit_index.py build
+    python reddit_index.py sync --every 3600
+"""
+
+import os
+import json
+import time
+import argparse
+from typing import Dict, List, Optional
+
+import numpy as np
+
+REDDIT_INDEX_PATH = "reddit_index"
+REDDIT_DUMP_PATH = os.path.join("data", "giki_fetched_posts.json")
+
+# Data file names of indexes saved before the manifest named them
+EMBEDDINGS_FILE = "embeddings.npy"
+CHUNKS_FILE = "chunks.jsonl"
+MANIFEST_FILE = "manifest.json"
+
+
+def post_url(post_id: str, subreddit: str = "giki") -> str:
+    return f"https://www.reddit.com/r/{subreddit}/comments/{post_id}/"
+
+
+def comment_threads(comments) -> List[List[Dict]]:
+    """
+    Group comments into threads: a top-level comment followed by its replies.
+    Replies are matched by parent_id; comments without one (older dumps)
+    each start their own thread. Deleted and empty comments are dropped.
+    """
+    threads, thread_of = [], {}
+    for comment in comments or []:
+        if not isinstance(comment, dict):
+            continue
+        body = comment.get("body", "")
+        if not body or body in ("[deleted]", "[removed]"):
+            continue
+        parent = comment.get("parent_id") or ""
+        thread = thread_of.get(parent[3:]) if parent.startswith("t1_") else None
+        if thread is None:
+            thread = len(threads)
+            threads.append([])
+        threads[thread].append(comment)
+        thread_of[comment.get("id")] = thread
+    return threads
+
+
+class RedditIndex:
+    def __init__(self, embeddings_model, index_path=REDDIT_INDEX_PATH, chunk_size=800, subreddit="giki"):
+        self.embeddings_model = embeddings_model
+        self.index_path = index_path
+        self.chunk_size = chunk_size
+        self.subreddit = subreddit
+
+        self.chunks: List[Dict] = []
+        self.vectors = np.zeros((0, 0), dtype=np.float32)
+        self.latest_created_utc = 0.0
+        self._manifest_mtime = None
+
+    def __len__(self):
+        return len(self.chunks)
+
+    # -----------------------------
+    # Chunking
+    # -----------------------------
+    def _split(self, text: str) -> List[str]:
+        """Split long text into chunk_size windows on whitespace"""
+        pieces, current = [], ""
+        for word in text.split():
+            if current and len(current) + len(word) + 1 > self.chunk_size:
+                pieces.append(current)
+                current = word
+            else:
+                current = f"{current} {word}" if current else word
+        if current:
+            pieces.append(current)
+        return pieces
+
+    def chunk_post(self, post: Dict) -> List[Dict]:
+        """One or more chunks for the post body, then comment threads grouped up to chunk_size"""
+        post_id = post.get("id", "")
+        title = post.get("title", "")
+        base = {
+            "post_id": post_id,
+            "title": title,
+            "url": post.get("url") or post_url(post_id, self.subreddit),
+            "created_utc": post.get("created_utc", 0.0),
+        }
+
+        chunks = []
+        for piece in self._split(post.get("selftext", "")) or [""]:
+            chunks.append({**base, "kind": "post", "text": piece})
+
+        # Threads are packed whole; only a thread longer than chunk_size is split
+        group = ""
+        for thread in comment_threads(post.get("comments", [])):
+            for piece in self._split("\n".join(c["body"] for c in thread)):
+                if group and len(group) + len(piece) + 1 > self.chunk_size:
+                    chunks.append({**base, "kind": "comments", "text": group})
+                    group = piece
+                else:
+                    group = f"{group}\n{piece}" if group else piece
+        if group:
+            chunks.append({**base, "kind": "comments", "text": group})
+        return chunks
+
+    @staticmethod
+    def _embedding_text(chunk: Dict) -> str:
+        return f"{chunk['title']}\n{chunk['text']}"
+
+    # -----------------------------
+    # Building / updating
+    # -----------------------------
+    def _embed_chunks(self, chunks: List[Dict]) -> np.ndarray:
+        if not chunks:
+            return np.zeros((0, self.vectors.shape[1] if self.vectors.size else 0), dtype=np.float32)
+        vectors = np.asarray(
+            self.embeddings_model.embed_documents([self._embedding_text(c) for c in chunks]),
+            dtype=np.float32
+        )
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+    def build(self, posts: List[Dict]) -> int:
+        """Rebuild the whole index from a list of post dicts and save it"""
+        self.chunks = [c for post in posts if isinstance(post, dict) for c in self.chunk_post(post)]
+        self.vectors = self._embed_chunks(self.chunks)
+        self.latest_created_utc = max((c["created_utc"] for c in self.chunks), default=0.0)
+        self.save()
+        return len(self.chunks)
+
+    def build_from_dump(self, dump_path=REDDIT_DUMP_PATH) -> int:
+        with open(dump_path, "r", encoding="utf-8") as f:
+            posts = json.load(f)
+        return self.build(posts)
+
+    def add_posts(self, posts: List[Dict]) -> int:
+        """Append posts to the index, replacing any chunks already stored for them"""
+        new_ids = {p.get("id") for p in posts}
+        keep = [i for i, c in enumerate(self.chunks) if c["post_id"] not in new_ids]
+        new_chunks = [c for post in posts for c in self.chunk_post(post)]
+        new_vectors = self._embed_chunks(new_chunks)
+
+        kept_vectors = self.vectors[keep] if self.vectors.size else new_vectors[:0]
+        self.chunks = [self.chunks[i] for i in keep] + new_chunks
+        self.vectors = np.vstack([kept_vectors, new_vectors]) if len(new_chunks) else kept_vectors
+        self.latest_created_utc = max(
+            [self.latest_created_utc] + [c["created_utc"] for c in new_chunks]
+        )
+        self.save()
+        return len(new_chunks)
+
+    def sync(self, reddit, limit=None) -> int:
+        """
+        Incremental sync: pull only posts newer than the latest indexed
+        created_utc from the live API. Returns the number of new posts.
+        """
+        new_posts = []
+        for submission in reddit.subreddit(self.subreddit).new(limit=limit):
+            if submission.created_utc <= self.latest_created_utc:
+                break  # listing is newest-first
+            submission.comments.replace_more(limit=0)
+            new_posts.append({
+                "id": submission.id,
+                "title": submission.title,
+                "selftext": submission.selftext,
+                "url": post_url(submission.id, self.subreddit),
+                "created_utc": submission.created_utc,
+                "comments": [{"body": c.body} for c in submission.comments.list()],
+            })
+
+        if new_posts:
+            self.add_posts(new_posts)
+        return len(new_posts)
+
+    # -----------------------------
+    # Persistence
+    # -----------------------------
+    def _path(self, name: str) -> str:
+        return os.path.join(self.index_path, name)
+
+    def save(self):
+        """
+        Write embeddings and chunks under a new version's file names, then
+        the manifest naming them via an atomic rename. A reader that goes by
+        the manifest always gets a matching pair, even mid-save.
+        """
+        os.makedirs(self.index_path, exist_ok=True)
+        version = f"{time.time_ns():x}"
+        embeddings_file = f"embeddings.{version}.npy"
+        chunks_file = f"chunks.{version}.jsonl"
+
+        with open(self._path(embeddings_file), "wb") as f:
+            np.save(f, self.vectors)
+        with open(self._path(chunks_file), "w", encoding="utf-8") as f:
+            for chunk in self.chunks:
+                f.write(json.dumps(chunk, ensure_ascii=False) + "\n")
+
+        tmp = self._path(MANIFEST_FILE + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({
+                "chunks": len(self.chunks),
+                "posts": len({c["post_id"] for c in self.chunks}),
+                "latest_created_utc": self.latest_created_utc,
+                "updated_at": time.time(),
+                "embeddings_file": embeddings_file,
+                "chunks_file": chunks_file,
+            }, f)
+        os.replace(tmp, self._path(MANIFEST_FILE))
+        self._manifest_mtime = os.path.getmtime(self._path(MANIFEST_FILE))
+        self._remove_old_versions(keep={embeddings_file, chunks_file})
+
+    def _remove_old_versions(self, keep):
+        # A reader holding the previous manifest fails to open its files and
+        # retries with the new one on its next search
+        for name in os.listdir(self.index_path):
+            stale = name.startswith(("embeddings.", "chunks.")) and name not in keep
+            if stale and not name.endswith(".tmp"):
+                try:
+                    os.remove(self._path(name))
+                except OSError:
+                    pass
+
+    def load(self) -> bool:
+        """Load a saved index. Returns False if there is none (or it is being replaced)."""
+        if not os.path.exists(self._path(MANIFEST_FILE)):
+            return False
+        try:
+            mtime = os.path.getmtime(self._path(MANIFEST_FILE))
+            with open(self._path(MANIFEST_FILE), "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+            with open(self._path(manifest.get("chunks_file", CHUNKS_FILE)), "r", encoding="utf-8") as f:
+                chunks = [json.loads(line) for line in f if line.strip()]
+            vectors = np.load(self._path(manifest.get("embeddings_file", EMBEDDINGS_FILE)))
+        except Exception:
+            return False
+        if not len(chunks) == len(vectors) == manifest.get("chunks", len(chunks)):
+            return False
+
+        self.chunks = chunks
+        self.vectors = vectors
+        self.latest_created_utc = manifest.get("latest_created_utc", 0.0)
+        self._manifest_mtime = mtime
+        return True
+
+    def _reload_if_changed(self):
+        """Pick up syncs written by a separate process"""
+        try:
+            mtime = os.path.getmtime(self._path(MANIFEST_FILE))
+        except OSError:
+            return
+        if mtime != self._manifest_mtime:
+            self.load()
+
+    # -----------------------------
+    # Search
+    # -----------------------------
+    def search(self, query: str, top_n=5, query_embedding=None) -> List[Dict]:
+        """
+        Return up to top_n posts ranked by their best-matching chunk.
+        Each result's selftext holds that chunk's text.
+        """
+        self._reload_if_changed()
+        if not self.chunks:
+            return []
+
+        if query_embedding is None:
+            query_embedding = self.embeddings_model.embed_query(query)
+        q = np.asarray(query_embedding, dtype=np.float32)
+        q = q / max(float(np.linalg.norm(q)), 1e-12)
+
+        scores = self.vectors @ q
+
+        # Several chunks can belong to one post, so over-fetch before deduping
+        k = min(len(scores), top_n * 4)
+        candidates = np.argpartition(-scores, k - 1)[:k]
+        candidates = candidates[np.argsort(-scores[candidates])]
+
+        results, seen = [], set()
+        for i in candidates:
+            chunk = self.chunks[i]
+            if chunk["post_id"] in seen:
+                continue
+            seen.add(chunk["post_id"])
+            results.append({
+                "id": chunk["post_id"],
+                "title": chunk["title"],
+                "selftext": chunk["text"],
+                "url": chunk["url"],
+                "score": float(scores[i]),
+            })
+            if len(results) == top_n:
+                break
+        return results
+
+
+def _load_embeddings():
+    from embedding_service import EmbeddingService
+    return EmbeddingService()
+
+
+def _reddit_client():
+    import praw
+    return praw.Reddit(
+        client_id=os.getenv("REDDIT_CLIENT_ID"),
+        client_secret=os.getenv("REDDIT_CLIENT_SECRET"),
+        refresh_token=os.getenv("REDDIT_REFRESH_TOKEN"),
+        user_agent=os.getenv("REDDIT_USER_AGENT")
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage the local r/giki vector index.")
+    parser.add_argument("command", choices=["build", "sync"])
+    parser.add_argument("--dump", default=REDDIT_DUMP_PATH, help="posts JSON used by build")
+    parser.add_argument("--index", default=REDDIT_INDEX_PATH, help="index directory")
+    parser.add_argument("--every", type=int, default=0,
+                        help="sync: repeat every N seconds instead of running once")
+    args = parser.parse_args()
+
+    index = RedditIndex(_load_embeddings(), index_path=args.index)
+
+    if args.command == "build":
+        count = index.build_from_dump(args.dump)
+        print(f"Indexed {count} chunks from {args.dump}")
+    else:
+        if not index.load():
+            index.build_from_dump(args.dump)
+        reddit = _reddit_client()
+        while True:
+            added = index.sync(reddit)
+            print(f"Synced {added} new posts (latest created_utc {index.latest_created_utc})")
+            if args.every <= 0:
+                break
+            time.sleep(args.every)
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Offline Retrieval Quality Benchmark
+Runs a fixed question set against the saved FAISS index with each retriever
+mode and reports hit rate, MRR and how many queries would likely fall back
+to Reddit. Needs only the local index and embedding model, no API keys.
+
+    python retrieval_benchmark.py
+    python retrieval_benchmark.py --rerank cross-encoder/ms-marco-MiniLM-L-6-v2
+"""
+
+import json
+import time
+import argparse
+
+from hybrid_retriever import BM25Index, CrossEncoderReranker, HybridRetriever
+
+# (question, sources that answer it). Several handbooks share content, so a
+# question can be answered by more than one file.
+BENCHMARK_QUESTIONS = [
+    ("How do I apply for GIKI admissions?", ["GIKI_Admissions_FAQ_and_Instructions.pdf"]),
+    ("Can ICS students apply for engineering programs?", ["GIKI_Admissions_FAQ_and_Instructions.pdf"]),
+    ("My parents have no income proof, what should I submit for financial assistance?",
+     ["GIKI_Admissions_FAQ_and_Instructions.pdf"]),
+    ("Can FSc pre-medical students apply for computing programs?", ["GIKI_Admissions_FAQ_and_Instructions.pdf"]),
+    ("Where is GIKI located?", ["GIKI_Admissions_FAQ_and_Instructions.pdf"]),
+    ("What is the SDP marking scheme for the project advisor?",
+     ["FES_Senior_Design_Project_Handbook_Spring_2024_TEXT_ONLY.pdf"]),
+    ("How much weight does the Industrial Open House carry in the senior design project?",
+     ["FES_Senior_Design_Project_Handbook_Spring_2024_TEXT_ONLY.pdf"]),
+    ("Who is eligible to supervise an SDP?", ["FES_Senior_Design_Project_Handbook_Spring_2024_TEXT_ONLY.pdf"]),
+    ("Within how many days must a TA upload attendance on CMS?", ["FES_TA_Best_Practices_Handbook.pdf"]),
+    ("What are the typical tasks of a teaching assistant?", ["FES_TA_Best_Practices_Handbook.pdf"]),
+    ("How often do alumni mentors communicate with their mentee?", ["FES_ES_Mentorship_Alumni_Handbook.pdf"]),
+    ("What does the TeachWell program include for instructors?", ["FES_TeachWell_Program.pdf"]),
+    ("Which DEI courses does the professional training program recommend?",
+     ["FES_Professional_Training_Program.pdf"]),
+    ("What are the responsibilities of a batch advisor?",
+     ["FES_Advisory_Handbook.pdf", "FES_Advising_and_Mentorship_Handbook.pdf"]),
+    ("What should an instructor do before the course starts?",
+     ["FES_Best_Practices_in_Course_Management.pdf", "FES_Pedagogy_and_Teaching_Pack.pdf"]),
+    ("What compliance level is asked about the course outline in the mid-semester self-assessment form?",
+     ["Instructor_Self_Assessment_Form_Mid_Semester.pdf"]),
+]
+
+
+def evaluate(retriever, questions, threshold):
+    hits, reciprocal_ranks, fallbacks, latencies = 0, 0.0, 0, []
+    per_question = []
+
+    for question, expected in questions:
+        started = time.perf_counter()
+        docs = retriever.invoke(question)
+        latencies.append((time.perf_counter() - started) * 1000)
+
+        sources = [doc.metadata.get("source") for doc in docs]
+        rank = next((i + 1 for i, source in enumerate(sources) if source in expected), None)
+        top_score = max((doc.metadata.get("relevance_score") or 0.0 for doc in docs), default=0.0)
+
+        # Missing the right document or a weak top score both send the bot to Reddit
+        fallback = rank is None or top_score < threshold
+        hits += rank is not None
+        reciprocal_ranks += 1.0 / rank if rank else 0.0
+        fallbacks += fallback
+        per_question.append({"question": question, "rank": rank, "top_score": round(top_score, 3),
+                             "fallback": fallback})
+
+    n = len(questions)
+    latencies.sort()
+    return {
+        "hit_rate": round(hits / n, 3),
+        "mrr": round(reciprocal_ranks / n, 3),
+        "fallbacks_per_query": round(fallbacks / n, 3),
+        "latency_ms_p50": round(latencies[n // 2], 2),
+        "latency_ms_max": round(latencies[-1], 2),
+        "questions": per_question
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare GIKI retriever modes offline.")
+    parser.add_argument("--index", default="faiss_index", help="saved FAISS index directory")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--threshold", type=float, default=0.35,
+                        help="weak-retrieval threshold (chatbot.LOW_RETRIEVAL_SCORE)")
+    parser.add_argument("--rerank", default="", help="cross-encoder model to also benchmark reranking")
+    parser.add_argument("--budget-ms", type=int, default=150, help="reranker latency budget")
+    parser.add_argument("--verbose", action="store_true", help="include per-question results")
+    args = parser.parse_args()
+
+    from embedding_service import EmbeddingService
+    from vector_index import load_vectorstore
+
+    embeddings = EmbeddingService()
+    vectorstore = load_vectorstore(args.index, embeddings)
+    bm25 = BM25Index.load(args.index) or BM25Index.from_vectorstore(vectorstore)
+
+    modes = {
+        "similarity": HybridRetriever(vectorstore=vectorstore, k=args.k),
+        "hybrid": HybridRetriever(vectorstore=vectorstore, bm25=bm25, k=args.k),
+    }
+    if args.rerank:
+        reranker = CrossEncoderReranker(args.rerank, budget_ms=args.budget_ms)
+        modes["hybrid+rerank"] = HybridRetriever(vectorstore=vectorstore, bm25=bm25, reranker=reranker, k=args.k)
+
+    report = {}
+    for name, retriever in modes.items():
+        result = evaluate(retriever, BENCHMARK_QUESTIONS, args.threshold)
+        if not args.verbose:
+            result.pop("questions")
+        report[name] = result
+
+    print(json.dumps(report, indent=2))
@@ -1,9 +1,12 @@
 # server.py
 import os
-import shutil
+import sys
+import time
+import asyncio
 import argparse
+import threading
 from mcp.server import FastMCP
-from chatbot import GIKIbot  # imports your existing class
+from mcp.server.fastmcp import Context
 from pathlib import Path
 import logging
 
@@ -11,6 +14,10 @@ import logging
 # Ensure working directory is project root
 os.chdir(os.path.dirname(__file__))
 
+# Shared instrumentation lives at the repository root
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from instrumentation import METRICS
+
 
 # --- Setup logging to file instead of STDIO ---
 logging.basicConfig(
@@ -24,23 +31,117 @@ INDEX_PATH = "faiss_index"
 
 # Create MCP server object
 mcp = FastMCP(name="GIKI-RAG-MCP")
+METRICS.service = "giki"
+
+# --- GIKIbot warm-up ---
+# The GIKIbot singleton (models, FAISS, LLM) is created by warm_up(). In
+# fast-start and HTTP mode that runs on a background thread so the MCP handshake is
+# answered immediately, and tools wait for it to finish. Launchers that import
+# this module and run mcp themselves (mcp run, mcp dev) start it on the first
+# tool call.
+bot = None
+bot_ready = threading.Event()
+startup = {"state": "pending", "message": None, "phases_ms": {}}
+_warm_up_lock = threading.Lock()
+_warm_up_started = False
+
+# How long a tool call waits for a warm-up in progress
+WARMUP_WAIT_SECONDS = 120
+
+
+def _elapsed_ms(started: float) -> float:
+    return round((time.perf_counter() - started) * 1000, 1)
+
+
+def warm_up():
+    global bot
+    # Note: removed prints to STDIO to avoid JSON errors
+    logging.info("Initializing GIKIbot...")
+    startup["state"] = "warming_up"
+    started = time.perf_counter()
+    try:
+        phase = time.perf_counter()
+        from chatbot import GIKIbot  # LangChain, FAISS and torch load here
+        startup["phases_ms"]["import"] = _elapsed_ms(phase)
+
+        instance = GIKIbot()
+        init_msg = instance.initialize_system()
+        startup["phases_ms"].update(instance.startup_timings)
+        startup["message"] = init_msg
+        startup["state"] = "ready" if instance.ready else "failed"
+        bot = instance
+        logging.info(f"System initialized: {init_msg}")
+    except Exception as e:
+        startup["state"] = "failed"
+        startup["message"] = str(e)
+        logging.exception("GIKIbot warm-up failed")
+    finally:
+        startup["phases_ms"]["total"] = _elapsed_ms(started)
+        bot_ready.set()
+
 
-# Initialize your GIKIbot singleton (this will load FAISS / LLM once at startup)
-# Note: removed prints to STDIO to avoid JSON errors
-logging.info("Starting GIKI MCP server — initializing GIKIbot...")
-bot = GIKIbot()
-init_msg = bot.initialize_system()
-logging.info(f"System initialized: {init_msg}")
+def start_warm_up(background: bool):
+    """Run warm_up() once per process; later calls return immediately"""
+    global _warm_up_started
+    with _warm_up_lock:
+        if _warm_up_started:
+            return
+        _warm_up_started = True
+    if background:
+        threading.Thread(target=warm_up, name="giki-warm-up", daemon=True).start()
+    else:
+        warm_up()
+
+
+async def wait_for_bot() -> bool:
+    start_warm_up(background=True)
+    if not bot_ready.is_set():
+        await asyncio.to_thread(bot_ready.wait, WARMUP_WAIT_SECONDS)
+    return bot is not None
+
+
+def not_ready_message() -> str:
+    if startup["state"] == "failed":
+        return f"GIKI bot failed to start: {startup['message']}"
+    return "GIKI bot is still warming up, try again shortly."
 
 # --- Tools exposed to the LLM client (Claude) ---
 
+# Streamed answer text is batched into progress notifications of roughly this size
+STREAM_FLUSH_CHARS = 40
+
+
 @mcp.tool()
-def ask_giki(question: str) -> dict:
-    """Ask a question against the GIKI docs."""
+async def ask_giki(question: str, ctx: Context, collection: str = "") -> dict:
+    """
+    Ask a question against the GIKI docs, or against another document
+    collection by name (see list_collections). Answer text is streamed as
+    progress notifications.
+    """
     if not question or not question.strip():
         return {"error": "empty question"}
+    if not await wait_for_bot():
+        return {"error": not_ready_message()}
+
+    streamed = 0
+    pending = []
+
+    async def flush():
+        nonlocal streamed
+        text = "".join(pending)
+        pending.clear()
+        if text:
+            streamed += len(text)
+            await ctx.report_progress(progress=streamed, message=text)
 
-    raw = bot.ask_question(question)  # returns text + "\n\nSources:\n..."
+    async def on_token(token: str):
+        pending.append(token)
+        if "\n" in token or sum(len(t) for t in pending) >= STREAM_FLUSH_CHARS:
+            await flush()
+
+    raw = await bot.ask_question_stream(question, on_token=on_token, collection=collection or None)
+    # raw is the answer text + "\n\nSources:\n..."
+    await flush()
     # split out Sources block if present
     parts = raw.split("\n\nSources:\n", 1)
     answer_text = parts[0].strip()
@@ -51,44 +152,299 @@ def ask_giki(question: str) -> dict:
     return {"answer": answer_text, "sources": sources}
 
 
+# Latest rebuild job per collection, for rebuild_status
+rebuild_jobs = {}
+rebuild_jobs_lock = threading.Lock()
+
+
 @mcp.tool()
-def rebuild_index() -> str:
-    """Admin tool: delete saved FAISS index and rebuild from files."""
-    idx = Path(INDEX_PATH)
-    if idx.exists():
-        try:
-            shutil.rmtree(idx)
-        except Exception as e:
-            logging.error(f"Error removing index: {e}")
-            return f"Error removing index: {e}"
+def rebuild_index(collection: str = "") -> dict:
+    """
+    Admin tool: rebuild a collection's FAISS index (default: giki) from its
+    files in the background. Queries keep using the current index until the
+    new one is swapped in; follow progress with rebuild_status.
+    """
+    if HTTP_WORKERS > 1:
+        # Only the worker that took this call would load the new index (and
+        # know about the job); the others would keep serving the old one
+        return {"error": f"rebuild_index is disabled with {HTTP_WORKERS} HTTP workers; "
+                         "run the server with --workers 1 (or stdio) to rebuild, then restart the workers"}
+    start_warm_up(background=True)
+    if bot is None:
+        return {"error": not_ready_message()}
+
+    from collection_manager import CollectionError, RebuildJob
+    try:
+        name = bot.collections.describe(collection or None).name
+    except CollectionError as e:
+        return {"error": str(e)}
+
+    with rebuild_jobs_lock:
+        job = rebuild_jobs.get(name)
+        if job is not None and job.running:
+            return {"status": "already_running", **job.snapshot()}
+        job = RebuildJob(name)
+        rebuild_jobs[name] = job
+    job.start(bot.rebuild_collection_index)
+    logging.info(f"Started index rebuild for collection {name}")
+    return {"status": "started", **job.snapshot()}
+
+
+@mcp.tool()
+def rebuild_status(collection: str = "") -> dict:
+    """Progress of the latest rebuild_index job for a collection, or of all jobs when none is given."""
+    with rebuild_jobs_lock:
+        jobs = dict(rebuild_jobs)
+    if collection:
+        job = jobs.get(collection)
+        return job.snapshot() if job else {"collection": collection, "state": "idle"}
+    return {"jobs": [job.snapshot() for job in jobs.values()]}
+
+
+@mcp.tool()
+def list_collections() -> dict:
+    """List the document collections that ask_giki can answer from, and which are loaded."""
+    start_warm_up(background=True)
+    if bot is None:
+        return {"error": not_ready_message()}
 
-    return bot.initialize_system()
+    from vector_index import read_manifest
+    stats = bot.collections.stats()
+    collections = {}
+    for name in stats["collections"]:
+        try:
+            manifest = read_manifest(bot.collections.describe(name).index_path) or {}
+        except Exception:
+            manifest = {}
+        collections[name] = {
+            "loaded": name in stats["resident"],
+            "chunks": manifest.get("count"),
+            "index_type": manifest.get("index_type"),
+            "built_at": manifest.get("created_at")
+        }
+    return {"collections": collections, "max_resident": stats["max_resident"]}
 
 
 @mcp.tool()
 def health() -> dict:
-    """Simple health check for monitoring."""
+    """Simple health check for monitoring, with startup-phase timings and LLM call metrics."""
+    start_warm_up(background=True)
+    index = None
+    if bot is not None:
+        from vector_index import read_manifest
+        index = read_manifest(INDEX_PATH)
     return {
-        "status": "ok",
-        "initialized": bool(bot.qa_chain),
-        "faiss_exists": Path(INDEX_PATH).exists()
+        "status": "ok" if startup["state"] == "ready" else startup["state"],
+        "initialized": bool(bot and bot.ready),
+        "faiss_exists": Path(INDEX_PATH).exists(),
+        "index": index,
+        "startup": startup,
+        "embeddings": bot.embeddings.stats() if bot else None,
+        "collections": bot.collections.stats() if bot else None,
+        "llm": bot.gateway.stats() if bot else None
     }
 
 
+def _metrics():
+    """This process's metrics, or the totals of every HTTP worker"""
+    return METRICS.aggregate(METRICS_DIR) if METRICS_DIR else METRICS
+
+
+@mcp.tool()
+def metrics() -> dict:
+    """Per-stage latency (retrieval, llm, judge, fallback), counters and fallback/cache-hit rates."""
+    aggregated = _metrics()
+    return {**aggregated.snapshot(), "workers": aggregated.workers,
+            "llm": bot.gateway.stats()["calls"] if bot else None}
+
+
+@mcp.custom_route("/metrics", methods=["GET"])
+async def prometheus_metrics(request):
+    """Prometheus scrape endpoint, served in streamable-http mode"""
+    from starlette.responses import PlainTextResponse
+    return PlainTextResponse(_metrics().prometheus_text(), media_type="text/plain; version=0.0.4")
+
+
+# --- HTTP deployment ---
+# In streamable-http mode uvicorn runs HTTP_WORKERS processes, each with its
+# own GIKIbot over the same read-only, memory-mapped index (the OS page cache
+# shares it between them). The MCP endpoint is stateless, so any worker can
+# answer any request: with several workers, rebuild_index is disabled and
+# metrics are summed over all of them through METRICS_DIR. The CLI flags
+# below set these through the environment so that worker processes see them too.
+HTTP_WORKERS = int(os.getenv("GIKI_HTTP_WORKERS", "1"))
+# Where each worker writes its metrics state (set by run_http for several workers)
+METRICS_DIR = os.getenv("GIKI_METRICS_DIR")
+METRICS_WRITE_SECONDS = 5
+# In-flight MCP requests allowed per client address, per worker
+CLIENT_MAX_CONCURRENCY = int(os.getenv("GIKI_CLIENT_MAX_CONCURRENCY", "4"))
+# How long shutdown waits for in-flight requests before closing them
+GRACEFUL_SHUTDOWN_SECONDS = int(os.getenv("GIKI_GRACEFUL_SHUTDOWN_SECONDS", "30"))
+# Host header values accepted when binding to a non-loopback address
+ALLOWED_HOSTS = [h.strip() for h in os.getenv("GIKI_ALLOWED_HOSTS", "").split(",") if h.strip()]
+
+LOOPBACK_HOSTS = ("127.0.0.1", "localhost", "::1")
+
+
+@mcp.custom_route("/healthz", methods=["GET"])
+async def liveness(request):
+    """Liveness probe: the worker is up and serving HTTP"""
+    from starlette.responses import JSONResponse
+    return JSONResponse({"status": "alive", "pid": os.getpid(), "state": startup["state"]})
+
+
+@mcp.custom_route("/readyz", methods=["GET"])
+async def readiness(request):
+    """Readiness probe: 503 until this worker has finished warming up"""
+    from starlette.responses import JSONResponse
+    ready = startup["state"] == "ready"
+    return JSONResponse({"status": "ready" if ready else startup["state"], "pid": os.getpid(),
+                         "message": None if ready else not_ready_message()},
+                        status_code=200 if ready else 503)
+
+
+class ClientConcurrencyLimit:
+    """ASGI middleware answering 429 once a client has `limit` MCP requests in flight"""
+
+    def __init__(self, app, limit: int, path: str):
+        self.app = app
+        self.limit = limit
+        self.path = path.rstrip("/")
+        self.active = {}  # one event loop per worker, so no lock needed
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or self.limit <= 0 or scope["path"].rstrip("/") != self.path:
+            await self.app(scope, receive, send)
+            return
+
+        client = (scope.get("client") or ("unknown",))[0]
+        if self.active.get(client, 0) >= self.limit:
+            from starlette.responses import JSONResponse
+            METRICS.incr("client_limit_rejections")
+            response = JSONResponse({"error": "too many concurrent requests from this client"},
+                                    status_code=429, headers={"Retry-After": "1"})
+            await response(scope, receive, send)
+            return
+
+        self.active[client] = self.active.get(client, 0) + 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.active[client] -= 1
+            if not self.active[client]:
+                del self.active[client]
+
+
+def create_app():
+    """ASGI app for one HTTP worker; uvicorn calls this in every worker process"""
+    from contextlib import asynccontextmanager
+    from mcp.server.transport_security import TransportSecuritySettings
+
+    mcp.settings.stateless_http = True
+    host = os.getenv("GIKI_HTTP_HOST", "127.0.0.1")
+    if ALLOWED_HOSTS:
+        mcp.settings.transport_security = TransportSecuritySettings(
+            allowed_hosts=ALLOWED_HOSTS,
+            allowed_origins=[f"{scheme}://{h}" for h in ALLOWED_HOSTS for scheme in ("http", "https")]
+        )
+    elif host not in LOOPBACK_HOSTS:
+        # DNS rebinding protection only makes sense for servers bound to loopback
+        mcp.settings.transport_security = None
+
+    app = mcp.streamable_http_app()
+    session_lifespan = app.router.lifespan_context
+
+    async def write_metrics():
+        while True:
+            await asyncio.to_thread(METRICS.write_state, METRICS_DIR)
+            await asyncio.sleep(METRICS_WRITE_SECONDS)
+
+    @asynccontextmanager
+    async def lifespan(app):
+        # Readiness reports "warming_up" until the bot is loaded
+        start_warm_up(background=True)
+        writer = asyncio.create_task(write_metrics()) if METRICS_DIR else None
+        async with session_lifespan(app):
+            yield
+        if writer:
+            writer.cancel()
+            METRICS.write_state(METRICS_DIR)
+        # uvicorn has stopped accepting connections and drained in-flight
+        # requests (up to GRACEFUL_SHUTDOWN_SECONDS) before we get here
+        startup["state"] = "stopped"
+        logging.info(f"HTTP worker {os.getpid()} stopped")
+
+    app.router.lifespan_context = lifespan
+    return ClientConcurrencyLimit(app, CLIENT_MAX_CONCURRENCY, mcp.settings.streamable_http_path)
+
+
+def _build_default_index():
+    try:
+        from chatbot import GIKIbot
+        if GIKIbot().ensure_index():
+            logging.info("Built the default index before starting HTTP workers")
+    except Exception:
+        logging.exception("Building the default index failed")
+
+
+def prepare_shared_index():
+    """Build a missing default index once, instead of in every worker"""
+    from vector_index import index_exists
+    if index_exists(INDEX_PATH):
+        return
+    import multiprocessing
+    # Separate process so the supervisor doesn't keep the embedding model loaded
+    builder = multiprocessing.get_context("spawn").Process(target=_build_default_index, name="giki-index-build")
+    builder.start()
+    builder.join()
+
+
+def run_http(host: str, port: int, workers: int, forwarded_allow_ips=None):
+    import uvicorn
+
+    os.environ["GIKI_HTTP_HOST"] = host
+    os.environ["GIKI_HTTP_WORKERS"] = str(workers)
+    if workers > 1:
+        import tempfile
+        # Fresh per run, so totals don't carry over from a previous server
+        os.environ["GIKI_METRICS_DIR"] = tempfile.mkdtemp(prefix="giki-metrics-")
+        prepare_shared_index()
+    logging.info(f"Starting {workers} HTTP worker(s) on {host}:{port}")
+    uvicorn.run(
+        "server:create_app",
+        factory=True,
+        host=host,
+        port=port,
+        workers=workers,
+        timeout_graceful_shutdown=GRACEFUL_SHUTDOWN_SECONDS,
+        forwarded_allow_ips=forwarded_allow_ips,
+        log_config=None  # use the file logging configured above
+    )
+
+
 # --- Runner: allow choosing transport via CLI args ---
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
-    parser.add_argument("--mode", choices=["stdio", "streamable-http", "fastapi"], default="stdio",
+    parser.add_argument("--mode", choices=["stdio", "streamable-http"], default="stdio",
                         help="MCP transport mode (stdio for local Claude Desktop).")
-    parser.add_argument("--host", default="127.0.0.1", help="host for HTTP transports")
-    parser.add_argument("--port", default=8000, type=int, help="port for HTTP transports")
+    parser.add_argument("--host", default="127.0.0.1", help="host for streamable-http")
+    parser.add_argument("--port", default=8000, type=int, help="port for streamable-http")
+    parser.add_argument("--workers", default=HTTP_WORKERS, type=int,
+                        help="streamable-http worker processes sharing the memory-mapped index")
+    parser.add_argument("--client-concurrency", default=CLIENT_MAX_CONCURRENCY, type=int,
+                        help="in-flight requests allowed per client address and worker (0: unlimited)")
+    parser.add_argument("--forwarded-allow-ips", default=None,
+                        help="proxy addresses trusted for X-Forwarded-For (client address of the limit)")
+    parser.add_argument("--fast-start", action="store_true", default=os.getenv("GIKI_FAST_START") == "1",
+                        help="stdio: answer the MCP handshake immediately and load models in the background")
     args = parser.parse_args()
 
     # MCP startup messages should not print to STDIO
     logging.info(f"Starting MCP server in mode: {args.mode}")
     if args.mode == "stdio":
+        start_warm_up(background=args.fast_start)
         mcp.run(transport="stdio")
-    elif args.mode == "streamable-http":
-        mcp.run(transport="streamable-http", host=args.host, port=args.port)
-    else:  # fastapi
-        mcp.run(transport="fastapi", host=args.host, port=args.port)
+    else:
+        # Worker processes re-import this module and read these
+        os.environ["GIKI_CLIENT_MAX_CONCURRENCY"] = str(args.client_concurrency)
+        run_http(args.host, args.port, max(1, args.workers), args.forwarded_allow_ips)
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Offline tests for hybrid_retriever.py (no FAISS index or embedding model):
+    python -m pytest "Giki Chatbot Redit/test_hybrid_retriever.py"
+"""
+import pytest
+from langchain.docstore.document import Document
+
+from hybrid_retriever import BM25Index, HybridRetriever, tokenize
+
+TEXTS = {
+    "fees": "The semester fee is 1,20,000 rupees, paid before registration",
+    "cs101": "CS-101 introduces programming in Python",
+    "hostel": "Hostel rooms are allotted at the start of the semester",
+    "mess": "Mess food is served three times a day",
+}
+
+
+class FakeDocstore:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def search(self, doc_id):
+        return self.docs.get(doc_id, f"ID {doc_id} not found.")
+
+
+class FakeVectorstore:
+    """Returns a fixed similarity ranking whatever the query"""
+
+    def __init__(self, ranking):
+        self.docstore = FakeDocstore({key: Document(id=key, page_content=text) for key, text in TEXTS.items()})
+        self.ranking = ranking
+
+    def similarity_search_with_relevance_scores(self, query, k=4):
+        return [(self.docstore.search(key), score) for key, score in self.ranking[:k]]
+
+
+@pytest.fixture
+def bm25():
+    return BM25Index.from_texts(list(TEXTS.values()), list(TEXTS))
+
+
+def test_tokenize_keeps_codes_and_their_parts():
+    tokens = tokenize("What is the CS-101 fee?")
+    assert "cs-101" in tokens and "cs" in tokens and "101" in tokens
+    assert "what" not in tokens and "the" not in tokens
+
+
+def test_bm25_matches_course_codes(bm25):
+    assert bm25.search("cs 101", k=1)[0][0] == "cs101"
+    assert bm25.search("1,20,000", k=1)[0][0] == "fees"
+    assert bm25.search("library") == []
+
+
+def test_bm25_save_and_load(bm25, tmp_path):
+    bm25.save(str(tmp_path))
+    loaded = BM25Index.load(str(tmp_path))
+    assert loaded.search("hostel rooms") == bm25.search("hostel rooms")
+    assert BM25Index.load(str(tmp_path / "missing")) is None
+
+
+def test_fusion_ranks_documents_found_by_both_first(bm25):
+    vectorstore = FakeVectorstore([("mess", 0.9), ("hostel", 0.8), ("cs101", 0.4)])
+    retriever = HybridRetriever(vectorstore=vectorstore, bm25=bm25, k=3)
+    docs = retriever.invoke("hostel semester")
+    assert [d.id for d in docs][:2] == ["hostel", "mess"]
+    assert docs[0].metadata["relevance_score"] == 0.8
+
+
+def test_bm25_only_hits_have_no_relevance_score(bm25):
+    vectorstore = FakeVectorstore([("mess", 0.9)])
+    docs = HybridRetriever(vectorstore=vectorstore, bm25=bm25, k=2).invoke("registration fee")
+    by_id = {d.id: d for d in docs}
+    assert by_id["fees"].metadata["relevance_score"] is None
+    assert by_id["mess"].metadata["relevance_score"] == 0.9
+
+
+def test_without_bm25_it_is_similarity_search():
+    vectorstore = FakeVectorstore([("mess", 0.9), ("hostel", 0.8), ("fees", 0.1)])
+    docs = HybridRetriever(vectorstore=vectorstore, k=2).invoke("anything")
+    assert [d.id for d in docs] == ["mess", "hostel"]
+    assert "relevance_score" not in vectorstore.docstore.docs["mess"].metadata
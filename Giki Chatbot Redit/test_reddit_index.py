@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Offline tests for reddit_index.py (no embedding model or Reddit API):
+    python -m pytest "Giki Chatbot Redit/test_reddit_index.py"
+"""
+import json
+import os
+import zlib
+
+import numpy as np
+import pytest
+
+from reddit_index import CHUNKS_FILE, EMBEDDINGS_FILE, MANIFEST_FILE, RedditIndex
+
+
+class HashedEmbeddings:
+    """Bag of hashed words: texts sharing words get similar vectors"""
+
+    def __init__(self, dims=64):
+        self.dims = dims
+
+    def embed_query(self, text):
+        vector = np.zeros(self.dims, dtype=np.float32)
+        for word in text.lower().split():
+            vector[zlib.crc32(word.encode()) % self.dims] += 1
+        return vector.tolist()
+
+    def embed_documents(self, texts):
+        return [self.embed_query(t) for t in texts]
+
+
+POSTS = [
+    {"id": "a1", "title": "Hostel rooms", "selftext": "hostel rooms have a bed and a wardrobe", "created_utc": 1.0,
+     "comments": [{"id": "c1", "body": "rooms get heaters in winter"}]},
+    {"id": "b2", "title": "Mess food", "selftext": "mess food is cheap but bland", "created_utc": 2.0,
+     "comments": []},
+    {"id": "c3", "title": "Attendance rules", "selftext": "eighty percent attendance to sit the final exam",
+     "created_utc": 3.0, "comments": []},
+]
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = RedditIndex(HashedEmbeddings(), index_path=str(tmp_path / "reddit_index"))
+    index.build(POSTS)
+    return index
+
+
+def test_save_and_load_round_trip(index):
+    loaded = RedditIndex(HashedEmbeddings(), index_path=index.index_path)
+    assert loaded.load()
+    assert loaded.chunks == index.chunks
+    assert np.array_equal(loaded.vectors, index.vectors)
+    assert loaded.latest_created_utc == 3.0
+    assert loaded.search("attendance final exam", top_n=1)[0]["id"] == "c3"
+
+
+def test_only_the_current_version_is_kept(index):
+    index.add_posts([{"id": "d4", "title": "Transport", "selftext": "buses to islamabad", "created_utc": 4.0}])
+    data_files = sorted(n for n in os.listdir(index.index_path) if n != MANIFEST_FILE)
+    with open(os.path.join(index.index_path, MANIFEST_FILE)) as f:
+        manifest = json.load(f)
+    assert data_files == sorted([manifest["chunks_file"], manifest["embeddings_file"]])
+    assert manifest["chunks"] == len(index)
+
+
+def test_reader_never_pairs_new_vectors_with_old_chunks(index):
+    reader = RedditIndex(HashedEmbeddings(), index_path=index.index_path)
+    assert reader.load()
+    before = list(reader.chunks)
+
+    # A writer halfway through a save: new data files exist, the manifest
+    # still names the old ones
+    with open(os.path.join(index.index_path, "embeddings.ffff.npy"), "wb") as f:
+        np.save(f, np.zeros((1, 64), dtype=np.float32))
+    assert reader.load()
+    assert reader.chunks == before and len(reader.vectors) == len(before)
+
+
+def test_load_keeps_the_current_index_when_files_are_gone(index):
+    reader = RedditIndex(HashedEmbeddings(), index_path=index.index_path)
+    assert reader.load()
+    with open(os.path.join(index.index_path, MANIFEST_FILE)) as f:
+        manifest = json.load(f)
+    os.remove(os.path.join(index.index_path, manifest["embeddings_file"]))
+
+    assert not reader.load()
+    assert len(reader) == len(index) and reader.search("mess food", top_n=1)[0]["id"] == "b2"
+
+
+def test_mismatched_counts_are_rejected(index):
+    with open(os.path.join(index.index_path, MANIFEST_FILE)) as f:
+        manifest = json.load(f)
+    with open(os.path.join(index.index_path, manifest["embeddings_file"]), "wb") as f:
+        np.save(f, index.vectors[:-1])
+    assert not RedditIndex(HashedEmbeddings(), index_path=index.index_path).load()
+
+
+def test_loads_indexes_saved_before_versioned_files(tmp_path):
+    path = tmp_path / "legacy"
+    path.mkdir()
+    chunks = [c for post in POSTS for c in RedditIndex(HashedEmbeddings()).chunk_post(post)]
+    with open(path / CHUNKS_FILE, "w", encoding="utf-8") as f:
+        f.writelines(json.dumps(c) + "\n" for c in chunks)
+    np.save(path / EMBEDDINGS_FILE, np.ones((len(chunks), 64), dtype=np.float32))
+    with open(path / MANIFEST_FILE, "w") as f:
+        json.dump({"chunks": len(chunks), "latest_created_utc": 3.0}, f)
+
+    legacy = RedditIndex(HashedEmbeddings(), index_path=str(path))
+    assert legacy.load() and len(legacy) == len(chunks)
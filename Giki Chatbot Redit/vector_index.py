@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+"""
+Compact FAISS Vector Index
+Builds the document vectorstore with a configurable FAISS index type (flat,
+HNSW, int8 scalar-quantized or IVF-PQ), checks approximate indexes against
+exact search at build time and stores documents in a memory-mapped docstore
+instead of a pickled dict.
+
+Indexes saved by FAISS.save_local (index.faiss + index.pkl) still load.
+
+    python vector_index.py build --type sq8
+    python vector_index.py info
+"""
+
+import os
+import json
+import math
+import glob
+import mmap
+import time
+import shutil
+import logging
+import argparse
+from collections.abc import Mapping
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import faiss
+from langchain.docstore.document import Document
+from langchain_community.docstore.base import Docstore
+from langchain_community.vectorstores import FAISS
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILE = "index.faiss"
+DOCSTORE_FILE = "docstore.jsonl"
+OFFSETS_FILE = "docstore_offsets.npy"
+MANIFEST_FILE = "manifest.json"
+LEGACY_DOCSTORE_FILE = "index.pkl"
+
+INDEX_TYPES = ("flat", "hnsw", "sq8", "ivfpq")
+
+# Approximate indexes scoring below this recall@k against exact search are
+# replaced by a flat index rather than silently returning worse results
+MIN_RECALL = 0.9
+RECALL_K = 10
+RECALL_QUERIES = 200
+
+EMBED_BATCH_SIZE = 256
+# Half-finished builds left by a crashed process are removed after this long
+STALE_BUILD_SECONDS = 24 * 3600
+
+HNSW_M = 32
+HNSW_EF_SEARCH = 64
+IVF_NPROBE = 16
+
+
+# -----------------------------
+# Memory-mapped docstore
+# -----------------------------
+class MmapDocstore(Docstore):
+    """
+    Read-only docstore over a JSON-lines file. Document i is stored under
+    id str(i) at the byte range given by the offsets array, so nothing is
+    parsed until a document is actually returned.
+    """
+
+    def __init__(self, index_path: str):
+        self.index_path = index_path
+        self.offsets = np.load(os.path.join(index_path, OFFSETS_FILE), mmap_mode="r")
+        self._file = open(os.path.join(index_path, DOCSTORE_FILE), "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def search(self, search: str):
+        try:
+            i = int(search)
+        except (TypeError, ValueError):
+            return f"ID {search} not found."
+        if not 0 <= i < len(self):
+            return f"ID {search} not found."
+        record = json.loads(self._data[int(self.offsets[i]):int(self.offsets[i + 1])])
+        return Document(id=search, page_content=record["page_content"], metadata=record["metadata"])
+
+    def close(self):
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+        self._file.close()
+
+    @staticmethod
+    def write(index_path: str, documents: List[Document]):
+        offsets = [0]
+        with open(os.path.join(index_path, DOCSTORE_FILE), "wb") as f:
+            for doc in documents:
+                line = json.dumps({"page_content": doc.page_content, "metadata": doc.metadata},
+                                  ensure_ascii=False).encode("utf-8") + b"\n"
+                f.write(line)
+                offsets.append(offsets[-1] + len(line))
+        with open(os.path.join(index_path, OFFSETS_FILE), "wb") as f:
+            np.save(f, np.asarray(offsets, dtype=np.int64))
+
+
+class PositionIds(Mapping):
+    """index_to_docstore_id without a per-vector dict: position i maps to str(i)"""
+
+    def __init__(self, size: int):
+        self.size = size
+
+    def __getitem__(self, i):
+        if not 0 <= i < self.size:
+            raise KeyError(i)
+        return str(i)
+
+    def __len__(self):
+        return self.size
+
+    def __iter__(self):
+        return iter(range(self.size))
+
+
+# -----------------------------
+# Index construction
+# -----------------------------
+def _create_index(index_type: str, vectors: np.ndarray):
+    """An empty (trained) FAISS index plus the parameters used. L2 everywhere,
+    so relevance scores stay on the same scale as the original flat index."""
+    n, d = vectors.shape
+    if index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(d, HNSW_M)
+        index.hnsw.efSearch = HNSW_EF_SEARCH
+        return index, {"M": HNSW_M, "ef_search": HNSW_EF_SEARCH}
+
+    if index_type == "sq8":
+        index = faiss.IndexScalarQuantizer(d, faiss.ScalarQuantizer.QT_8bit, faiss.METRIC_L2)
+        index.train(vectors)
+        return index, {}
+
+    if index_type == "ivfpq":
+        nlist = max(1, min(int(4 * math.sqrt(n)), n // 39))
+        # One byte per 8 dimensions; fewer bits per code when there is too
+        # little data to train 256 centroids per sub-quantizer
+        m = next(m for m in range(max(1, d // 8), 0, -1) if d % m == 0)
+        nbits = min(8, max(4, int(math.log2(max(n, 1) / 39)) if n > 39 else 4))
+        index = faiss.IndexIVFPQ(faiss.IndexFlatL2(d), d, nlist, m, nbits)
+        index.train(vectors)
+        index.nprobe = min(IVF_NPROBE, nlist)
+        return index, {"nlist": nlist, "m": m, "nbits": nbits, "nprobe": index.nprobe}
+
+    return faiss.IndexFlatL2(d), {}
+
+
+def recall_at_k(index, vectors: np.ndarray, queries: Optional[np.ndarray] = None, k=RECALL_K) -> float:
+    """Overlap of the index's top-k with exact search, averaged over queries"""
+    if queries is None:
+        rng = np.random.default_rng(0)
+        sample = rng.choice(len(vectors), size=min(RECALL_QUERIES, len(vectors)), replace=False)
+        queries = vectors[sample]
+    k = min(k, len(vectors))
+    exact = faiss.IndexFlatL2(vectors.shape[1])
+    exact.add(vectors)
+    _, truth = exact.search(queries, k)
+    _, found = index.search(queries, k)
+    hits = sum(len(set(t) & set(f)) for t, f in zip(truth.tolist(), found.tolist()))
+    return hits / (len(queries) * k)
+
+
+def build_vectorstore(documents: List[Document], embeddings, index_path: str, index_type="flat",
+                      min_recall=MIN_RECALL, query_vectors: Optional[np.ndarray] = None,
+                      metadata: Optional[Dict] = None,
+                      progress: Optional[Callable[[str, int, int], None]] = None) -> FAISS:
+    """
+    Embed documents, build and save the index, and return it loaded from
+    disk. metadata is stored in the manifest alongside the build details;
+    progress(phase, done, total) is called as embedding batches complete.
+    """
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type {index_type!r}; choose from {', '.join(INDEX_TYPES)}")
+    progress = progress or (lambda phase, done=0, total=0: None)
+
+    started = time.perf_counter()
+    texts = [doc.page_content for doc in documents]
+    batches = []
+    for start in range(0, len(texts), EMBED_BATCH_SIZE):
+        batches.append(np.asarray(embeddings.embed_documents(texts[start:start + EMBED_BATCH_SIZE]),
+                                  dtype=np.float32))
+        progress("embed", min(start + EMBED_BATCH_SIZE, len(texts)), len(texts))
+    vectors = np.vstack(batches) if batches else np.zeros((0, 0), dtype=np.float32)
+    embed_ms = (time.perf_counter() - started) * 1000
+
+    progress("faiss", 0, 0)
+    started = time.perf_counter()
+    requested = index_type
+    if index_type == "ivfpq" and len(vectors) < 1000:
+        logger.warning("Only %d vectors; too few to train IVF-PQ, using sq8", len(vectors))
+        index_type = "sq8"
+    index, params = _create_index(index_type, vectors)
+    index.add(vectors)
+
+    recall = 1.0
+    if index_type != "flat":
+        recall = recall_at_k(index, vectors, query_vectors)
+        if recall < min_recall:
+            logger.warning("%s recall@%d %.3f below %.2f, falling back to flat", index_type, RECALL_K, recall, min_recall)
+            index_type, params, recall = "flat", {}, 1.0
+            index = faiss.IndexFlatL2(vectors.shape[1])
+            index.add(vectors)
+    build_ms = (time.perf_counter() - started) * 1000
+
+    os.makedirs(index_path, exist_ok=True)
+    faiss.write_index(index, os.path.join(index_path, INDEX_FILE))
+    MmapDocstore.write(index_path, documents)
+    # An old pickled docstore next to the new files would be ambiguous
+    legacy = os.path.join(index_path, LEGACY_DOCSTORE_FILE)
+    if os.path.exists(legacy):
+        os.remove(legacy)
+
+    # Manifest last: its presence marks a complete index
+    manifest = {
+        **(metadata or {}),
+        "format": "mmap",
+        "index_type": index_type,
+        "requested_index_type": requested,
+        "params": params,
+        "dim": int(vectors.shape[1]),
+        "count": len(documents),
+        "recall_at_k": round(recall, 4),
+        "recall_k": RECALL_K,
+        "embed_ms": round(embed_ms, 1),
+        "build_ms": round(build_ms, 1),
+        "index_bytes": os.path.getsize(os.path.join(index_path, INDEX_FILE)),
+        "created_at": time.time()
+    }
+    tmp = os.path.join(index_path, MANIFEST_FILE + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, os.path.join(index_path, MANIFEST_FILE))
+
+    return load_vectorstore(index_path, embeddings)
+
+
+# -----------------------------
+# Versioned publishing
+# -----------------------------
+# A rebuilt index is written to <index_path>.v<stamp>.tmp, renamed to
+# <index_path>.v<stamp> when complete, and published by atomically
+# replacing the <index_path> symlink. Readers only ever see a whole index.
+def staging_dir(index_path: str) -> str:
+    stamp = time.strftime("%Y%m%dT%H%M%S") + f"-{os.getpid()}-{time.monotonic_ns() % 10**6}"
+    return f"{index_path}.v{stamp}.tmp"
+
+
+def publish_index(staging: str, index_path: str) -> str:
+    """Swap a finished build in at index_path and remove older versions"""
+    version = staging[:-len(".tmp")]
+    os.replace(staging, version)
+
+    link_tmp = f"{index_path}.link"
+    if os.path.lexists(link_tmp):
+        os.remove(link_tmp)
+    os.symlink(os.path.basename(version), link_tmp)
+    if os.path.isdir(index_path) and not os.path.islink(index_path):
+        # First rebuild of an index saved as a plain directory; if we crash
+        # before the symlink lands, _recover() picks the newest version
+        os.replace(index_path, f"{index_path}.legacy")
+    os.replace(link_tmp, index_path)
+
+    # Open mmaps of the old files stay valid until their readers drop them
+    for sibling in glob.glob(f"{glob.escape(index_path)}.*"):
+        if sibling == version or os.path.islink(sibling):
+            continue
+        if sibling.endswith(".tmp") and time.time() - os.path.getmtime(sibling) < STALE_BUILD_SECONDS:
+            continue  # possibly another build in progress
+        shutil.rmtree(sibling, ignore_errors=True)
+    return version
+
+
+def _recover(index_path: str):
+    """Re-point a missing index_path at the newest complete version, if any"""
+    if os.path.lexists(index_path):
+        return
+    versions = sorted(v for v in glob.glob(f"{glob.escape(index_path)}.v*")
+                      if not v.endswith(".tmp") and read_manifest(v) is not None)
+    if versions:
+        os.symlink(os.path.basename(versions[-1]), index_path)
+
+
+# -----------------------------
+# Loading
+# -----------------------------
+def read_manifest(index_path: str) -> Optional[Dict]:
+    try:
+        with open(os.path.join(index_path, MANIFEST_FILE), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def index_exists(index_path: str) -> bool:
+    _recover(index_path)
+    return (read_manifest(index_path) is not None
+            or os.path.exists(os.path.join(index_path, LEGACY_DOCSTORE_FILE)))
+
+
+def load_vectorstore(index_path: str, embeddings) -> FAISS:
+    manifest = read_manifest(index_path)
+    if manifest is None:
+        # Saved by FAISS.save_local before this module existed
+        return FAISS.load_local(index_path, embeddings, allow_dangerous_deserialization=True)
+
+    path = os.path.join(index_path, INDEX_FILE)
+    try:
+        index = faiss.read_index(path, faiss.IO_FLAG_MMAP)
+    except RuntimeError:
+        index = faiss.read_index(path)
+
+    params = manifest.get("params", {})
+    if "nprobe" in params:
+        faiss.extract_index_ivf(index).nprobe = params["nprobe"]
+    if "ef_search" in params:
+        index.hnsw.efSearch = params["ef_search"]
+
+    return FAISS(
+        embedding_function=embeddings,
+        index=index,
+        docstore=MmapDocstore(index_path),
+        index_to_docstore_id=PositionIds(index.ntotal)
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build or inspect the GIKI FAISS index.")
+    parser.add_argument("command", choices=["build", "info"])
+    parser.add_argument("--index", default="faiss_index", help="index directory")
+    parser.add_argument("--type", default=os.getenv("GIKI_INDEX_TYPE", "flat"), choices=INDEX_TYPES)
+    parser.add_argument("--min-recall", type=float, default=MIN_RECALL)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        from chatbot import GIKIDocumentProcessor, get_embeddings
+        from hybrid_retriever import BM25Index
+        documents = GIKIDocumentProcessor().load_documents()
+        vectorstore = build_vectorstore(documents, get_embeddings(), args.index, args.type, args.min_recall)
+        BM25Index.from_vectorstore(vectorstore).save(args.index)
+    print(json.dumps(read_manifest(args.index), indent=2))
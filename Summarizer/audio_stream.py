@@ -0,0 +1,130 @@
+"""
+Audio extraction through ffmpeg pipes.
+
+The recording is decoded straight to 16 kHz mono PCM on ffmpeg's stdout, so
+no intermediate WAV is written. The whole recording is held in memory (about
+115 MB per hour) because cut points are chosen over all of it; segments are
+not fed to transcription while ffmpeg is still decoding. Each transcription
+segment is encoded in memory to a compressed format before upload:
+
+    flac   lossless, about half the size of PCM (default)
+    opus   Ogg/Opus at 32 kbit/s, about 1/16 of PCM
+    wav    uncompressed, no ffmpeg needed (e.g. for fake_openai_server.py)
+
+ffmpeg is taken from SUMMARIZER_FFMPEG, the PATH, or the copy bundled with
+imageio-ffmpeg.
+"""
+
+import io
+import os
+import wave
+import shutil
+import tempfile
+import subprocess
+from typing import Tuple
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+AUDIO_CODEC = os.getenv("SUMMARIZER_AUDIO_CODEC", "flac")
+
+# codec -> (ffmpeg output arguments, file extension)
+CODECS = {
+    "flac": (["-c:a", "flac", "-compression_level", "5", "-f", "flac"], "flac"),
+    "opus": (["-c:a", "libopus", "-b:a", "32k", "-application", "voip", "-f", "ogg"], "ogg"),
+    "wav": (None, "wav")
+}
+
+READ_CHUNK_BYTES = 1 << 20
+
+
+class FFmpegError(RuntimeError):
+    pass
+
+
+def read_wav(path) -> Tuple[np.ndarray, int]:
+    """16-bit PCM samples (mixed down to mono) and the sample rate"""
+    with wave.open(path, "rb") as f:
+        rate, channels, width = f.getframerate(), f.getnchannels(), f.getsampwidth()
+        if width != 2:
+            raise ValueError(f"Expected 16-bit PCM audio, got {8 * width}-bit: {path}")
+        samples = np.frombuffer(f.readframes(f.getnframes()), dtype="<i2")
+    if channels > 1:
+        samples = samples.reshape(-1, channels).mean(axis=1).astype("<i2")
+    return samples, rate
+
+
+def encode_wav(samples: np.ndarray, rate: int) -> bytes:
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(rate)
+        f.writeframes(samples.astype("<i2").tobytes())
+    return buffer.getvalue()
+
+
+def find_ffmpeg() -> str:
+    path = os.getenv("SUMMARIZER_FFMPEG") or shutil.which("ffmpeg")
+    if path:
+        return path
+    try:
+        import imageio_ffmpeg
+        return imageio_ffmpeg.get_ffmpeg_exe()
+    except Exception:
+        raise FFmpegError("ffmpeg not found; install it or set SUMMARIZER_FFMPEG")
+
+
+def decode_audio(input_file: str, rate=SAMPLE_RATE) -> Tuple[np.ndarray, int]:
+    """Mono 16-bit samples of a video/audio file, read from ffmpeg's stdout"""
+    if not os.path.exists(input_file):
+        raise FileNotFoundError(input_file)
+    command = [find_ffmpeg(), "-nostdin", "-hide_banner", "-loglevel", "error",
+               "-i", input_file, "-vn", "-ac", "1", "-ar", str(rate), "-f", "s16le", "pipe:1"]
+    # stderr goes to a file: a damaged input can log more than a pipe buffer,
+    # and ffmpeg would block on it while we wait for stdout
+    with tempfile.TemporaryFile() as errors:
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=errors)
+        pcm = bytearray()
+        try:
+            while True:
+                chunk = process.stdout.read(READ_CHUNK_BYTES)
+                if not chunk:
+                    break
+                pcm += chunk
+        finally:
+            process.stdout.close()
+            process.wait()
+        if process.returncode != 0:
+            errors.seek(0)
+            error = errors.read().decode(errors="replace").strip()[-2000:]
+            raise FFmpegError(f"ffmpeg failed to decode {input_file}: {error}")
+    del pcm[len(pcm) - len(pcm) % 2:]
+    # A view of the buffer, not a copy: peak memory stays about one decoded recording
+    return np.frombuffer(pcm, dtype="<i2"), rate
+
+
+def decode_audio_bytes(data: bytes, rate=SAMPLE_RATE) -> Tuple[np.ndarray, int]:
+    """decode_audio() for an encoded file held in memory"""
+    command = [find_ffmpeg(), "-nostdin", "-hide_banner", "-loglevel", "error",
+               "-i", "pipe:0", "-ac", "1", "-ar", str(rate), "-f", "s16le", "pipe:1"]
+    result = subprocess.run(command, input=data, capture_output=True)
+    if result.returncode != 0:
+        raise FFmpegError(f"ffmpeg failed to decode audio: {result.stderr.decode(errors='replace').strip()}")
+    return np.frombuffer(result.stdout[:len(result.stdout) - len(result.stdout) % 2], dtype="<i2"), rate
+
+
+def encode_audio(samples: np.ndarray, rate: int, codec=AUDIO_CODEC) -> Tuple[bytes, str]:
+    """(encoded bytes, file extension) for mono 16-bit samples"""
+    if codec not in CODECS:
+        raise ValueError(f"Unknown audio codec: {codec}")
+    output_args, extension = CODECS[codec]
+    if output_args is None:
+        return encode_wav(samples, rate), extension
+
+    command = [find_ffmpeg(), "-nostdin", "-hide_banner", "-loglevel", "error",
+               "-f", "s16le", "-ar", str(rate), "-ac", "1", "-i", "pipe:0", *output_args, "pipe:1"]
+    result = subprocess.run(command, input=samples.astype("<i2").tobytes(), capture_output=True)
+    if result.returncode != 0:
+        raise FFmpegError(f"ffmpeg failed to encode {codec}: {result.stderr.decode(errors='replace').strip()}")
+    return result.stdout, extension
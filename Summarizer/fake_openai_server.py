@@ -0,0 +1,261 @@
+"""
+Fake OpenAI-compatible server for running the summarizer offline.
+
+/v1/chat/completions answers the minutes prompts with deterministic JSON
+built from the transcript text (topics are its most frequent long words,
+participants its capitalised names, action items its "will ..." sentences).
+--json-defect breaks those replies the way real models do (code fences,
+trailing commas, truncation, prose, a missing summary) to exercise
+minutes_schema.py; --no-json-mode rejects response_format with a 400.
+
+/v1/embeddings returns hashed bag-of-words vectors (words share a bucket
+with their first five letters), enough for meeting_store.py to find
+segments that share vocabulary with a query.
+
+/v1/audio/transcriptions "hears" synthetic test audio (WAV, or anything
+ffmpeg decodes): every voiced 0.25 s window becomes the word "w<N>"
+(N = dominant frequency / 50 Hz) and pauses split the words into
+timestamped segments. Latency is configurable so throughput can be
+measured against segment concurrency.
+
+    python fake_openai_server.py --port 8556 --latency-ms 500
+    SUMMARIZER_TRANSCRIBE_BACKEND=openai SUMMARIZER_TRANSCRIBE_BASE_URL=http://127.0.0.1:8556/v1 python script.py talk.mp4
+"""
+
+import io
+import re
+import json
+import time
+import wave
+import zlib
+import argparse
+import threading
+from collections import Counter
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+WINDOW_SECONDS = 0.25
+# Windows quieter than this (RMS of 16-bit samples) count as silence
+SILENCE_RMS = 500
+
+
+JSON_DEFECTS = ("fence", "trailing_comma", "truncate", "prose", "no_summary")
+
+
+class FakeServerConfig:
+    def __init__(self, latency_ms=200, ms_per_audio_second=0.0, json_defect=None, json_mode=True):
+        self.latency_ms = latency_ms
+        self.ms_per_audio_second = ms_per_audio_second
+        self.json_defect = json_defect
+        self.json_mode = json_mode
+
+
+def fake_transcription(audio: bytes) -> dict:
+    if audio[:4] == b"RIFF":
+        with wave.open(io.BytesIO(audio), "rb") as f:
+            rate = f.getframerate()
+            samples = np.frombuffer(f.readframes(f.getnframes()), dtype="<i2")
+    else:
+        # FLAC/Opus uploads
+        from audio_stream import decode_audio_bytes
+        samples, rate = decode_audio_bytes(audio)
+    samples = samples.astype(np.float32)
+
+    size = int(rate * WINDOW_SECONDS)
+    segments, words, start = [], [], None
+    for i in range(len(samples) // size):
+        window = samples[i * size:(i + 1) * size]
+        if np.sqrt((window * window).mean()) < SILENCE_RMS:
+            if words:
+                segments.append({"id": len(segments), "start": start, "end": i * WINDOW_SECONDS,
+                                 "text": " " + " ".join(words)})
+                words, start = [], None
+            continue
+        spectrum = np.abs(np.fft.rfft(window))
+        frequency = np.argmax(spectrum) * rate / size
+        words.append(f"w{int(round(frequency / 50))}")
+        start = i * WINDOW_SECONDS if start is None else start
+    if words:
+        segments.append({"id": len(segments), "start": start, "end": len(samples) / rate,
+                         "text": " " + " ".join(words)})
+
+    return {
+        "task": "transcribe",
+        "language": "english",
+        "duration": len(samples) / rate,
+        "text": "".join(s["text"] for s in segments).strip(),
+        "segments": segments
+    }
+
+
+def _prompt_text(prompt: str, marker: str) -> str:
+    return prompt.split(marker, 1)[-1].strip()
+
+
+def fake_minutes(text: str) -> dict:
+    words = re.findall(r"[A-Za-z']+", text)
+    common = Counter(w.lower() for w in words if len(w) > 6).most_common(3)
+    names = Counter(m for m in re.findall(r"(?<=[a-z,] )[A-Z][a-z]+(?: [A-Z][a-z]+)?", text)).most_common(3)
+    sentences = re.split(r"(?<=[.!?])\s+", text)
+    return {
+        "content_type": "presentation",
+        "summary": " ".join(words[:25]) + ".",
+        "key_topics": [w for w, _ in common],
+        "decisions": [],
+        "action_items": [{"task": s.strip(), "owner": "Not specified", "deadline": "Not specified",
+                          "priority": "medium"} for s in sentences if " will " in s][:2],
+        "participants": [n for n, _ in names],
+        "important_quotes": sentences[:1],
+        "follow_up_questions": [s.strip() for s in sentences if s.endswith("?")][:2]
+    }
+
+
+def break_json(minutes: dict, defect: str) -> str:
+    if defect == "no_summary":
+        return json.dumps({k: v for k, v in minutes.items() if k != "summary"})
+    text = json.dumps(minutes, indent=2)
+    if defect == "fence":
+        return f"```json\n{text}\n```"
+    if defect == "trailing_comma":
+        return re.sub(r"(\]|\}|\")\n(\s*)(\]|\})", r"\1,\n\2\3", text)
+    if defect == "truncate":
+        return text[:int(len(text) * 0.7)]
+    if defect == "prose":
+        return f"Sure! Here are the minutes:\n{text}\nLet me know if you need anything else."
+    raise ValueError(f"Unknown JSON defect: {defect}")
+
+
+def fake_chat_reply(prompt: str, json_defect=None) -> str:
+    if "could not be used as meeting-minutes JSON" in prompt:
+        # Re-ask: rebuild clean minutes from the quoted reply
+        previous = _prompt_text(prompt, "Previous reply:")
+        minutes = fake_minutes(" ".join(re.findall(r'"([^"]{3,})"', previous)) or previous)
+        if '"metadata"' in previous:
+            minutes["metadata"] = {"filename": "unknown", "processing_timestamp": "auto-generated",
+                                   "content_type": minutes.pop("content_type")}
+        return json.dumps(minutes)
+    if "summaries of consecutive parts" in prompt:
+        parts = re.findall(r"Part \d+: (.*)", prompt)
+        return "Merged: " + " | ".join(" ".join(p.split()[:6]) for p in parts)
+    if "Transcript part:" in prompt:
+        minutes = fake_minutes(_prompt_text(prompt, "Transcript part:"))
+    else:
+        minutes = fake_minutes(_prompt_text(prompt, "Transcript:"))
+        minutes["metadata"] = {"filename": "unknown", "processing_timestamp": "auto-generated",
+                               "content_type": minutes.pop("content_type")}
+    return break_json(minutes, json_defect) if json_defect else json.dumps(minutes)
+
+
+EMBEDDING_DIMENSIONS = 256
+
+
+def fake_embedding(text: str) -> list:
+    vector = np.zeros(EMBEDDING_DIMENSIONS, dtype=np.float32)
+    for word in re.findall(r"[a-z0-9]+", text.lower()):
+        vector[zlib.crc32(word[:5].encode()) % EMBEDDING_DIMENSIONS] += 1.0
+    norm = np.linalg.norm(vector)
+    return (vector / norm if norm else vector).tolist()
+
+
+def _multipart_fields(content_type: str, body: bytes) -> dict:
+    message = BytesParser(policy=HTTP).parsebytes(
+        f"Content-Type: {content_type}\r\n\r\n".encode() + body
+    )
+    fields = {}
+    for part in message.iter_parts():
+        name = part.get_param("name", header="content-disposition")
+        fields[name] = part.get_payload(decode=True)
+    return fields
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    config = FakeServerConfig()
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length)
+
+        if self.path.rstrip("/").endswith("/audio/transcriptions"):
+            fields = _multipart_fields(self.headers.get("Content-Type", ""), body)
+            try:
+                result = fake_transcription(fields["file"])
+            except Exception as e:
+                return self._send_json(400, {"error": {"message": f"unreadable audio: {e}"}})
+            time.sleep((self.config.latency_ms + self.config.ms_per_audio_second * result["duration"]) / 1000)
+            if fields.get("response_format", b"json").decode() != "verbose_json":
+                result = {"text": result["text"]}
+            return self._send_json(200, result)
+
+        if self.path.rstrip("/").endswith("/chat/completions"):
+            payload = json.loads(body or b"{}")
+            if payload.get("response_format") and not self.config.json_mode:
+                return self._send_json(400, {"error": {"message": "response_format is not supported"}})
+            prompt = payload["messages"][-1]["content"]
+            reply = fake_chat_reply(prompt, self.config.json_defect)
+            time.sleep(self.config.latency_ms / 1000)
+            return self._send_json(200, {
+                "id": "chatcmpl-fake",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": payload.get("model", "fake-model"),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": reply},
+                             "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": len(prompt.split()), "completion_tokens": len(reply.split()),
+                          "total_tokens": len(prompt.split()) + len(reply.split())}
+            })
+
+        if self.path.rstrip("/").endswith("/embeddings"):
+            payload = json.loads(body or b"{}")
+            texts = payload.get("input") or []
+            texts = [texts] if isinstance(texts, str) else texts
+            return self._send_json(200, {
+                "object": "list",
+                "model": payload.get("model", "fake-embedding"),
+                "data": [{"object": "embedding", "index": i, "embedding": fake_embedding(t)}
+                         for i, t in enumerate(texts)],
+                "usage": {"prompt_tokens": 0, "total_tokens": 0}
+            })
+
+        self._send_json(404, {"error": {"message": "not found"}})
+
+
+def start_fake_openai_server(host="127.0.0.1", port=0, config=None):
+    """Start the server on a daemon thread. Returns (server, base_url)."""
+    handler = type("ConfiguredFakeOpenAIHandler", (FakeOpenAIHandler,), {"config": config or FakeServerConfig()})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/v1"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Deterministic OpenAI-compatible stub for the summarizer.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8556)
+    parser.add_argument("--latency-ms", type=int, default=200, help="fixed delay per request")
+    parser.add_argument("--ms-per-audio-second", type=float, default=0.0,
+                        help="extra delay per second of uploaded audio")
+    parser.add_argument("--json-defect", choices=JSON_DEFECTS, help="break every minutes reply this way")
+    parser.add_argument("--no-json-mode", action="store_true", help="reject requests with response_format")
+    args = parser.parse_args()
+
+    FakeOpenAIHandler.config = FakeServerConfig(args.latency_ms, args.ms_per_audio_second, args.json_defect,
+                                                not args.no_json_mode)
+    server = ThreadingHTTPServer((args.host, args.port), FakeOpenAIHandler)
+    print(f"Fake OpenAI server on http://{args.host}:{args.port}/v1")
+    server.serve_forever()
@@ -0,0 +1,254 @@
+"""
+Persistent job queue for summarizing many recordings.
+
+Each job goes through two pools so stages of different jobs overlap:
+
+    extract   ffmpeg decoding (CPU-bound), EXTRACT_WORKERS at a time
+    process   transcription + summarization (waiting on the APIs),
+              JOB_WORKERS at a time
+
+Decoded audio is held in memory between the two, so at most
+2 * JOB_WORKERS jobs may be extracted ahead of the process pool.
+
+Job state is written to SUMMARIZER_JOBS_DIR as one JSON file per job. A
+queue started with resume=True (the MCP server) resumes jobs that were
+queued or running (the stage cache makes the resumed job skip whatever it
+had finished). Command-line batches don't, so they never pick up jobs a
+running server is working on.
+
+    python job_queue.py lectures/ extra_talk.mp4
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import logging
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import script
+
+logger = logging.getLogger(__name__)
+
+JOBS_DIR = os.getenv("SUMMARIZER_JOBS_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "jobs"))
+EXTRACT_WORKERS = int(os.getenv("SUMMARIZER_EXTRACT_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+JOB_WORKERS = int(os.getenv("SUMMARIZER_JOB_WORKERS", "4"))
+
+MEDIA_EXTENSIONS = {".mp4", ".mkv", ".mov", ".avi", ".webm", ".m4v", ".mp3", ".m4a", ".wav", ".flac", ".ogg", ".aac"}
+
+QUEUED, EXTRACTING, WAITING, PROCESSING, DONE, FAILED = (
+    "queued", "extracting", "extracted", "processing", "done", "failed")
+FINISHED = (DONE, FAILED)
+
+
+def expand_inputs(paths: List[str]) -> List[str]:
+    """Files as given, plus the media files inside any folders (recursively, sorted)"""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for directory, _, names in sorted(os.walk(path)):
+                files.extend(os.path.join(directory, n) for n in sorted(names)
+                             if os.path.splitext(n)[1].lower() in MEDIA_EXTENSIONS)
+        else:
+            files.append(path)
+    return [os.path.abspath(f) for f in files]
+
+
+class JobQueue:
+    def __init__(self, jobs_dir=JOBS_DIR, extract_workers=EXTRACT_WORKERS, job_workers=JOB_WORKERS, resume=False):
+        self.jobs_dir = jobs_dir
+        os.makedirs(jobs_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._done = threading.Condition(self._lock)
+        self.jobs: Dict[str, Dict] = {}
+        self._extract_pool = ThreadPoolExecutor(max_workers=extract_workers, thread_name_prefix="extract")
+        self._process_pool = ThreadPoolExecutor(max_workers=job_workers, thread_name_prefix="process")
+        # Caps decoded audio waiting in memory for the process pool
+        self._in_memory = threading.BoundedSemaphore(2 * job_workers)
+        self._load(resume)
+
+    # -----------------------------
+    # Persistence
+    # -----------------------------
+    def _job_path(self, job_id: str, suffix="json") -> str:
+        return os.path.join(self.jobs_dir, f"{job_id}.{suffix}")
+
+    def _write(self, path: str, value):
+        fd, tmp = tempfile.mkstemp(dir=self.jobs_dir, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(value, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, path)
+
+    def _save(self, job: Dict):
+        self._write(self._job_path(job["id"]), job)
+
+    def _load(self, resume: bool):
+        resumed = []
+        for name in sorted(os.listdir(self.jobs_dir)):
+            if not name.endswith(".json") or name.endswith(".result.json"):
+                continue
+            try:
+                with open(os.path.join(self.jobs_dir, name), encoding="utf-8") as f:
+                    job = json.load(f)
+            except (OSError, json.JSONDecodeError):
+                logger.warning("Skipping unreadable job file %s", name)
+                continue
+            if job["status"] not in FINISHED:
+                if not resume:
+                    continue  # another queue's job, possibly still running there
+                resumed.append(job)
+            self.jobs[job["id"]] = job
+        for job in sorted(resumed, key=lambda j: j["submitted_at"]):
+            logger.info("Resuming job %s (%s)", job["id"], job["input_file"])
+            self._start(job)
+
+    # -----------------------------
+    # Pipeline
+    # -----------------------------
+    def _update(self, job: Dict, **fields):
+        with self._lock:
+            job.update(fields)
+            self._save(job)
+            if job["status"] in FINISHED:
+                self._done.notify_all()
+
+    def _fail(self, job: Dict, error: Exception):
+        logger.error("Job %s failed: %s", job["id"], error)
+        self._update(job, status=FAILED, error=f"{type(error).__name__}: {error}", finished_at=time.time())
+
+    def _start(self, job: Dict):
+        self._update(job, status=QUEUED, error=None)
+        self._extract_pool.submit(self._extract, job)
+
+    def _extract(self, job: Dict):
+        self._in_memory.acquire()
+        try:
+            self._update(job, status=EXTRACTING, started_at=job.get("started_at") or time.time())
+            started = time.perf_counter()
+            transcript = script.cached_transcript(job["input_file"])
+            audio = None if transcript is not None else script.extract_samples(job["input_file"])
+            self._update(job, status=WAITING, extract_s=round(time.perf_counter() - started, 3))
+        except Exception as e:
+            self._in_memory.release()
+            return self._fail(job, e)
+        self._process_pool.submit(self._process, job, transcript, audio)
+
+    def _process(self, job: Dict, transcript: Optional[Dict], audio):
+        holding_audio = True
+        try:
+            self._update(job, status=PROCESSING)
+            started = time.perf_counter()
+            if transcript is None:
+                transcript = script.transcribe_extracted(job["input_file"], *audio)
+            audio, holding_audio = None, False
+            self._in_memory.release()
+            minutes_json = script.summarize_recording(job["input_file"], transcript)
+            meeting_id = script.save_meeting(job["input_file"], transcript, minutes_json)
+            try:
+                minutes = json.loads(minutes_json)
+            except json.JSONDecodeError:
+                minutes = {"raw_output": minutes_json}
+            self._write(self._job_path(job["id"], "result.json"), minutes)
+            self._update(job, status=DONE, meeting_id=meeting_id, process_s=round(time.perf_counter() - started, 3),
+                         finished_at=time.time())
+        except Exception as e:
+            if holding_audio:
+                self._in_memory.release()
+            self._fail(job, e)
+
+    # -----------------------------
+    # API
+    # -----------------------------
+    def submit(self, paths: List[str]) -> Dict:
+        """Queue every file (and every media file in every folder); returns the batch and job ids"""
+        files = expand_inputs(paths)
+        missing = [f for f in files if not os.path.isfile(f)]
+        if missing:
+            raise FileNotFoundError(f"Not found: {', '.join(missing)}")
+        if not files:
+            raise ValueError("No media files to summarize")
+
+        batch = uuid.uuid4().hex[:12]
+        jobs = []
+        for input_file in files:
+            job = {"id": uuid.uuid4().hex[:12], "batch": batch, "input_file": input_file, "status": QUEUED,
+                   "submitted_at": time.time(), "started_at": None, "finished_at": None, "error": None}
+            with self._lock:
+                self.jobs[job["id"]] = job
+            jobs.append(job)
+        for job in jobs:
+            self._start(job)
+        return {"batch_id": batch, "job_ids": [j["id"] for j in jobs]}
+
+    def _select(self, job_id: Optional[str]) -> List[Dict]:
+        if not job_id:
+            return list(self.jobs.values())
+        if job_id in self.jobs:
+            return [self.jobs[job_id]]
+        batch = [j for j in self.jobs.values() if j["batch"] == job_id]
+        if not batch:
+            raise KeyError(f"Unknown job or batch: {job_id}")
+        return batch
+
+    def status(self, job_id: Optional[str] = None) -> Dict:
+        """One job, one batch, or everything, with counts per status"""
+        with self._lock:
+            jobs = [dict(j) for j in self._select(job_id)]
+        counts = {}
+        for job in jobs:
+            counts[job["status"]] = counts.get(job["status"], 0) + 1
+        return {"counts": counts, "jobs": sorted(jobs, key=lambda j: j["submitted_at"])}
+
+    def result(self, job_id: str) -> Dict:
+        with self._lock:
+            if job_id not in self.jobs:
+                raise KeyError(f"Unknown job: {job_id}")
+            job = dict(self.jobs[job_id])
+        if job["status"] != DONE:
+            return {"job": job, "minutes": None}
+        with open(self._job_path(job_id, "result.json"), encoding="utf-8") as f:
+            return {"job": job, "minutes": json.load(f)}
+
+    def wait(self, job_id: Optional[str] = None, timeout: Optional[float] = None) -> bool:
+        """Block until the job/batch (or every job) has finished; False on timeout"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._lock:
+            while not all(j["status"] in FINISHED for j in self._select(job_id)):
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._done.wait(remaining)
+        return True
+
+    def shutdown(self):
+        self._extract_pool.shutdown(wait=True)
+        self._process_pool.shutdown(wait=True)
+
+
+def run_batch(paths: List[str]) -> int:
+    """Summarize paths with a fresh queue; prints progress to stderr and returns an exit code"""
+    queue = JobQueue()
+    batch = queue.submit(paths)["batch_id"]
+    started = time.time()
+    while not queue.wait(batch, timeout=10):
+        print(f"[INFO] {queue.status(batch)['counts']} after {time.time() - started:.0f}s", file=sys.stderr)
+    status = queue.status(batch)
+    for job in status["jobs"]:
+        mark = "✅" if job["status"] == DONE else "❌"
+        print(f"{mark} {job['id']} {job['input_file']} {job.get('error') or ''}".rstrip())
+    print(f"[INFO] Batch {batch}: {status['counts']} in {time.time() - started:.0f}s; "
+          f"minutes in {queue.jobs_dir}/<job id>.result.json")
+    queue.shutdown()
+    return 0 if status["counts"].get(DONE, 0) == len(status["jobs"]) else 1
+
+
+if __name__ == "__main__":
+    logging.basicConfig(stream=sys.stderr, level=logging.INFO)
+    if len(sys.argv) < 2:
+        print("usage: python job_queue.py FILE_OR_FOLDER [...]", file=sys.stderr)
+        sys.exit(2)
+    sys.exit(run_batch(sys.argv[1:]))
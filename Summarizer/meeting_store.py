@@ -0,0 +1,374 @@
+"""
+Persistent store of summarized meetings, searchable by segment.
+
+Every processed recording keeps its timestamped transcript segments and
+minutes JSON in SQLite (SUMMARIZER_MEETINGS_DB). Segments are indexed twice:
+
+    full text   an FTS5 table (porter stemming), ranked by BM25
+    embeddings  one float32 vector per segment, searched by cosine
+                similarity in memory
+
+search() fuses both rankings with reciprocal rank fusion, so a query finds
+exact names and terms as well as paraphrases, and every hit carries its
+start/end time in milliseconds. Nothing is re-transcribed to answer it.
+
+The embedding model is set by SUMMARIZER_EMBED_BACKEND:
+
+    local    sentence-transformers on this machine (default)
+    openai   any OpenAI-compatible /embeddings endpoint
+             (SUMMARIZER_EMBED_BASE_URL, e.g. fake_openai_server.py)
+    off      full-text search only
+
+Segments stored while the model was unavailable are embedded by reindex().
+
+    python meeting_store.py search "budget for the field trip"
+    python meeting_store.py reindex
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import sqlite3
+import logging
+import threading
+from typing import Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+MEETINGS_DB = os.getenv("SUMMARIZER_MEETINGS_DB",
+                        os.path.join(os.path.dirname(os.path.abspath(__file__)), "meetings.db"))
+EMBED_BACKEND = os.getenv("SUMMARIZER_EMBED_BACKEND", "local")
+EMBED_MODEL = os.getenv("SUMMARIZER_EMBED_MODEL", "")
+EMBED_BASE_URL = os.getenv("SUMMARIZER_EMBED_BASE_URL", "")
+EMBED_BATCH = 128
+
+# Reciprocal rank fusion constant and how deep each ranking is read
+RRF_K = 60
+CANDIDATES = 50
+# Segments less similar than this to the query are not vector matches
+MIN_SIMILARITY = 0.25
+
+WORD = re.compile(r"\w+", re.UNICODE)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meetings (
+    id INTEGER PRIMARY KEY,
+    digest TEXT UNIQUE,
+    filename TEXT NOT NULL,
+    duration_ms INTEGER,
+    created_at REAL NOT NULL,
+    minutes TEXT
+);
+CREATE TABLE IF NOT EXISTS segments (
+    id INTEGER PRIMARY KEY,
+    meeting_id INTEGER NOT NULL REFERENCES meetings(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    start_ms INTEGER NOT NULL,
+    end_ms INTEGER NOT NULL,
+    text TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS segments_meeting ON segments(meeting_id, position);
+CREATE VIRTUAL TABLE IF NOT EXISTS segments_fts USING fts5(
+    text, content='segments', content_rowid='id', tokenize='porter unicode61'
+);
+CREATE TRIGGER IF NOT EXISTS segments_ai AFTER INSERT ON segments BEGIN
+    INSERT INTO segments_fts(rowid, text) VALUES (new.id, new.text);
+END;
+CREATE TRIGGER IF NOT EXISTS segments_ad AFTER DELETE ON segments BEGIN
+    INSERT INTO segments_fts(segments_fts, rowid, text) VALUES ('delete', old.id, old.text);
+END;
+CREATE TABLE IF NOT EXISTS segment_vectors (
+    segment_id INTEGER NOT NULL REFERENCES segments(id) ON DELETE CASCADE,
+    model TEXT NOT NULL,
+    vector BLOB NOT NULL,
+    PRIMARY KEY (segment_id, model)
+);
+-- Bumped on every vector change (cascade deletes included): the in-memory
+-- matrix is reloaded when it moves, even if ids and counts come out the same
+CREATE TABLE IF NOT EXISTS vector_version (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    version INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO vector_version (id, version) VALUES (1, 0);
+CREATE TRIGGER IF NOT EXISTS segment_vectors_ai AFTER INSERT ON segment_vectors BEGIN
+    UPDATE vector_version SET version = version + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS segment_vectors_ad AFTER DELETE ON segment_vectors BEGIN
+    UPDATE vector_version SET version = version + 1;
+END;
+"""
+
+
+# ---------- Embeddings ----------
+class APIEmbedder:
+    """OpenAI-compatible client with the embeddings API"""
+
+    def __init__(self, client, model=None):
+        self.client = client
+        self.model = model or EMBED_MODEL or "text-embedding-3-small"
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        vectors = []
+        for i in range(0, len(texts), EMBED_BATCH):
+            response = self.client.embeddings.create(model=self.model, input=texts[i:i + EMBED_BATCH])
+            vectors.extend(item.embedding for item in sorted(response.data, key=lambda d: d.index))
+        return np.asarray(vectors, dtype=np.float32)
+
+
+class LocalEmbedder:
+    """sentence-transformers on the local CPU/GPU (same model as the GIKI chatbot)"""
+
+    def __init__(self, model=None):
+        from sentence_transformers import SentenceTransformer
+        self.model = model or EMBED_MODEL or "sentence-transformers/all-MiniLM-L6-v2"
+        self._model = SentenceTransformer(self.model, device="cpu")
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        return np.asarray(self._model.encode(texts, batch_size=EMBED_BATCH), dtype=np.float32)
+
+
+def get_embedder(name: Optional[str] = None):
+    name = name or EMBED_BACKEND
+    if name == "off":
+        return None
+    if name == "openai":
+        from openai import OpenAI
+        client = OpenAI(base_url=EMBED_BASE_URL or None,
+                        api_key=os.getenv("SUMMARIZER_EMBED_API_KEY") or os.getenv("OPENAI_API_KEY") or "unset")
+        return APIEmbedder(client)
+    if name == "local":
+        return LocalEmbedder()
+    raise ValueError(f"Unknown embedding backend: {name}")
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    return vectors / (np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-12)
+
+
+def fts_query(query: str) -> str:
+    """Any of the query's words, each quoted so FTS5 operators in user text are literal"""
+    return " OR ".join(f'"{w}"' for w in WORD.findall(query.lower()))
+
+
+# ---------- Store ----------
+class MeetingStore:
+    def __init__(self, path=MEETINGS_DB, embedder="default"):
+        self.path = path
+        self._embedder = embedder
+        self._write_lock = threading.Lock()
+        self._local = threading.local()
+        # Normalized vectors of every embedded segment, reloaded when the
+        # vector table changes (also by other processes)
+        self._matrix = None
+        self._matrix_ids = None
+        self._matrix_version = None
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._local.conn = conn
+        return conn
+
+    @property
+    def embedder(self):
+        if self._embedder == "default":
+            try:
+                self._embedder = get_embedder()
+            except Exception as e:
+                logger.warning("Embeddings unavailable (%s); full-text search only", e)
+                self._embedder = None
+        return self._embedder
+
+    @property
+    def model(self) -> Optional[str]:
+        return getattr(self.embedder, "model", None) if self.embedder else None
+
+    # -----------------------------
+    # Writes
+    # -----------------------------
+    def add_meeting(self, filename: str, transcript: Dict, minutes=None, digest: Optional[str] = None) -> int:
+        """
+        Store (or replace, for a known digest) a meeting's transcript segments
+        and minutes; returns its id. transcript is transcribe_samples() output.
+        """
+        pieces = [p for p in transcript.get("segments") or [] if p.get("text", "").strip()]
+        if not pieces and transcript.get("text", "").strip():
+            pieces = [{"start": 0.0, "end": 0.0, "text": transcript["text"]}]
+        rows = [(i, int(round(p["start"] * 1000)), int(round(p["end"] * 1000)), p["text"].strip())
+                for i, p in enumerate(pieces)]
+        minutes_json = minutes if isinstance(minutes, str) or minutes is None else json.dumps(minutes)
+
+        with self._write_lock:
+            conn = self._connect()
+            with conn:
+                meeting_id = self._replace(conn, filename, rows, minutes_json, digest)
+        self.reindex(meeting_id)
+        return meeting_id
+
+    def _replace(self, conn, filename, rows, minutes_json, digest) -> int:
+        existing = conn.execute("SELECT id FROM meetings WHERE digest = ?", (digest,)).fetchone() \
+            if digest is not None else None
+        if existing is not None:
+            stored = conn.execute("SELECT position, start_ms, end_ms, text FROM segments "
+                                  "WHERE meeting_id = ? ORDER BY position", (existing["id"],)).fetchall()
+            if [tuple(row) for row in stored] == rows:
+                # Same transcript (e.g. a rerun from the stage cache): keep its vectors
+                conn.execute("UPDATE meetings SET filename = ?, minutes = ? WHERE id = ?",
+                             (filename, minutes_json, existing["id"]))
+                return existing["id"]
+            conn.execute("DELETE FROM meetings WHERE id = ?", (existing["id"],))
+        meeting_id = conn.execute(
+            "INSERT INTO meetings (digest, filename, duration_ms, created_at, minutes) VALUES (?, ?, ?, ?, ?)",
+            (digest, filename, max((r[2] for r in rows), default=0), time.time(), minutes_json)
+        ).lastrowid
+        conn.executemany(
+            "INSERT INTO segments (meeting_id, position, start_ms, end_ms, text) VALUES (?, ?, ?, ?, ?)",
+            [(meeting_id, *row) for row in rows]
+        )
+        return meeting_id
+
+    def reindex(self, meeting_id: Optional[int] = None) -> int:
+        """Embed segments without a vector for the current model; returns how many"""
+        if self.embedder is None:
+            return 0
+        conn = self._connect()
+        query = ("SELECT s.id, s.text FROM segments s LEFT JOIN segment_vectors v "
+                 "ON v.segment_id = s.id AND v.model = ? WHERE v.segment_id IS NULL")
+        params = [self.model]
+        if meeting_id is not None:
+            query += " AND s.meeting_id = ?"
+            params.append(meeting_id)
+        missing = conn.execute(query, params).fetchall()
+        if not missing:
+            return 0
+        try:
+            vectors = self.embedder.embed([row["text"] for row in missing])
+        except Exception as e:
+            logger.warning("Embedding %d segments failed (%s); they stay full-text only", len(missing), e)
+            return 0
+        with self._write_lock:
+            with conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO segment_vectors (segment_id, model, vector) VALUES (?, ?, ?)",
+                    [(row["id"], self.model, vector.tobytes()) for row, vector in zip(missing, vectors)]
+                )
+        return len(missing)
+
+    # -----------------------------
+    # Reads
+    # -----------------------------
+    def _vectors(self):
+        conn = self._connect()
+        version = conn.execute("SELECT version FROM vector_version").fetchone()[0]
+        if self._matrix_version != version:
+            rows = conn.execute(
+                "SELECT segment_id, vector FROM segment_vectors WHERE model = ?", (self.model,)).fetchall()
+            self._matrix_ids = np.array([r["segment_id"] for r in rows], dtype=np.int64)
+            self._matrix = _normalize(np.vstack([np.frombuffer(r["vector"], dtype=np.float32) for r in rows])) \
+                if rows else None
+            self._matrix_version = version
+        return self._matrix_ids, self._matrix
+
+    def _full_text_ranking(self, query: str, limit: int, meeting_id: Optional[int]) -> List[int]:
+        match = fts_query(query)
+        if not match:
+            return []
+        sql = ("SELECT s.id FROM segments_fts JOIN segments s ON s.id = segments_fts.rowid "
+               "WHERE segments_fts MATCH ?")
+        params = [match]
+        if meeting_id is not None:
+            sql += " AND s.meeting_id = ?"
+            params.append(meeting_id)
+        sql += " ORDER BY bm25(segments_fts) LIMIT ?"
+        return [row[0] for row in self._connect().execute(sql, (*params, limit))]
+
+    def _vector_ranking(self, query: str, limit: int, meeting_id: Optional[int]) -> List[int]:
+        if self.embedder is None:
+            return []
+        ids, matrix = self._vectors()
+        if matrix is None:
+            return []
+        try:
+            query_vector = _normalize(self.embedder.embed([query]))[0]
+        except Exception as e:
+            logger.warning("Query embedding failed (%s); full-text results only", e)
+            return []
+        scores = matrix @ query_vector
+        if meeting_id is not None:
+            allowed = {row[0] for row in self._connect().execute(
+                "SELECT id FROM segments WHERE meeting_id = ?", (meeting_id,))}
+            scores = np.where(np.isin(ids, list(allowed)), scores, -np.inf)
+        top = np.argsort(-scores)[:limit]
+        return [int(ids[i]) for i in top if scores[i] >= MIN_SIMILARITY]
+
+    def search(self, query: str, limit=10, meeting_id: Optional[int] = None) -> List[Dict]:
+        """Segments matching query, best first, fused from full-text and embedding rankings"""
+        fused: Dict[int, float] = {}
+        rankings = {"text": self._full_text_ranking(query, CANDIDATES, meeting_id),
+                    "vector": self._vector_ranking(query, CANDIDATES, meeting_id)}
+        for ranking in rankings.values():
+            for rank, segment_id in enumerate(ranking):
+                fused[segment_id] = fused.get(segment_id, 0.0) + 1.0 / (RRF_K + rank + 1)
+        best = sorted(fused, key=fused.get, reverse=True)[:limit]
+        if not best:
+            return []
+
+        rows = self._connect().execute(
+            f"SELECT s.id, s.meeting_id, s.start_ms, s.end_ms, s.text, m.filename FROM segments s "
+            f"JOIN meetings m ON m.id = s.meeting_id WHERE s.id IN ({','.join('?' * len(best))})", best
+        ).fetchall()
+        by_id = {row["id"]: row for row in rows}
+        matched_by = {sid: [name for name, ranking in rankings.items() if sid in ranking] for sid in best}
+        return [{
+            "meeting_id": by_id[sid]["meeting_id"],
+            "filename": by_id[sid]["filename"],
+            "start_ms": by_id[sid]["start_ms"],
+            "end_ms": by_id[sid]["end_ms"],
+            "text": by_id[sid]["text"],
+            "score": round(fused[sid], 5),
+            "matched_by": matched_by[sid]
+        } for sid in best if sid in by_id]
+
+    def meetings(self) -> List[Dict]:
+        rows = self._connect().execute(
+            "SELECT m.id, m.filename, m.duration_ms, m.created_at, COUNT(s.id) AS segments "
+            "FROM meetings m LEFT JOIN segments s ON s.meeting_id = m.id GROUP BY m.id ORDER BY m.created_at"
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def minutes(self, meeting_id: int):
+        row = self._connect().execute("SELECT minutes FROM meetings WHERE id = ?", (meeting_id,)).fetchone()
+        if row is None:
+            raise KeyError(f"Unknown meeting: {meeting_id}")
+        try:
+            return json.loads(row["minutes"]) if row["minutes"] else None
+        except json.JSONDecodeError:
+            return row["minutes"]
+
+
+def format_ms(ms: int) -> str:
+    seconds = ms // 1000
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}.{ms % 1000:03d}"
+
+
+if __name__ == "__main__":
+    logging.basicConfig(stream=sys.stderr, level=logging.INFO)
+    store = MeetingStore()
+    if len(sys.argv) > 2 and sys.argv[1] == "search":
+        for hit in store.search(" ".join(sys.argv[2:])):
+            print(f"{hit['filename']} [{format_ms(hit['start_ms'])}] {hit['text']}")
+    elif len(sys.argv) > 1 and sys.argv[1] == "reindex":
+        print(f"Embedded {store.reindex()} segments")
+    else:
+        for meeting in store.meetings():
+            print(f"{meeting['id']:>4}  {meeting['segments']:>5} segments  {meeting['filename']}")
@@ -0,0 +1,295 @@
+"""
+Meeting-minutes output layer: JSON mode, local repair, schema validation.
+
+A reply that doesn't parse is not worth a second pass over the transcript.
+Replies go through three steps, cheapest first:
+
+    request   ask for JSON mode (SUMMARIZER_JSON_MODE: json_object, or
+              json_schema for providers with structured output); models
+              that reject it are remembered and asked without it
+    repair    <think> blocks, code fences, prose around the object,
+              trailing commas and truncated output (unclosed strings,
+              arrays, objects) are fixed locally
+    validate  fields are checked against the minutes schema and coerced
+              where the intent is clear (a string where a list belongs,
+              a bare action item string, an unknown priority)
+
+Only a reply that still fails is sent back to the model with the problems
+found, without the transcript.
+"""
+
+import os
+import re
+import json
+import logging
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+JSON_MODE = os.getenv("SUMMARIZER_JSON_MODE", "json_object")  # json_object | json_schema | off
+REASK_ATTEMPTS = 1
+# Longest broken reply quoted back to the model in a re-ask
+REASK_MAX_CHARS = 12000
+
+CONTENT_TYPES = ("meeting", "presentation", "discussion")
+PRIORITIES = ("high", "medium", "low")
+NOT_SPECIFIED = "Not specified"
+ACTION_ITEM_DEFAULTS = {"owner": NOT_SPECIFIED, "deadline": NOT_SPECIFIED, "priority": "medium"}
+LIST_FIELDS = ("key_topics", "decisions", "participants", "important_quotes", "follow_up_questions")
+FIELD_ORDER = ("metadata", "content_type", "summary", "key_topics", "decisions", "action_items", "participants",
+               "important_quotes", "follow_up_questions")
+
+THINK_BLOCK = re.compile(r"<think>.*?(</think>|$)", re.S)
+CODE_FENCE = re.compile(r"```(?:json)?\s*(.*?)(?:```|$)", re.S | re.I)
+
+
+# ---------- Schema ----------
+_STRINGS = {"type": "array", "items": {"type": "string"}}
+ACTION_ITEM_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "task": {"type": "string"},
+        "owner": {"type": "string"},
+        "deadline": {"type": "string"},
+        "priority": {"type": "string", "enum": list(PRIORITIES)}
+    },
+    "required": ["task", "owner", "deadline", "priority"]
+}
+
+
+def minutes_schema(partial=False) -> Dict:
+    """JSON Schema of full minutes, or of the partial minutes of one transcript chunk"""
+    properties = {"summary": {"type": "string"}, "action_items": {"type": "array", "items": ACTION_ITEM_SCHEMA}}
+    properties.update({field: _STRINGS for field in LIST_FIELDS})
+    if partial:
+        properties["content_type"] = {"type": "string", "enum": list(CONTENT_TYPES)}
+    else:
+        properties["metadata"] = {
+            "type": "object",
+            "properties": {
+                "filename": {"type": "string"},
+                "processing_timestamp": {"type": "string"},
+                "content_type": {"type": "string", "enum": list(CONTENT_TYPES)}
+            },
+            "required": ["content_type"]
+        }
+    return {"type": "object", "properties": properties, "required": ["summary", *LIST_FIELDS, "action_items"]}
+
+
+# ---------- Repair ----------
+def repair_json(reply: str) -> str:
+    """
+    The JSON object in a model reply with common defects fixed. Truncated
+    output is cut back to the last complete value and its brackets closed.
+    """
+    text = THINK_BLOCK.sub("", reply or "")
+    fenced = CODE_FENCE.search(text)
+    if fenced and "{" in fenced.group(1):
+        text = fenced.group(1)
+    start = text.find("{")
+    if start < 0:
+        raise ValueError("no JSON object in model reply")
+
+    out: List[str] = []
+    stack: List[str] = []
+    in_string = escaped = False
+    # Where the output can be cut if the reply is truncated: after an
+    # opening bracket or a complete value, with the brackets open there
+    safe = (0, [])
+    for ch in text[start:]:
+        if in_string:
+            out.append(ch)
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+            continue
+        if ch == '"':
+            in_string = True
+            out.append(ch)
+        elif ch in "{[":
+            stack.append(ch)
+            out.append(ch)
+            safe = (len(out), stack[:])
+        elif ch in "}]":
+            # Trailing comma before the closing bracket
+            while out and out[-1].isspace():
+                out.pop()
+            if out and out[-1] == ",":
+                out.pop()
+            stack.pop()
+            out.append("}" if ch == "}" else "]")
+            if not stack:
+                return "".join(out)  # anything after the object is prose
+            safe = (len(out), stack[:])
+        elif ch == ",":
+            safe = (len(out), stack[:])
+            out.append(ch)
+        else:
+            out.append(ch)
+
+    position, open_brackets = safe
+    repaired = "".join(out[:position]).rstrip().rstrip(",")
+    return repaired + "".join("}" if b == "{" else "]" for b in reversed(open_brackets))
+
+
+# ---------- Validation ----------
+def _as_strings(value, field: str, errors: List[str]) -> List[str]:
+    if value is None:
+        return []
+    if isinstance(value, str):
+        return [value] if value.strip() else []
+    if not isinstance(value, list):
+        errors.append(f'"{field}" must be a list of strings')
+        return []
+    items = []
+    for item in value:
+        if isinstance(item, (str, int, float)):
+            items.append(str(item))
+        elif isinstance(item, dict) and len(item) == 1:
+            items.append(str(next(iter(item.values()))))
+        else:
+            errors.append(f'"{field}" must contain only strings')
+    return items
+
+
+def _action_items(value, errors: List[str]) -> List[Dict]:
+    if value is None:
+        return []
+    if not isinstance(value, list):
+        value = [value]
+    items = []
+    for item in value:
+        if isinstance(item, str):
+            item = {"task": item}
+        if not isinstance(item, dict) or not str(item.get("task") or "").strip():
+            errors.append('every "action_items" entry needs a "task"')
+            continue
+        normalized = {"task": str(item["task"]).strip()}
+        for field, default in ACTION_ITEM_DEFAULTS.items():
+            normalized[field] = str(item.get(field) or default)
+        normalized["priority"] = normalized["priority"].lower()
+        if normalized["priority"] not in PRIORITIES:
+            normalized["priority"] = "medium"
+        items.append(normalized)
+    return items
+
+
+def _content_type(value) -> str:
+    value = str(value or "").lower()
+    return value if value in CONTENT_TYPES else "meeting"
+
+
+def validate_minutes(value, partial=False, filename=None) -> Tuple[Optional[Dict], List[str]]:
+    """
+    (normalized minutes, problems). Minutes are None if the problems can't
+    be fixed without the model.
+    """
+    if not isinstance(value, dict):
+        return None, ["the reply must be a JSON object"]
+    errors = []
+    summary = value.get("summary")
+    if not isinstance(summary, str) or not summary.strip():
+        errors.append('"summary" must be a non-empty string')
+
+    minutes = {"summary": summary.strip() if isinstance(summary, str) else ""}
+    for field in LIST_FIELDS:
+        minutes[field] = _as_strings(value.get(field), field, errors)
+    minutes["action_items"] = _action_items(value.get("action_items"), errors)
+
+    metadata = value.get("metadata") if isinstance(value.get("metadata"), dict) else {}
+    if partial:
+        minutes["content_type"] = _content_type(value.get("content_type") or metadata.get("content_type"))
+    else:
+        minutes["metadata"] = {
+            **metadata,
+            "filename": metadata.get("filename") or filename or "unknown",
+            "processing_timestamp": metadata.get("processing_timestamp") or "auto-generated",
+            "content_type": _content_type(metadata.get("content_type") or value.get("content_type"))
+        }
+    if errors:
+        return None, errors
+    return {field: minutes[field] for field in FIELD_ORDER if field in minutes}, []
+
+
+def parse_minutes(reply: str, partial=False, filename=None) -> Tuple[Optional[Dict], List[str]]:
+    """repair_json() + validate_minutes() for a raw model reply"""
+    try:
+        value = json.loads(repair_json(reply))
+    except ValueError as e:  # includes json.JSONDecodeError
+        return None, [f"invalid JSON: {e}"]
+    return validate_minutes(value, partial, filename)
+
+
+# ---------- Requests ----------
+_no_response_format = set()
+
+
+def _response_format(partial: bool) -> Optional[Dict]:
+    if JSON_MODE == "json_object":
+        return {"type": "json_object"}
+    if JSON_MODE == "json_schema":
+        return {"type": "json_schema", "json_schema": {
+            "name": "meeting_minutes_part" if partial else "meeting_minutes",
+            "schema": minutes_schema(partial)
+        }}
+    return None
+
+
+def complete(client, prompt: str, model: str, response_format: Optional[Dict] = None) -> str:
+    """One chat completion; response_format is dropped for models that reject it"""
+    kwargs = {}
+    if response_format and model not in _no_response_format:
+        kwargs["response_format"] = response_format
+    try:
+        response = client.chat.completions.create(
+            model=model,
+            messages=[{"role": "user", "content": prompt}],
+            **kwargs
+        )
+    except Exception as e:
+        if not kwargs or getattr(e, "status_code", None) not in (400, 404, 422):
+            raise
+        logger.info("%s rejected response_format (%s); asking without it", model, e)
+        _no_response_format.add(model)
+        return complete(client, prompt, model)
+    return response.choices[0].message.content or ""
+
+
+REASK_PROMPT = """Your previous reply could not be used as meeting-minutes JSON.
+
+Problems:
+{problems}
+
+Return ONLY the corrected JSON object, with no markdown or other text. Keep the
+content of the previous reply; do not add new information. It must match this
+JSON Schema:
+{schema}
+
+Previous reply:
+{reply}
+"""
+
+
+def request_minutes(client, prompt: str, model: str, partial=False, filename=None,
+                    reask_attempts=REASK_ATTEMPTS) -> Tuple[Optional[Dict], str]:
+    """
+    (validated minutes or None, last raw reply). A reply that can't be
+    repaired locally is re-asked with only the reply and its problems.
+    """
+    response_format = _response_format(partial)
+    reply = complete(client, prompt, model, response_format)
+    minutes, problems = parse_minutes(reply, partial, filename)
+    for _ in range(reask_attempts):
+        if minutes is not None:
+            break
+        logger.warning("Minutes failed validation (%s); re-asking", "; ".join(problems))
+        reply = complete(client, REASK_PROMPT.format(
+            problems="\n".join(f"- {p}" for p in problems),
+            schema=json.dumps(minutes_schema(partial)),
+            reply=reply[:REASK_MAX_CHARS]
+        ), model, response_format)
+        minutes, problems = parse_minutes(reply, partial, filename)
+    return minutes, reply
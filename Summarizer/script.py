@@ -1,47 +1,87 @@
 import os
 import json
+import logging
+import tempfile
 from datetime import datetime
 from openai import OpenAI
 from dotenv import load_dotenv
 from groq import Groq
-from moviepy import VideoFileClip
+from audio_stream import AUDIO_CODEC, SAMPLE_RATE, decode_audio, decode_audio_bytes, encode_audio, encode_wav
+from transcription import (OVERLAP_SECONDS, SEGMENT_SECONDS, TRANSCRIBE_BACKEND, TRANSCRIBE_BASE_URL,
+                           TRANSCRIBE_MODEL, WhisperAPIBackend, get_backend, transcribe_chunked, transcribe_samples)
+from summarization import (CHUNK_TOKENS, PROMPT_VERSION, SINGLE_PASS_TOKENS, SUMMARIZER_MODEL, estimate_tokens,
+                           summarize_map_reduce)
+from minutes_schema import request_minutes, validate_minutes
+from stage_cache import CACHE_ENABLED, StageCache, file_digest
+from meeting_store import MeetingStore
 
 # Load API keys from .env file
 load_dotenv()
 
-# OpenRouter client for summarization
+# OpenRouter client for summarization (SUMMARIZER_LLM_BASE_URL for another
+# OpenAI-compatible server, e.g. fake_openai_server.py)
 client_openrouter = OpenAI(
-    base_url="https://openrouter.ai/api/v1",
-    api_key=os.getenv("OPENROUTER_API_KEY")
+    base_url=os.getenv("SUMMARIZER_LLM_BASE_URL", "https://openrouter.ai/api/v1"),
+    api_key=os.getenv("OPENROUTER_API_KEY") or "unset"
 )
 
 # Groq client for Whisper transcription
 client_groq = Groq(api_key=os.getenv("GROQ_API_KEY"))
 
-# ---------- STEP 1: Extract Audio from Video using MoviePy ----------
-def extract_audio(input_file, output_file="output_audio.wav"):
-    video = VideoFileClip(input_file)
-    audio = video.audio
-    audio.write_audiofile(
-        output_file,
-        fps=16000,       # sample rate (same as FFmpeg)
-        nbytes=2,        # 16-bit audio
-        codec="pcm_s16le"  # WAV format
-    )
+# Audio files larger than this are split at pauses and the segments are
+# transcribed in parallel (see transcription.py)
+CHUNKED_TRANSCRIPTION_BYTES = 20 * 1024 * 1024
+
+_transcription_backend = None
+_meeting_store = None
+
+# Extracted audio, transcripts and minutes by content hash (see stage_cache.py);
+# SUMMARIZER_CACHE=0 turns it off
+stage_cache = StageCache() if CACHE_ENABLED else None
+
+
+def transcription_backend():
+    """Groq by default; SUMMARIZER_TRANSCRIBE_BACKEND=openai|local for a stand-in"""
+    global _transcription_backend
+    if _transcription_backend is None:
+        if TRANSCRIBE_BACKEND == "groq":
+            _transcription_backend = WhisperAPIBackend(client_groq)
+        else:
+            _transcription_backend = get_backend()
+    return _transcription_backend
+
+# ---------- STEP 1: Extract Audio from Video using ffmpeg ----------
+def extract_audio(input_file, output_file=None):
+    """Write the audio track to a 16 kHz mono WAV file (a new temp file unless output_file is given)"""
+    if output_file is None:
+        fd, output_file = tempfile.mkstemp(prefix="summarizer_", suffix=".wav")
+        os.close(fd)
+    samples, rate = decode_audio(input_file)
+    with open(output_file, "wb") as f:
+        f.write(encode_wav(samples, rate))
     return output_file
 
 # ---------- STEP 2: Transcription using Groq Whisper API ----------
-def transcribe_audio(audio_file):
+def transcribe_audio(audio_file, chunked=None):
+    """chunked=None picks chunked transcription for files over CHUNKED_TRANSCRIPTION_BYTES"""
+    if chunked is None:
+        chunked = os.path.getsize(audio_file) > CHUNKED_TRANSCRIPTION_BYTES
+    if chunked:
+        return transcribe_chunked(audio_file, backend=transcription_backend())["text"]
+
     with open(audio_file, "rb") as f:
-        transcription = client_groq.audio.transcriptions.create(
-            file=(audio_file, f),
-            model="whisper-large-v3-turbo",  # or "whisper-large-v3"
-            response_format="json"
-        )
-    return transcription.text
+        transcription = transcription_backend().transcribe(f.read(), os.path.basename(audio_file))
+    return transcription["text"]
+
 
 # ---------- STEP 3: Summarization via OpenRouter (GPT-3.5) ----------
 def summarize_transcript(transcript, filename=None):
+    """(minutes dict, or None if the model's reply isn't valid minutes; the raw reply)"""
+    # Too long for one prompt: summarize parts in parallel and merge them
+    if estimate_tokens(transcript) > SINGLE_PASS_TOKENS:
+        merged = summarize_map_reduce(client_openrouter, transcript, filename=filename)
+        return validate_minutes(merged, filename=filename)[0], json.dumps(merged, indent=2)
+
     prompt = f"""
     You are an assistant that generates structured meeting minutes and notes from audio/video content.
     Input: Transcript of a meeting, presentation, or discussion.
@@ -84,12 +124,101 @@ def summarize_transcript(transcript, filename=None):
     {transcript}
     """
 
-    response = client_openrouter.chat.completions.create(
-        model="deepseek/deepseek-r1-0528-qwen3-8b:free",
-        messages=[{"role": "user", "content": prompt}]
-    )
+    # JSON mode, local repair and a short re-ask (without the transcript)
+    # when the reply isn't valid minutes; see minutes_schema.py
+    return request_minutes(client_openrouter, prompt, SUMMARIZER_MODEL, filename=filename)
+
+# ---------- Cached pipeline ----------
+# The stages are separate so job_queue.py can run extraction (CPU) and
+# transcription/summarization (network) in different pools
+def _transcript_key(digest):
+    # The same backend name and model can be served by different servers
+    base_url = TRANSCRIBE_BASE_URL if TRANSCRIBE_BACKEND == "openai" else ""
+    return StageCache.key("transcript", digest, backend=TRANSCRIBE_BACKEND, base_url=base_url,
+                          model=TRANSCRIBE_MODEL, segment_seconds=SEGMENT_SECONDS, overlap=OVERLAP_SECONDS,
+                          codec=AUDIO_CODEC)
+
+
+def cached_transcript(input_file):
+    """The stored transcript of this recording, or None"""
+    if stage_cache is None:
+        return None
+    return stage_cache.get_json("transcript", _transcript_key(file_digest(input_file)))
+
+
+def extract_samples(input_file):
+    """STEP 1: decoded audio; stored as FLAC so a rerun skips decoding the video"""
+    if stage_cache is None:
+        return decode_audio(input_file)
+    key = StageCache.key("audio", file_digest(input_file), rate=SAMPLE_RATE)
+    cached = stage_cache.get_bytes("audio", key, "flac")
+    if cached is not None:
+        return decode_audio_bytes(cached)
+    samples, rate = decode_audio(input_file)
+    stage_cache.put_bytes("audio", key, "flac", encode_audio(samples, rate, "flac")[0])
+    return samples, rate
+
+
+def transcribe_extracted(input_file, samples, rate):
+    """STEP 2 for samples from extract_samples()"""
+    transcript = transcribe_samples(samples, rate, backend=transcription_backend())
+    if stage_cache is not None:
+        stage_cache.put_json("transcript", _transcript_key(file_digest(input_file)), transcript)
+    return transcript
 
-    return response.choices[0].message.content
+
+def summarize_recording(input_file, transcript):
+    """STEP 3 for a transcript dict; returns the minutes JSON string (or the raw reply if it wasn't valid minutes)"""
+    minutes_key, minutes = None, None
+    if stage_cache is not None:
+        minutes_key = StageCache.key("minutes", _transcript_key(file_digest(input_file)), model=SUMMARIZER_MODEL,
+                                     base_url=client_openrouter.base_url, prompt=PROMPT_VERSION,
+                                     single_pass_tokens=SINGLE_PASS_TOKENS, chunk_tokens=CHUNK_TOKENS)
+        cached = stage_cache.get_json("minutes", minutes_key)
+        # Entries that aren't valid minutes are ignored and replaced
+        minutes = validate_minutes(cached, filename=input_file)[0] if cached is not None else None
+    if minutes is None:
+        minutes, reply = summarize_transcript(transcript["text"], filename=input_file)
+        if minutes is None:
+            # Not cached, so the next run asks the model again
+            return reply
+        if stage_cache is not None:
+            stage_cache.put_json("minutes", minutes_key, minutes)
+    # The same recording may come back under another name
+    minutes["metadata"]["filename"] = input_file
+    return json.dumps(minutes, indent=2)
+
+
+def meeting_store():
+    """Searchable store of every summarized meeting (see meeting_store.py)"""
+    global _meeting_store
+    if _meeting_store is None:
+        _meeting_store = MeetingStore()
+    return _meeting_store
+
+
+def save_meeting(input_file, transcript, minutes_json):
+    """Keep the timestamped transcript and minutes for search_meetings; never fails the run"""
+    try:
+        return meeting_store().add_meeting(os.path.abspath(input_file), transcript, minutes_json,
+                                           digest=file_digest(input_file))
+    except Exception as e:
+        logging.getLogger(__name__).warning("Could not store %s in the meeting store: %s", input_file, e)
+        return None
+
+
+def process_recording(input_file):
+    """
+    STEPS 1-3 with every stage cached by the recording's content hash: a
+    rerun returns the stored minutes, and a run that failed during
+    summarization resumes from the stored transcript.
+    """
+    transcript = cached_transcript(input_file)
+    if transcript is None:
+        transcript = transcribe_extracted(input_file, *extract_samples(input_file))
+    minutes_json = summarize_recording(input_file, transcript)
+    save_meeting(input_file, transcript, minutes_json)
+    return minutes_json
 
 # ---------- STEP 4: Main ----------
 if __name__ == "__main__":
@@ -101,16 +230,15 @@ if __name__ == "__main__":
     else:
         input_file = "meeting.mp4"   # Default fallback
     
+    # Several files or a folder: summarize them concurrently through the job queue
+    if len(sys.argv) > 2 or os.path.isdir(input_file):
+        from job_queue import run_batch
+        sys.exit(run_batch(sys.argv[1:]))
+
     print(f"[INFO] Processing video file: {input_file}")
     
     try:
-        audio_file = extract_audio(input_file)
-        print("[INFO] Audio extracted.")
-
-        transcript = transcribe_audio(audio_file)
-        print("[INFO] Transcription completed.")
-
-        minutes_json = summarize_transcript(transcript, filename=input_file)
+        minutes_json = process_recording(input_file)
         print("[INFO] Meeting Minutes Generated:\n")
         
         # Try to parse and pretty-print the JSON
@@ -0,0 +1,158 @@
+"""
+Content-hash cache for the summarizer's stages (audio, transcript, minutes).
+
+An entry's key is the SHA-256 of the input file's content plus the stage's
+parameters (model, prompt version, codec, ...), so a renamed or copied
+recording still hits and a changed model or prompt misses. Each stage is
+stored as soon as it completes: a rerun after a failed summarization starts
+from the cached transcript instead of paying for Whisper again.
+
+Entries live under SUMMARIZER_CACHE_DIR/<stage>/ and the least recently used
+ones are deleted once the cache exceeds SUMMARIZER_CACHE_QUOTA_MB.
+"""
+
+import os
+import json
+import time
+import hashlib
+import tempfile
+import threading
+from typing import Dict, Optional
+
+CACHE_DIR = os.getenv("SUMMARIZER_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache"))
+CACHE_QUOTA_BYTES = int(float(os.getenv("SUMMARIZER_CACHE_QUOTA_MB", "2048")) * 1024 * 1024)
+CACHE_ENABLED = os.getenv("SUMMARIZER_CACHE", "1") == "1"
+
+HASH_CHUNK_BYTES = 1 << 20
+
+_digests: Dict = {}
+_digests_lock = threading.Lock()
+
+
+def file_digest(path: str) -> str:
+    """SHA-256 of a file's content, remembered per (path, size, mtime) for this process"""
+    stat = os.stat(path)
+    memo = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    with _digests_lock:
+        if memo in _digests:
+            return _digests[memo]
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_CHUNK_BYTES), b""):
+            digest.update(block)
+    with _digests_lock:
+        _digests[memo] = digest.hexdigest()
+    return digest.hexdigest()
+
+
+class StageCache:
+    def __init__(self, root=CACHE_DIR, quota_bytes=CACHE_QUOTA_BYTES):
+        self.root = root
+        self.quota_bytes = quota_bytes
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(stage: str, digest: str, **params) -> str:
+        payload = json.dumps({"stage": stage, "input": digest, "params": params}, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def _path(self, stage: str, key: str, extension: str) -> str:
+        return os.path.join(self.root, stage, f"{key}.{extension}")
+
+    # -----------------------------
+    # Lookup
+    # -----------------------------
+    def get_path(self, stage: str, key: str, extension: str) -> Optional[str]:
+        path = self._path(stage, key, extension)
+        try:
+            # mtime doubles as the last-used time for eviction
+            os.utime(path)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return path
+
+    def get_bytes(self, stage: str, key: str, extension: str) -> Optional[bytes]:
+        path = self.get_path(stage, key, extension)
+        if path is None:
+            return None
+        try:
+            with open(path, "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None  # evicted by another process in between
+
+    def get_json(self, stage: str, key: str):
+        data = self.get_bytes(stage, key, "json")
+        return json.loads(data) if data is not None else None
+
+    # -----------------------------
+    # Storage
+    # -----------------------------
+    def put_bytes(self, stage: str, key: str, extension: str, data: bytes) -> str:
+        path = self._path(stage, key, extension)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Readers (including other processes) never see a partial entry
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        self.enforce_quota()
+        return path
+
+    def put_json(self, stage: str, key: str, value) -> str:
+        return self.put_bytes(stage, key, "json", json.dumps(value, ensure_ascii=False, indent=2).encode())
+
+    # -----------------------------
+    # Eviction
+    # -----------------------------
+    def _entries(self):
+        entries = []
+        for directory, _, files in os.walk(self.root):
+            for name in files:
+                path = os.path.join(directory, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                # Leftovers of writes that died more than an hour ago
+                if name.endswith(".tmp") and time.time() - stat.st_mtime < 3600:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def size(self) -> int:
+        return sum(size for _, size, _ in self._entries())
+
+    def enforce_quota(self) -> int:
+        """Delete least recently used entries until under quota; returns bytes freed"""
+        with self._lock:
+            entries = sorted(self._entries())
+            total = sum(size for _, size, _ in entries)
+            freed = 0
+            for _, size, path in entries:
+                if total - freed <= self.quota_bytes:
+                    break
+                try:
+                    os.remove(path)
+                    freed += size
+                except FileNotFoundError:
+                    continue
+            return freed
+
+    def stats(self) -> Dict:
+        return {
+            "root": self.root,
+            "size_bytes": self.size(),
+            "quota_bytes": self.quota_bytes,
+            "hits": self.hits,
+            "misses": self.misses
+        }
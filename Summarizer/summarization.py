@@ -0,0 +1,228 @@
+"""
+Map-reduce summarization for transcripts longer than one prompt.
+
+    map      the transcript is cut into chunks of about CHUNK_TOKENS and each
+             chunk is summarized in parallel into partial minutes JSON
+    reduce   list fields (topics, decisions, action items, participants, ...)
+             are merged deterministically; only the summaries need the LLM,
+             merged in groups that fit the context if there are many
+
+Works with any OpenAI-compatible client (fake_openai_server.py offline).
+"""
+
+import os
+import re
+import logging
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+from minutes_schema import ACTION_ITEM_DEFAULTS, LIST_FIELDS, NOT_SPECIFIED, THINK_BLOCK, complete, request_minutes
+
+logger = logging.getLogger(__name__)
+
+SUMMARIZER_MODEL = os.getenv("SUMMARIZER_LLM_MODEL", "deepseek/deepseek-r1-0528-qwen3-8b:free")
+SUMMARIZE_WORKERS = int(os.getenv("SUMMARIZER_LLM_WORKERS", "4"))
+
+# Transcripts up to SINGLE_PASS_TOKENS go in one prompt; longer ones are
+# split into chunks of about CHUNK_TOKENS
+SINGLE_PASS_TOKENS = int(os.getenv("SUMMARIZER_SINGLE_PASS_TOKENS", "6000"))
+CHUNK_TOKENS = int(os.getenv("SUMMARIZER_CHUNK_TOKENS", "3000"))
+# Partial summaries merged per LLM call in the reduce step
+MERGE_TOKENS = 3000
+
+# Rough chars-per-token ratio for English; the model's tokenizer isn't
+# available locally and only the order of magnitude matters
+CHARS_PER_TOKEN = 4
+
+MAX_TOPICS = 12
+
+# Bump when MAP_PROMPT, MERGE_PROMPT or the single-pass prompt in script.py
+# changes, so cached minutes made with the old prompts are not reused
+PROMPT_VERSION = "minutes-v1"
+
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+|\n+")
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+# ---------- Chunking ----------
+def chunk_transcript(transcript: str, chunk_tokens=CHUNK_TOKENS) -> List[str]:
+    """Consecutive runs of whole sentences (or timestamped lines) of about chunk_tokens"""
+    chunks, current, used = [], [], 0
+    for sentence in SENTENCE_BOUNDARY.split(transcript):
+        sentence = sentence.strip()
+        if not sentence:
+            continue
+        # An overlong sentence (no punctuation) is cut on whitespace
+        while estimate_tokens(sentence) > chunk_tokens:
+            cut = sentence.rfind(" ", 0, chunk_tokens * CHARS_PER_TOKEN)
+            cut = cut if cut > 0 else chunk_tokens * CHARS_PER_TOKEN
+            if current:
+                chunks.append(" ".join(current))
+                current, used = [], 0
+            chunks.append(sentence[:cut])
+            sentence = sentence[cut:].strip()
+        cost = estimate_tokens(sentence) + 1
+        if current and used + cost > chunk_tokens:
+            chunks.append(" ".join(current))
+            current, used = [], 0
+        current.append(sentence)
+        used += cost
+    if current:
+        chunks.append(" ".join(current))
+    return chunks
+
+
+# ---------- Prompts ----------
+MAP_PROMPT = """You are an assistant that extracts meeting minutes from part {part} of {parts} of a transcript.
+
+IMPORTANT: Return ONLY valid JSON without any markdown formatting, code blocks, or additional text.
+
+{{
+    "content_type": "meeting|presentation|discussion",
+    "summary": "2-3 sentences on what this part covers",
+    "key_topics": ["main topics discussed in this part"],
+    "decisions": ["decisions made in this part"],
+    "action_items": [
+        {{
+            "task": "description of the action item",
+            "owner": "person responsible (if mentioned)",
+            "deadline": "deadline if mentioned",
+            "priority": "high|medium|low"
+        }}
+    ],
+    "participants": ["people speaking or mentioned"],
+    "important_quotes": ["notable quotes or statements"],
+    "follow_up_questions": ["questions that need answers"]
+}}
+
+Rules:
+- Use only this part of the transcript; use [] for fields with no data
+- Use "Not specified" for missing owner or deadline
+
+Transcript part:
+{text}
+"""
+
+MERGE_PROMPT = """The following are summaries of consecutive parts of one {content_type}, in order.
+Write a concise 2-3 sentence summary of the whole {content_type}.
+Return ONLY the summary text.
+
+{summaries}
+"""
+
+
+# ---------- Map ----------
+def summarize_chunk(client, text: str, part: int, parts: int, model=SUMMARIZER_MODEL) -> Dict:
+    minutes, reply = request_minutes(client, MAP_PROMPT.format(part=part, parts=parts, text=text), model,
+                                     partial=True)
+    if minutes is None:
+        logger.warning("Part %d/%d: unusable minutes, keeping the raw reply as its summary", part, parts)
+        return {"summary": THINK_BLOCK.sub("", reply).strip()}
+    return minutes
+
+
+# ---------- Reduce ----------
+def _key(value) -> str:
+    return re.sub(r"[^a-z0-9]+", " ", str(value).lower()).strip()
+
+
+def _merge_list(partials: List[Dict], field: str) -> List:
+    merged, seen = [], set()
+    for partial in partials:
+        for value in partial.get(field) or []:
+            key = _key(value)
+            if key and key not in seen:
+                seen.add(key)
+                merged.append(value)
+    return merged
+
+
+def _merge_action_items(partials: List[Dict]) -> List[Dict]:
+    """Same task mentioned in several parts: one item, keeping any owner/deadline found"""
+    merged: Dict[str, Dict] = {}
+    for partial in partials:
+        for item in partial.get("action_items") or []:
+            if isinstance(item, str):
+                item = {"task": item}
+            key = _key(item.get("task", ""))
+            if not key:
+                continue
+            current = merged.setdefault(key, {"task": item["task"], **ACTION_ITEM_DEFAULTS})
+            for field, default in ACTION_ITEM_DEFAULTS.items():
+                value = item.get(field)
+                if value and value != NOT_SPECIFIED and current[field] == default:
+                    current[field] = value
+    return list(merged.values())
+
+
+def merge_summaries(client, summaries: List[str], content_type="meeting", model=SUMMARIZER_MODEL,
+                    merge_tokens=MERGE_TOKENS) -> str:
+    """One summary from per-part summaries; large sets are merged in groups, then merged again"""
+    summaries = [s.strip() for s in summaries if s and s.strip()]
+    if len(summaries) <= 1:
+        return summaries[0] if summaries else ""
+
+    groups, current, used = [], [], 0
+    for summary in summaries:
+        cost = estimate_tokens(summary)
+        if current and used + cost > merge_tokens:
+            groups.append(current)
+            current, used = [], 0
+        current.append(summary)
+        used += cost
+    groups.append(current)
+
+    def merge(group: List[str]) -> str:
+        if len(group) == 1:
+            return group[0]
+        numbered = "\n\n".join(f"Part {i}: {s}" for i, s in enumerate(group, 1))
+        reply = complete(client, MERGE_PROMPT.format(content_type=content_type, summaries=numbered), model)
+        reply = THINK_BLOCK.sub("", reply).strip()
+        return reply or " ".join(group)
+
+    with ThreadPoolExecutor(max_workers=max(1, min(SUMMARIZE_WORKERS, len(groups)))) as pool:
+        merged = list(pool.map(merge, groups))
+    if len(merged) == len(summaries):
+        # Every summary alone exceeds merge_tokens; merging can't shrink them further
+        return " ".join(merged)
+    return merge_summaries(client, merged, content_type, model, merge_tokens)
+
+
+def reduce_minutes(client, partials: List[Dict], filename=None, model=SUMMARIZER_MODEL) -> Dict:
+    types = Counter(p.get("content_type") for p in partials if p.get("content_type") in
+                    ("meeting", "presentation", "discussion"))
+    content_type = types.most_common(1)[0][0] if types else "meeting"
+
+    minutes = {
+        "metadata": {
+            "filename": filename or "unknown",
+            "processing_timestamp": "auto-generated",
+            "content_type": content_type,
+            "parts": len(partials)
+        },
+        "summary": merge_summaries(client, [p.get("summary", "") for p in partials], content_type, model)
+    }
+    for field in LIST_FIELDS:
+        minutes[field] = _merge_list(partials, field)
+    minutes["key_topics"] = minutes["key_topics"][:MAX_TOPICS]
+    minutes["action_items"] = _merge_action_items(partials)
+    # Same key order as the single-pass prompt's output
+    order = ["metadata", "summary", "key_topics", "decisions", "action_items", "participants",
+             "important_quotes", "follow_up_questions"]
+    return {field: minutes[field] for field in order}
+
+
+def summarize_map_reduce(client, transcript: str, filename=None, model=SUMMARIZER_MODEL,
+                         chunk_tokens=CHUNK_TOKENS, max_workers=SUMMARIZE_WORKERS) -> Dict:
+    chunks = chunk_transcript(transcript, chunk_tokens)
+    logger.info("Summarizing %d transcript chunks", len(chunks))
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(chunks))), thread_name_prefix="summarize") as pool:
+        partials = list(pool.map(
+            lambda numbered: summarize_chunk(client, numbered[1], numbered[0], len(chunks), model),
+            enumerate(chunks, 1)
+        ))
+    return reduce_minutes(client, partials, filename, model)
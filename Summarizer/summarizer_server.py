@@ -0,0 +1,108 @@
+# summarizer_server.py
+import sys
+import logging
+from typing import List
+import anyio
+from mcp.server.fastmcp import FastMCP
+import script
+from job_queue import JobQueue
+
+# IMPORTANT: MCP servers must not print to STDOUT.
+logging.basicConfig(stream=sys.stderr, level=logging.INFO)
+logging.info("Summarizer MCP server started")
+
+mcp = FastMCP("summarizer-mcp")
+
+# One long-lived worker process: clients, thread pools and the stage cache
+# are shared by every call, and unfinished jobs resume on restart (only
+# here: command-line batches leave the server's jobs alone)
+queue = JobQueue(resume=True)
+
+
+@mcp.tool()
+def submit(paths: List[str]) -> dict:
+    """
+    Queue video/audio files, or folders of them, for summarization.
+    Returns a batch_id and one job_id per file; poll status() for progress.
+    """
+    logging.info(f"submit called with paths={paths}")
+    try:
+        return {"ok": True, **queue.submit(paths)}
+    except (FileNotFoundError, ValueError) as e:
+        return {"ok": False, "error": f"❌ {e}"}
+
+
+@mcp.tool()
+def status(job_id: str = "") -> dict:
+    """
+    Progress of a job or a batch (by id), or of every job when empty.
+    """
+    try:
+        return {"ok": True, **queue.status(job_id or None)}
+    except KeyError as e:
+        return {"ok": False, "error": f"❌ {e.args[0]}"}
+
+
+@mcp.tool()
+def result(job_id: str) -> dict:
+    """
+    Meeting minutes of a finished job (minutes is null while it is still running).
+    """
+    try:
+        return {"ok": True, **queue.result(job_id)}
+    except KeyError as e:
+        return {"ok": False, "error": f"❌ {e.args[0]}"}
+
+
+@mcp.tool()
+async def summarize_video(input_file: str, timeout_seconds: float = 1800) -> dict:
+    """
+    Summarize one video and wait for its minutes.
+    """
+    try:
+        job_id = queue.submit([input_file])["job_ids"][0]
+    except (FileNotFoundError, ValueError) as e:
+        return {"ok": False, "error": f"❌ {e}"}
+    # Waited for on a worker thread so status() and result() keep being served
+    finished = await anyio.to_thread.run_sync(queue.wait, job_id, timeout_seconds)
+    if not finished:
+        return {"ok": False, "job_id": job_id, "error": "⏳ Still running; check status() and result() later"}
+    outcome = queue.result(job_id)
+    if outcome["job"]["status"] != "done":
+        return {"ok": False, "job_id": job_id, "error": f"❌ {outcome['job']['error']}"}
+    return {"ok": True, "job_id": job_id, "minutes": outcome["minutes"]}
+
+
+@mcp.tool()
+def search_meetings(query: str, limit: int = 10, meeting_id: int = 0) -> dict:
+    """
+    Search the transcripts of every summarized meeting (or one, by meeting_id).
+    Returns matching segments with start_ms/end_ms timestamps.
+    """
+    logging.info(f"search_meetings called with query={query!r}, meeting_id={meeting_id}")
+    hits = script.meeting_store().search(query, limit=max(1, min(limit, 50)), meeting_id=meeting_id or None)
+    return {"ok": True, "query": query, "results": hits}
+
+
+@mcp.tool()
+def list_meetings() -> dict:
+    """
+    Meetings in the store with their ids, durations and segment counts.
+    """
+    return {"ok": True, "meetings": script.meeting_store().meetings()}
+
+
+@mcp.tool()
+def meeting_minutes(meeting_id: int) -> dict:
+    """
+    Stored minutes of a meeting, without re-running anything.
+    """
+    try:
+        return {"ok": True, "meeting_id": meeting_id, "minutes": script.meeting_store().minutes(meeting_id)}
+    except KeyError as e:
+        return {"ok": False, "error": f"❌ {e.args[0]}"}
+
+
+if __name__ == "__main__":
+    # Run over stdio so Claude Desktop can talk to it
+    mcp.run(transport="stdio")
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Offline tests for meeting_store.py (a word-hashing embedder, no model):
+    python -m pytest Summarizer/test_meeting_store.py
+"""
+import zlib
+
+import numpy as np
+import pytest
+
+from meeting_store import MeetingStore, fts_query
+
+# Paraphrases map to the same concept, so only the vector ranking finds them
+SYNONYMS = {"money": "budget", "funds": "budget", "coach": "bus", "buses": "bus"}
+
+
+class ConceptEmbedder:
+    model = "concepts-test"
+
+    def __init__(self):
+        self.calls = 0
+
+    def embed(self, texts):
+        self.calls += 1
+        vectors = np.zeros((len(texts), 64), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in text.lower().replace(".", "").split():
+                vectors[row, zlib.crc32(SYNONYMS.get(word, word).encode()) % 64] += 1
+        return vectors
+
+
+TRANSCRIPT = {"segments": [
+    {"start": 0.0, "end": 4.2, "text": "Welcome everyone to the society meeting."},
+    {"start": 4.2, "end": 9.8, "text": "The budget for the field trip is five thousand."},
+    {"start": 9.8, "end": 15.0, "text": "Sara will book the buses."},
+]}
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = MeetingStore(str(tmp_path / "meetings.db"), embedder=ConceptEmbedder())
+    store.add_meeting("society.mp4", TRANSCRIPT, minutes={"summary": "Trip planned."}, digest="d1")
+    return store
+
+
+def test_fts_query_quotes_operators():
+    assert fts_query('budget NEAR("trip") OR -x') == '"budget" OR "near" OR "trip" OR "or" OR "x"'
+
+
+def test_search_returns_timestamps_in_ms(store):
+    hit = store.search("field trip budget", limit=1)[0]
+    assert (hit["start_ms"], hit["end_ms"]) == (4200, 9800)
+    assert hit["filename"] == "society.mp4" and set(hit["matched_by"]) == {"text", "vector"}
+
+
+def test_paraphrase_found_by_embeddings_only(store):
+    hits = store.search("money", limit=3)
+    assert hits and hits[0]["start_ms"] == 4200 and hits[0]["matched_by"] == ["vector"]
+
+
+def test_full_text_only_without_embedder(tmp_path):
+    store = MeetingStore(str(tmp_path / "meetings.db"), embedder=None)
+    store.add_meeting("society.mp4", TRANSCRIPT)
+    assert store.search("book buses")[0]["matched_by"] == ["text"]
+    assert store.search("money") == []
+
+
+def test_search_within_one_meeting(store):
+    other = store.add_meeting("other.mp4", {"segments": [{"start": 0, "end": 2, "text": "Budget review."}]})
+    assert {h["meeting_id"] for h in store.search("budget")} == {1, other}
+    assert {h["meeting_id"] for h in store.search("budget", meeting_id=other)} == {other}
+
+
+def test_same_transcript_keeps_vectors(store):
+    calls = store.embedder.calls
+    again = store.add_meeting("renamed.mp4", TRANSCRIPT, minutes={"summary": "Updated."}, digest="d1")
+    assert again == 1 and store.embedder.calls == calls
+    assert store.minutes(1) == {"summary": "Updated."}
+    assert [m["filename"] for m in store.meetings()] == ["renamed.mp4"]
+
+
+def test_replaced_meeting_is_not_found_by_old_vectors(tmp_path):
+    store = MeetingStore(str(tmp_path / "meetings.db"), embedder=ConceptEmbedder())
+    store.add_meeting("dessert.mp4", {"segments": [{"start": 0, "end": 2, "text": "apple pie"}]}, digest="x")
+    assert store.search("apple")[0]["text"] == "apple pie"
+    # Same digest and segment count: the new rows reuse the old ids
+    store.add_meeting("dessert.mp4", {"segments": [{"start": 0, "end": 2, "text": "banana split"}]}, digest="x")
+    assert store.search("apple") == []
+    assert store.search("banana")[0]["matched_by"] == ["text", "vector"]
+
+
+def test_reindex_embeds_segments_stored_without_a_model(tmp_path):
+    path = str(tmp_path / "meetings.db")
+    MeetingStore(path, embedder=None).add_meeting("society.mp4", TRANSCRIPT)
+    store = MeetingStore(path, embedder=ConceptEmbedder())
+    assert store.search("money") == []
+    assert store.reindex() == 3
+    assert store.search("money")[0]["start_ms"] == 4200
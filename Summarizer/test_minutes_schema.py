@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Offline tests for minutes_schema.py (a scripted client, no LLM):
+    python -m pytest Summarizer/test_minutes_schema.py
+"""
+import json
+from types import SimpleNamespace
+
+import pytest
+
+import minutes_schema
+from minutes_schema import parse_minutes, repair_json, request_minutes, validate_minutes
+
+MINUTES = {"summary": "Budget agreed.", "key_topics": ["Budget"], "decisions": [], "action_items": [],
+           "participants": ["Ali"], "important_quotes": [], "follow_up_questions": []}
+
+
+class ScriptedClient:
+    """OpenAI-style client answering with the given replies in turn"""
+
+    def __init__(self, *replies, reject_response_format=False):
+        self.replies = list(replies)
+        self.calls = []
+        self.reject_response_format = reject_response_format
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, model, messages, **kwargs):
+        self.calls.append({"prompt": messages[-1]["content"], **kwargs})
+        if self.reject_response_format and "response_format" in kwargs:
+            raise type("BadRequestError", (Exception,), {"status_code": 400})("response_format not supported")
+        message = SimpleNamespace(content=self.replies.pop(0))
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+@pytest.mark.parametrize("reply, expected", [
+    ('{"a": 1}', {"a": 1}),
+    ('<think>plan {"x": 1}</think>\n```json\n{"a": [1, 2,],}\n```', {"a": [1, 2]}),
+    ('Here are the minutes: {"a": "b"} Hope this helps!', {"a": "b"}),
+    ('{"a": "brace } and \\" quote", "b": 2}', {"a": 'brace } and " quote', "b": 2}),
+    ('{"a": [1, 2], "b": "cut off mid', {"a": [1, 2]}),
+    ('{"a": {"b": [1, {"c": 2}, ', {"a": {"b": [1, {"c": 2}]}}),
+])
+def test_repair_json(reply, expected):
+    assert json.loads(repair_json(reply)) == expected
+
+
+def test_repair_json_needs_an_object():
+    with pytest.raises(ValueError):
+        repair_json("I could not summarize this recording.")
+
+
+def test_validate_coerces_clear_intent():
+    minutes, problems = validate_minutes({
+        **MINUTES,
+        "key_topics": "Budget",
+        "action_items": ["Book buses", {"task": "Send forms", "owner": "Sara", "priority": "URGENT"}],
+        "metadata": {"content_type": "Lecture"},
+    }, filename="m.mp4")
+    assert problems == []
+    assert minutes["key_topics"] == ["Budget"]
+    assert minutes["action_items"] == [
+        {"task": "Book buses", "owner": "Not specified", "deadline": "Not specified", "priority": "medium"},
+        {"task": "Send forms", "owner": "Sara", "deadline": "Not specified", "priority": "medium"},
+    ]
+    assert minutes["metadata"] == {"content_type": "meeting", "filename": "m.mp4",
+                                   "processing_timestamp": "auto-generated"}
+    assert list(minutes)[:2] == ["metadata", "summary"]
+
+
+def test_validate_reports_what_it_cannot_fix():
+    minutes, problems = validate_minutes({**MINUTES, "summary": "", "decisions": [["nested"]],
+                                          "action_items": [{"owner": "Ali"}]})
+    assert minutes is None
+    assert problems == ['"summary" must be a non-empty string', '"decisions" must contain only strings',
+                        'every "action_items" entry needs a "task"']
+    assert validate_minutes(["not", "an", "object"]) == (None, ["the reply must be a JSON object"])
+
+
+def test_partial_minutes_carry_content_type():
+    minutes, _ = parse_minutes(json.dumps({**MINUTES, "content_type": "presentation"}), partial=True)
+    assert minutes["content_type"] == "presentation" and "metadata" not in minutes
+
+
+def test_reask_sends_only_the_broken_reply():
+    client = ScriptedClient('{"summary": ""}', json.dumps(MINUTES))
+    minutes, _ = request_minutes(client, "TRANSCRIPT: long recording text", "model-a")
+    assert minutes["summary"] == "Budget agreed."
+    assert len(client.calls) == 2
+    assert "TRANSCRIPT" not in client.calls[1]["prompt"] and '{"summary": ""}' in client.calls[1]["prompt"]
+
+
+def test_models_rejecting_json_mode_are_asked_without_it(monkeypatch):
+    monkeypatch.setattr(minutes_schema, "JSON_MODE", "json_object")
+    monkeypatch.setattr(minutes_schema, "_no_response_format", set())
+    client = ScriptedClient(json.dumps(MINUTES), json.dumps(MINUTES), reject_response_format=True)
+    request_minutes(client, "prompt", "model-b")
+    request_minutes(client, "prompt", "model-b")
+    assert ["response_format" in call for call in client.calls] == [True, False, False]
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Offline tests for map-reduce summarization (a scripted client, no LLM):
+    python -m pytest Summarizer/test_summarization.py
+"""
+import json
+import threading
+from types import SimpleNamespace
+
+from summarization import CHARS_PER_TOKEN, chunk_transcript, estimate_tokens, reduce_minutes, summarize_map_reduce
+
+
+class ScriptedClient:
+    """OpenAI-style client; reply(prompt) gives each completion's text"""
+
+    def __init__(self, reply):
+        self.reply = reply
+        self.prompts = []
+        self.lock = threading.Lock()
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, model, messages, **kwargs):
+        prompt = messages[-1]["content"]
+        with self.lock:
+            self.prompts.append(prompt)
+        message = SimpleNamespace(content=self.reply(prompt))
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+def test_chunks_keep_sentences_whole():
+    sentences = [f"Sentence number {i} is about the budget." for i in range(200)]
+    chunks = chunk_transcript(" ".join(sentences), chunk_tokens=100)
+    assert len(chunks) > 1
+    assert " ".join(chunks).split(". ") == " ".join(sentences).split(". ")
+    for chunk in chunks:
+        assert estimate_tokens(chunk) <= 100 + 12
+        assert chunk.endswith("budget.")
+
+
+def test_overlong_sentence_is_cut_on_whitespace():
+    words = ["word"] * 500
+    chunks = chunk_transcript(" ".join(words), chunk_tokens=50)
+    assert all(len(c) <= 50 * CHARS_PER_TOKEN for c in chunks)
+    assert " ".join(chunks).split() == words
+
+
+def test_timestamped_lines_are_units():
+    transcript = "\n".join(f"[00:00:{i:02d}] line {i}" for i in range(40))
+    chunks = chunk_transcript(transcript, chunk_tokens=30)
+    assert all(c.startswith("[00:00:") for c in chunks)
+    assert sum(c.count("[00:00:") for c in chunks) == 40
+
+
+def test_reduce_merges_lists_without_the_llm():
+    partials = [
+        {"content_type": "meeting", "summary": "Budget agreed.", "key_topics": ["Budget", "Field trip"],
+         "decisions": ["Trip in May"], "participants": ["Ali"],
+         "action_items": [{"task": "Book buses", "owner": "Not specified", "deadline": "Friday"}]},
+        {"content_type": "meeting", "summary": "Buses discussed.", "key_topics": ["budget", "Transport"],
+         "participants": ["Ali", "Sara"],
+         "action_items": [{"task": "book buses.", "owner": "Sara", "priority": "high"}]},
+    ]
+    client = ScriptedClient(lambda prompt: "The budget and buses were settled.")
+    minutes = reduce_minutes(client, partials, filename="m.mp4")
+
+    assert minutes["metadata"] == {"filename": "m.mp4", "processing_timestamp": "auto-generated",
+                                   "content_type": "meeting", "parts": 2}
+    assert minutes["key_topics"] == ["Budget", "Field trip", "Transport"]
+    assert minutes["participants"] == ["Ali", "Sara"]
+    assert minutes["action_items"] == [{"task": "Book buses", "owner": "Sara", "deadline": "Friday",
+                                        "priority": "high"}]
+    assert minutes["summary"] == "The budget and buses were settled."
+    assert len(client.prompts) == 1 and "Part 2: Buses discussed." in client.prompts[0]
+
+
+def test_map_reduce_sends_each_chunk_once():
+    def reply(prompt):
+        if "transcript" not in prompt.lower():
+            return "Whole meeting summary."
+        part = prompt.split("part ", 1)[1].split(" ", 1)[0]
+        return json.dumps({"content_type": "meeting", "summary": f"Part {part}.", "key_topics": [f"Topic {part}"],
+                           "decisions": [], "action_items": [], "participants": [], "important_quotes": [],
+                           "follow_up_questions": []})
+
+    transcript = " ".join(f"Point {i} was raised by the chair." for i in range(300))
+    client = ScriptedClient(reply)
+    minutes = summarize_map_reduce(client, transcript, chunk_tokens=400, max_workers=3)
+    parts = minutes["metadata"]["parts"]
+    assert parts == len(chunk_transcript(transcript, 400)) > 1
+    assert minutes["key_topics"] == [f"Topic {i}" for i in range(1, parts + 1)]
+    assert minutes["summary"] == "Whole meeting summary."
+    assert len(client.prompts) == parts + 1
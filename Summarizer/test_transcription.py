@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Offline tests for the chunking and stitching in transcription.py (no API calls):
+    python -m pytest Summarizer/test_transcription.py
+"""
+import threading
+
+import numpy as np
+
+from transcription import AudioSegment, _drop_repeated_words, find_cut_points, plan_segments, stitch, transcribe_samples
+
+RATE = 16000
+
+
+def speech_with_pauses(seconds, pause_every, pause_seconds=0.6):
+    """A loud tone with a silent gap starting every pause_every seconds"""
+    t = np.arange(int(seconds * RATE)) / RATE
+    samples = (8000 * np.sin(2 * np.pi * 220 * t)).astype(np.int16)
+    for start in np.arange(pause_every, seconds, pause_every):
+        samples[int(start * RATE):int((start + pause_seconds) * RATE)] = 0
+    return samples
+
+
+def test_repeated_words_are_dropped():
+    previous = "so the budget for the field trip is five thousand rupees"
+    assert _drop_repeated_words(previous, "field trip is five thousand rupees per student") == "per student"
+
+
+def test_repeat_survives_small_disagreements():
+    previous = "we will meet again on Monday at ten"
+    assert _drop_repeated_words(previous, "meet again on monday at 10, bring the forms") == "bring the forms"
+
+
+def test_unrelated_text_is_kept():
+    previous = "the lab reports are due on Friday"
+    text = "next item is the sports week schedule"
+    assert _drop_repeated_words(previous, text) == text
+    # A match in the middle of previous is not an overlap
+    assert _drop_repeated_words("due on Friday and then the exams start next month", "due on Friday") == "due on Friday"
+
+
+def test_stitch_keeps_each_overlap_piece_once():
+    segments = plan_segments(20.0, [10.0], overlap=2.0)
+    results = [
+        {"text": "", "segments": [{"start": 0.0, "end": 5.0, "text": "first"},
+                                  {"start": 9.0, "end": 11.5, "text": "across the cut"}]},
+        # Second segment starts at 8.0 s: the same words again, then its own
+        {"text": "", "segments": [{"start": 1.0, "end": 3.5, "text": "across the cut"},
+                                  {"start": 4.0, "end": 12.0, "text": "second"}]},
+    ]
+    pieces = stitch(segments, results)
+    assert [p["text"] for p in pieces] == ["first", "across the cut", "second"]
+    assert pieces[-1] == {"start": 12.0, "end": 20.0, "text": "second"}
+
+
+def test_stitch_without_timestamps_dedupes_by_text():
+    segments = [AudioSegment(0, 0.0, 12.0, 0.0, 10.0), AudioSegment(1, 8.0, 20.0, 10.0, 20.0)]
+    results = [{"text": "the meeting starts with the attendance list", "segments": []},
+               {"text": "with the attendance list, then announcements", "segments": []}]
+    pieces = stitch(segments, results)
+    assert [p["text"] for p in pieces] == ["the meeting starts with the attendance list", "then announcements"]
+    assert (pieces[1]["start"], pieces[1]["end"]) == (10.0, 20.0)
+
+
+def test_cuts_land_in_pauses():
+    samples = speech_with_pauses(70, pause_every=9)
+    cuts = find_cut_points(samples, RATE, segment_seconds=20, search_seconds=5)
+    assert len(cuts) == 3  # in the pauses at 18, 36 and 54 s
+    for cut in cuts:
+        assert samples[int(cut * RATE)] == 0
+
+
+class EchoBackend:
+    """One piece per segment, spanning all of it, named after the upload"""
+
+    max_concurrency = 2
+
+    def __init__(self):
+        self.files = []
+        self.lock = threading.Lock()
+
+    def transcribe(self, audio, filename):
+        with self.lock:
+            self.files.append(filename)
+        seconds = (len(audio) - 44) / 2 / RATE
+        return {"text": filename, "segments": [{"start": 0.0, "end": seconds, "text": filename}]}
+
+
+def test_transcribe_samples_in_order():
+    backend = EchoBackend()
+    result = transcribe_samples(speech_with_pauses(70, pause_every=9), RATE, backend,
+                                segment_seconds=20, overlap=2.0, codec="wav")
+    names = [f"segment_{i:03d}.wav" for i in range(4)]
+    assert result["chunks"] == 4 and sorted(backend.files) == names
+    assert [p["text"] for p in result["segments"]] == names
+    assert result["segments"][0]["start"] == 0.0 and result["segments"][-1]["end"] == 70.0
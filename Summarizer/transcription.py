@@ -0,0 +1,283 @@
+"""
+Chunked transcription for long recordings.
+
+The audio is cut at pauses into segments of roughly SEGMENT_SECONDS that
+overlap by OVERLAP_SECONDS, the segments are transcribed concurrently, and
+the pieces are stitched back on one timeline. Each segment only contributes
+the pieces whose midpoint falls between its own cut points, so speech in an
+overlap appears once. Cuts are made in the middle of pauses, so a piece cut
+off at a segment's edge has its midpoint on the neighbour's side.
+
+Segments are encoded in memory (FLAC by default, see audio_stream.py) by
+the worker that uploads them.
+
+The speech-to-text service is a backend object with
+transcribe(audio_bytes, filename) -> {"text": ..., "segments": [{"start", "end", "text"}]}:
+
+    groq     Groq Whisper API (default)
+    openai   any OpenAI-compatible /audio/transcriptions endpoint, e.g.
+             fake_openai_server.py or a self-hosted whisper server
+    local    faster-whisper on this machine
+"""
+
+import io
+import os
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from difflib import SequenceMatcher
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from audio_stream import AUDIO_CODEC, decode_audio, encode_audio, encode_wav, read_wav
+
+logger = logging.getLogger(__name__)
+
+TRANSCRIBE_BACKEND = os.getenv("SUMMARIZER_TRANSCRIBE_BACKEND", "groq")
+TRANSCRIBE_MODEL = os.getenv("SUMMARIZER_TRANSCRIBE_MODEL", "whisper-large-v3-turbo")
+TRANSCRIBE_BASE_URL = os.getenv("SUMMARIZER_TRANSCRIBE_BASE_URL", "")
+TRANSCRIBE_WORKERS = int(os.getenv("SUMMARIZER_TRANSCRIBE_WORKERS", "4"))
+
+# 5 minutes of 16 kHz mono PCM is ~9.6 MB, well under the API upload limit
+SEGMENT_SECONDS = 300.0
+OVERLAP_SECONDS = 2.0
+# How far from the target length a cut may move to land in a pause
+SEARCH_SECONDS = 20.0
+# Energy is measured per frame; a pause must last about MIN_PAUSE_MS
+FRAME_MS = 30
+MIN_PAUSE_MS = 300
+
+
+# ---------- Audio ----------
+def frame_energy(samples: np.ndarray, rate: int, frame_ms=FRAME_MS) -> np.ndarray:
+    size = max(1, int(rate * frame_ms / 1000))
+    frames = len(samples) // size
+    x = samples[:frames * size].astype(np.float32).reshape(frames, size)
+    return np.sqrt((x * x).mean(axis=1))
+
+
+def _quiet_runs(quiet: np.ndarray) -> List[Tuple[int, int]]:
+    """[start, end) index ranges where quiet is True"""
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], quiet.astype(np.int8), [0]))))
+    return list(zip(edges[::2], edges[1::2]))
+
+
+def find_cut_points(samples: np.ndarray, rate: int, segment_seconds=SEGMENT_SECONDS,
+                    search_seconds=SEARCH_SECONDS) -> List[float]:
+    """Times (s) to cut at: the middle of the pause closest to every segment_seconds"""
+    duration = len(samples) / rate
+    energy = frame_energy(samples, rate)
+    min_pause = max(1, MIN_PAUSE_MS // FRAME_MS)
+
+    cuts, last = [], 0.0
+    # The last segment may run up to 25% long rather than leave a short tail
+    while duration - last > segment_seconds * 1.25:
+        target = last + segment_seconds
+        lo = max(last + segment_seconds / 2, target - search_seconds)
+        hi = min(duration, target + search_seconds)
+        a, b = int(lo * 1000 / FRAME_MS), int(hi * 1000 / FRAME_MS)
+        if b <= a:
+            break
+        window = energy[a:b]
+        lowest = window.min()
+        # Frames about as quiet as the quietest one are silence; a run of
+        # them lasting MIN_PAUSE_MS is a pause (else take the longest run)
+        runs = _quiet_runs(window <= lowest + 0.1 * (np.median(window) - lowest))
+        pauses = [r for r in runs if r[1] - r[0] >= min_pause] or [max(runs, key=lambda r: r[1] - r[0])]
+        target_frame = target * 1000 / FRAME_MS - a
+        start, end = min(pauses, key=lambda r: abs((r[0] + r[1]) / 2 - target_frame))
+        last = float((a + (start + end) / 2) * FRAME_MS / 1000)
+        cuts.append(last)
+    return cuts
+
+
+class AudioSegment:
+    """[start, end) is sent for transcription; [keep_start, keep_end) is what it contributes"""
+
+    def __init__(self, index: int, start: float, end: float, keep_start: float, keep_end: float):
+        self.index = index
+        self.start = start
+        self.end = end
+        self.keep_start = keep_start
+        self.keep_end = keep_end
+
+    def __repr__(self):
+        return f"AudioSegment({self.index}, {self.start:.2f}-{self.end:.2f})"
+
+
+def plan_segments(duration: float, cuts: List[float], overlap=OVERLAP_SECONDS) -> List[AudioSegment]:
+    bounds = [0.0] + list(cuts) + [duration]
+    return [
+        AudioSegment(i, max(0.0, bounds[i] - overlap), min(duration, bounds[i + 1] + overlap),
+                     bounds[i], bounds[i + 1])
+        for i in range(len(bounds) - 1)
+    ]
+
+
+# ---------- Backends ----------
+def _field(obj, name, default=None):
+    return obj.get(name, default) if isinstance(obj, dict) else getattr(obj, name, default)
+
+
+class WhisperAPIBackend:
+    """Groq or OpenAI-compatible client with the audio.transcriptions API"""
+
+    def __init__(self, client, model=TRANSCRIBE_MODEL, max_concurrency=TRANSCRIBE_WORKERS):
+        self.client = client
+        self.model = model
+        self.max_concurrency = max_concurrency
+
+    def transcribe(self, audio: bytes, filename: str) -> Dict:
+        result = self.client.audio.transcriptions.create(
+            file=(filename, audio),
+            model=self.model,
+            response_format="verbose_json"
+        )
+        segments = [
+            {"start": float(_field(s, "start", 0.0)), "end": float(_field(s, "end", 0.0)),
+             "text": (_field(s, "text", "") or "").strip()}
+            for s in (_field(result, "segments") or [])
+        ]
+        return {"text": (_field(result, "text", "") or "").strip(), "segments": segments}
+
+
+class LocalWhisperBackend:
+    """faster-whisper on the local CPU/GPU (pip install faster-whisper)"""
+
+    def __init__(self, model_size=None, max_concurrency=1):
+        from faster_whisper import WhisperModel
+        self.model = WhisperModel(model_size or os.getenv("SUMMARIZER_LOCAL_WHISPER", "small"), compute_type="int8")
+        self.max_concurrency = max_concurrency
+
+    def transcribe(self, audio: bytes, filename: str) -> Dict:
+        pieces, _ = self.model.transcribe(io.BytesIO(audio))
+        segments = [{"start": p.start, "end": p.end, "text": p.text.strip()} for p in pieces]
+        return {"text": " ".join(s["text"] for s in segments), "segments": segments}
+
+
+def get_backend(name: Optional[str] = None):
+    name = name or TRANSCRIBE_BACKEND
+    if name == "groq":
+        from groq import Groq
+        return WhisperAPIBackend(Groq(api_key=os.getenv("GROQ_API_KEY")))
+    if name == "openai":
+        from openai import OpenAI
+        client = OpenAI(base_url=TRANSCRIBE_BASE_URL or None,
+                        api_key=os.getenv("SUMMARIZER_TRANSCRIBE_API_KEY") or os.getenv("OPENAI_API_KEY") or "unset")
+        return WhisperAPIBackend(client)
+    if name == "local":
+        return LocalWhisperBackend()
+    raise ValueError(f"Unknown transcription backend: {name}")
+
+
+# ---------- Stitching ----------
+def _drop_repeated_words(previous: str, text: str, max_words=40, min_words=3, slack=3) -> str:
+    """
+    Remove the start of text that repeats the end of previous. The two
+    transcriptions of an overlap rarely agree word for word at its edges,
+    so the words are aligned and a few differing ones are tolerated.
+    """
+    tail, head = previous.split()[-max_words:], text.split()
+    norm = lambda words: [w.strip(".,!?;:\"'").lower() for w in words]
+    tail_n, head_n = norm(tail), norm(head[:max_words])
+    blocks = [b for b in SequenceMatcher(None, tail_n, head_n, autojunk=False).get_matching_blocks() if b.size]
+    if not blocks:
+        return text
+    last = blocks[-1]
+    after = len(tail_n) - (last.a + last.size)  # words of previous after the aligned part
+    if after > slack:
+        return text
+
+    # Walk back over blocks separated by at most `slack` differing words:
+    # the repeat must run from (near) the start of text to the end of previous
+    first, matched = last, last.size
+    for block in reversed(blocks[:-1]):
+        if first.a - (block.a + block.size) > slack or first.b - (block.b + block.size) > slack:
+            break
+        first, matched = block, matched + block.size
+    if matched < min_words or first.b > slack:
+        return text
+    return " ".join(head[last.b + last.size + after:])
+
+
+def stitch(segments: List[AudioSegment], results: List[Dict]) -> List[Dict]:
+    """One timeline of {"start", "end", "text"} pieces, overlaps removed"""
+    pieces = []
+    last = len(segments) - 1
+    for segment, result in zip(segments, results):
+        if not result["segments"]:
+            # No timestamps from the backend: de-duplicate the overlap by text
+            text = result["text"]
+            if pieces:
+                text = _drop_repeated_words(pieces[-1]["text"], text)
+            if text:
+                pieces.append({"start": segment.keep_start, "end": segment.keep_end, "text": text})
+            continue
+
+        first = True
+        for piece in result["segments"]:
+            start, end = segment.start + piece["start"], segment.start + piece["end"]
+            middle = (start + end) / 2
+            inside = segment.keep_start <= middle < segment.keep_end or (
+                segment.index == last and middle >= segment.keep_end)
+            if not inside or not piece["text"]:
+                continue
+            text = piece["text"]
+            if first and pieces and start < segment.keep_start:
+                # A piece that runs across the cut (no clear pause) can repeat
+                # what the previous segment already contributed
+                text = _drop_repeated_words(pieces[-1]["text"], text)
+            first = False
+            if text:
+                pieces.append({"start": round(start, 2), "end": round(end, 2), "text": text})
+    return pieces
+
+
+def format_timestamp(seconds: float) -> str:
+    seconds = int(seconds)
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+def timestamped_text(pieces: List[Dict]) -> str:
+    return "\n".join(f"[{format_timestamp(p['start'])}] {p['text']}" for p in pieces)
+
+
+# ---------- Entry points ----------
+def transcribe_samples(samples: np.ndarray, rate: int, backend=None, max_workers=TRANSCRIBE_WORKERS,
+                       segment_seconds=SEGMENT_SECONDS, overlap=OVERLAP_SECONDS, codec=AUDIO_CODEC) -> Dict:
+    """
+    Transcribe mono 16-bit samples segment by segment; each segment is
+    encoded to codec in memory by the worker that uploads it.
+    Returns {"text", "segments": [{"start", "end", "text"}], "chunks"}.
+    """
+    backend = backend or get_backend()
+    duration = len(samples) / rate
+    segments = plan_segments(duration, find_cut_points(samples, rate, segment_seconds), overlap)
+    logger.info("Transcribing %.0fs of audio in %d segments", duration, len(segments))
+
+    def run(segment: AudioSegment) -> Dict:
+        audio, extension = encode_audio(samples[int(segment.start * rate):int(segment.end * rate)], rate, codec)
+        return backend.transcribe(audio, f"segment_{segment.index:03d}.{extension}")
+
+    workers = max(1, min(max_workers, getattr(backend, "max_concurrency", max_workers), len(segments)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="transcribe") as pool:
+        results = list(pool.map(run, segments))
+
+    pieces = stitch(segments, results)
+    return {
+        "text": " ".join(p["text"] for p in pieces),
+        "segments": pieces,
+        "chunks": len(segments)
+    }
+
+
+def transcribe_chunked(audio_file: str, backend=None, **options) -> Dict:
+    """transcribe_samples() for a 16-bit WAV file"""
+    samples, rate = read_wav(audio_file)
+    return transcribe_samples(samples, rate, backend, **options)
+
+
+def transcribe_media(input_file: str, backend=None, **options) -> Dict:
+    """transcribe_samples() for any video/audio file, decoded through an ffmpeg pipe"""
+    samples, rate = decode_audio(input_file)
+    return transcribe_samples(samples, rate, backend, **options)
@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+Shared Instrumentation
+Stage timings, counters and derived rates for the MCP servers in this repo
+(GIKI, Attendance). Servers add the repository root to sys.path and use the
+process-wide METRICS registry:
+
+    from instrumentation import METRICS
+
+    with METRICS.span("retrieval"):
+        docs = retriever.invoke(question)
+    METRICS.incr("reddit_fallbacks")
+
+METRICS.snapshot() backs each server's `metrics` tool and
+METRICS.prometheus_text() its optional /metrics route in HTTP mode. A server
+running several worker processes has each one write_state() to a shared
+directory and reports METRICS.aggregate(directory), so every worker gives
+the same totals.
+"""
+
+import os
+import re
+import json
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Dict
+
+# Upper bounds (seconds) of the Prometheus duration histogram buckets
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Recent samples kept per stage for percentiles
+RESERVOIR_SIZE = 1024
+
+
+class StageStats:
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.total_s = 0.0
+        self.max_s = 0.0
+        self.buckets = [0] * len(BUCKETS)
+        self.recent = deque(maxlen=RESERVOIR_SIZE)
+
+    def observe(self, seconds: float, error: bool = False):
+        self.count += 1
+        self.errors += error
+        self.total_s += seconds
+        self.max_s = max(self.max_s, seconds)
+        self.recent.append(seconds)
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                self.buckets[i] += 1
+                break
+
+    def state(self) -> Dict:
+        return {"count": self.count, "errors": self.errors, "total_s": self.total_s, "max_s": self.max_s,
+                "buckets": list(self.buckets), "recent": list(self.recent)}
+
+    def merge(self, state: Dict):
+        self.count += state["count"]
+        self.errors += state["errors"]
+        self.total_s += state["total_s"]
+        self.max_s = max(self.max_s, state["max_s"])
+        self.buckets = [a + b for a, b in zip(self.buckets, state["buckets"])]
+        self.recent.extend(state["recent"])
+
+    def summary(self) -> Dict:
+        ordered = sorted(self.recent)
+        pick = lambda q: round(ordered[min(len(ordered) - 1, int(len(ordered) * q))] * 1000, 2) if ordered else 0.0
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "mean_ms": round(self.total_s / self.count * 1000, 2) if self.count else 0.0,
+            "p50_ms": pick(0.5),
+            "p95_ms": pick(0.95),
+            "max_ms": round(self.max_s * 1000, 2)
+        }
+
+
+class Metrics:
+    def __init__(self, service: str = "mcp"):
+        self.service = service
+        self.started = time.time()
+        self.workers = 1  # processes merged into these values (see aggregate)
+        self._lock = threading.Lock()
+        self._stages: Dict[str, StageStats] = {}
+        self._counters: Dict[str, float] = {}
+        self._gauges: Dict[str, Callable[[], float]] = {}
+        self._ratios: Dict[str, tuple] = {}
+
+    # -----------------------------
+    # Recording
+    # -----------------------------
+    @contextmanager
+    def span(self, stage: str):
+        """Time the enclosed block as one observation of stage; works around awaits too"""
+        started = time.perf_counter()
+        error = False
+        try:
+            yield
+        except BaseException:
+            error = True
+            raise
+        finally:
+            self.observe(stage, time.perf_counter() - started, error)
+
+    def observe(self, stage: str, seconds: float, error: bool = False):
+        with self._lock:
+            stats = self._stages.get(stage)
+            if stats is None:
+                stats = self._stages[stage] = StageStats()
+            stats.observe(seconds, error)
+
+    def incr(self, counter: str, value: float = 1):
+        with self._lock:
+            self._counters[counter] = self._counters.get(counter, 0) + value
+
+    def gauge(self, name: str, read: Callable[[], float]):
+        """Register a value read at snapshot time (e.g. another component's cache counters)"""
+        with self._lock:
+            self._gauges[name] = read
+
+    def ratio(self, name: str, numerator: str, denominator: str):
+        """Report numerator / denominator (counters or gauges) as name"""
+        with self._lock:
+            self._ratios[name] = (numerator, denominator)
+
+    def reset(self):
+        with self._lock:
+            self._stages.clear()
+            self._counters.clear()
+            self.started = time.time()
+
+    # -----------------------------
+    # Several processes
+    # -----------------------------
+    def state(self) -> Dict:
+        """Stage and counter values that can be summed across processes (gauges stay local)"""
+        with self._lock:
+            return {"pid": os.getpid(), "started": self.started,
+                    "stages": {name: stats.state() for name, stats in self._stages.items()},
+                    "counters": dict(self._counters)}
+
+    def write_state(self, directory: str):
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{os.getpid()}.json")
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(self.state(), f)
+        os.replace(path + ".tmp", path)
+
+    def aggregate(self, directory: str) -> "Metrics":
+        """
+        This process's metrics merged with the states the other processes
+        wrote to directory. Gauges and ratios are this process's.
+        """
+        self.write_state(directory)
+        merged = Metrics(self.service)
+        with self._lock:
+            merged._gauges = dict(self._gauges)
+            merged._ratios = dict(self._ratios)
+        merged.workers = 0
+        for name in sorted(os.listdir(directory)):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(directory, name), "r", encoding="utf-8") as f:
+                    state = json.load(f)
+            except (OSError, ValueError):
+                continue
+            merged.workers += 1
+            merged.started = min(merged.started, state["started"])
+            for stage, stats in state["stages"].items():
+                merged._stages.setdefault(stage, StageStats()).merge(stats)
+            for counter, value in state["counters"].items():
+                merged._counters[counter] = merged._counters.get(counter, 0) + value
+        return merged
+
+    # -----------------------------
+    # Reporting
+    # -----------------------------
+    def _values(self) -> Dict[str, float]:
+        values = dict(self._counters)
+        for name, read in self._gauges.items():
+            try:
+                values[name] = float(read())
+            except Exception:
+                continue  # the component may not be loaded yet
+        return values
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            stages = {name: stats.summary() for name, stats in self._stages.items()}
+            values = self._values()
+            ratios = {}
+            for name, (numerator, denominator) in self._ratios.items():
+                total = values.get(denominator, 0)
+                ratios[name] = round(values.get(numerator, 0) / total, 4) if total else None
+        return {
+            "service": self.service,
+            "pid": os.getpid(),
+            "uptime_s": round(time.time() - self.started, 1),
+            "stages": stages,
+            "counters": values,
+            "rates": ratios
+        }
+
+    def prometheus_text(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)"""
+        prefix = _metric_name(self.service)
+        lines = [
+            f"# HELP {prefix}_stage_duration_seconds Time spent per pipeline stage.",
+            f"# TYPE {prefix}_stage_duration_seconds histogram"
+        ]
+        with self._lock:
+            for stage, stats in sorted(self._stages.items()):
+                label = f'stage="{_label(stage)}"'
+                cumulative = 0
+                for bound, count in zip(BUCKETS, stats.buckets):
+                    cumulative += count
+                    lines.append(f'{prefix}_stage_duration_seconds_bucket{{{label},le="{bound}"}} {cumulative}')
+                lines.append(f'{prefix}_stage_duration_seconds_bucket{{{label},le="+Inf"}} {stats.count}')
+                lines.append(f"{prefix}_stage_duration_seconds_sum{{{label}}} {stats.total_s:.6f}")
+                lines.append(f"{prefix}_stage_duration_seconds_count{{{label}}} {stats.count}")
+
+            lines.append(f"# TYPE {prefix}_stage_errors_total counter")
+            for stage, stats in sorted(self._stages.items()):
+                lines.append(f'{prefix}_stage_errors_total{{stage="{_label(stage)}"}} {stats.errors}')
+
+            counters = dict(self._counters)
+            gauges = {name: value for name, value in self._values().items() if name not in counters}
+
+        for name, value in sorted(counters.items()):
+            metric = f"{prefix}_{_metric_name(name)}_total"
+            lines += [f"# TYPE {metric} counter", f"{metric} {value:g}"]
+        for name, value in sorted(gauges.items()):
+            metric = f"{prefix}_{_metric_name(name)}"
+            lines += [f"# TYPE {metric} gauge", f"{metric} {value:g}"]
+        lines.append(f"{prefix}_uptime_seconds {time.time() - self.started:.1f}")
+        return "\n".join(lines) + "\n"
+
+
+def _metric_name(name: str) -> str:
+    return re.sub(r"[^a-zA-Z0-9_]", "_", name)
+
+
+def _label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"')
+
+
+# Process-wide registry; each server sets METRICS.service at startup
+METRICS = Metrics()
+
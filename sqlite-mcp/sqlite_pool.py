@@ -0,0 +1,577 @@
+"""
+SQLite connections for the MCP server.
+
+One writer connection stays open for the life of the process (WAL journal,
+so readers are never blocked by it) and serializes all writes. Reads go to
+a small pool of read-only connections (mode=ro, query_only), so a
+misclassified write fails instead of running outside the writer.
+
+Each connection keeps an LRU cache of prepared statements (sqlite3's
+cached_statements); a mirror of it counts hits and misses for stats().
+
+Statements are classified from their SQL rather than a "starts with
+SELECT" check: WITH ... SELECT and read-only PRAGMAs go to readers,
+WITH ... INSERT and PRAGMA x = y go to the writer.
+
+Query results are paged. A query whose rows don't fit in one page keeps
+its statement open on a reader connection as a server-side cursor, and
+the caller gets a token for the next page, so a large table is streamed
+at constant memory from one consistent snapshot. Each page also stops
+before MAX_RESULT_BYTES of JSON. Idle cursors are closed after
+CURSOR_TTL_SECONDS, and the oldest is closed beyond MAX_OPEN_CURSORS.
+"""
+
+import os
+import re
+import json
+import time
+import queue
+import base64
+import secrets
+import sqlite3
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence
+
+DB_PATH = os.getenv("SQLITE_MCP_DB", "mini_lms.db")
+READERS = int(os.getenv("SQLITE_MCP_READERS", "4"))
+STATEMENT_CACHE_SIZE = int(os.getenv("SQLITE_MCP_STATEMENT_CACHE", "128"))
+BUSY_TIMEOUT_MS = 5000
+
+PAGE_SIZE = int(os.getenv("SQLITE_MCP_PAGE_SIZE", "200"))
+MAX_PAGE_SIZE = 5000
+MAX_RESULT_BYTES = int(os.getenv("SQLITE_MCP_MAX_BYTES", str(512 * 1024)))
+CURSOR_TTL_SECONDS = 300
+MAX_OPEN_CURSORS = 8
+# Virtual machine steps (in thousands) a COUNT(*) may take before the row
+# count is estimated instead
+COUNT_BUDGET = 2000
+# Rows one execute_batch call may write
+MAX_BATCH_ROWS = 100000
+
+READ, WRITE, TRANSACTION = "read", "write", "transaction"
+
+READ_KEYWORDS = {"SELECT", "VALUES", "EXPLAIN"}
+WRITE_KEYWORDS = {"INSERT", "UPDATE", "DELETE", "REPLACE", "CREATE", "DROP", "ALTER", "VACUUM",
+                  "REINDEX", "ANALYZE", "ATTACH", "DETACH"}
+TRANSACTION_KEYWORDS = {"BEGIN", "COMMIT", "END", "ROLLBACK", "SAVEPOINT", "RELEASE"}
+# Statements that can't run inside BEGIN ... COMMIT
+NO_TRANSACTION_KEYWORDS = {"VACUUM", "ATTACH", "DETACH", "PRAGMA"}
+# PRAGMAs that change the database even without "= value"
+WRITE_PRAGMAS = {"optimize", "wal_checkpoint", "incremental_vacuum", "shrink_memory"}
+
+COMMENTS = re.compile(r"--[^\n]*|/\*.*?\*/", re.S)
+WORD = re.compile(r"[A-Za-z_]+")
+
+
+class StatementError(ValueError):
+    pass
+
+
+# ---------- Classification ----------
+def _skip_parens(sql: str, i: int) -> int:
+    """Index just past the parenthesised group starting at sql[i] == '('"""
+    depth, quote = 0, None
+    while i < len(sql):
+        ch = sql[i]
+        if quote:
+            if ch == quote:
+                quote = None
+        elif ch in "'\"`[":
+            quote = "]" if ch == "[" else ch
+        elif ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+            if depth == 0:
+                return i + 1
+        i += 1
+    raise StatementError("unbalanced parentheses")
+
+
+def _main_keyword_after_with(sql: str) -> str:
+    """The statement keyword after WITH [RECURSIVE] name [(cols)] AS [NOT] [MATERIALIZED] (...), ..."""
+    i = 0
+    while True:
+        match = WORD.search(sql, i)
+        if match is None:
+            raise StatementError("incomplete WITH clause")
+        word = match.group().upper()
+        i = match.end()
+        if word in READ_KEYWORDS or word in WRITE_KEYWORDS:
+            return word
+        # Jump over every parenthesised group: column lists and CTE bodies
+        next_paren = sql.find("(", i)
+        next_word = WORD.search(sql, i)
+        if next_paren >= 0 and (next_word is None or next_paren < next_word.start()):
+            i = _skip_parens(sql, next_paren)
+
+
+@lru_cache(maxsize=1024)
+def classify(sql: str) -> str:
+    """READ, WRITE or TRANSACTION for one SQL statement"""
+    text = COMMENTS.sub(" ", sql).strip()
+    match = WORD.match(text)
+    if match is None:
+        raise StatementError("empty or unrecognised SQL statement")
+    keyword = match.group().upper()
+
+    if keyword == "WITH":
+        keyword = _main_keyword_after_with(text[match.end():])
+    if keyword in READ_KEYWORDS:
+        # EXPLAIN only describes the statement; it never runs it
+        return READ
+    if keyword in TRANSACTION_KEYWORDS:
+        return TRANSACTION
+    if keyword == "PRAGMA":
+        name = WORD.search(text, match.end())
+        name = name.group().lower() if name else ""
+        if "=" in text or name in WRITE_PRAGMAS:
+            return WRITE
+        return READ
+    if keyword in WRITE_KEYWORDS:
+        return WRITE
+    raise StatementError(f"unsupported SQL statement: {keyword}")
+
+
+# ---------- Results ----------
+def _jsonable(value):
+    if isinstance(value, bytes):
+        return {"base64": base64.b64encode(value).decode()}
+    return value
+
+
+def _shrink(row: Dict, limit: int) -> Dict:
+    """A single row over the byte cap: long text and blob values are cut to share the limit and flagged"""
+    share = max(16, limit // max(1, len(row)) - 32)
+    shrunk = {}
+    for column, value in row.items():
+        if isinstance(value, str) and len(value) > share:
+            value = {"text": value[:share], "truncated": True}
+        elif isinstance(value, dict) and len(value.get("base64", "")) > share:
+            value = {"base64": value["base64"][:share], "truncated": True}
+        shrunk[column] = value
+    return shrunk
+
+
+class ResultCursor:
+    """An open query on a reader connection, read one page at a time"""
+
+    def __init__(self, token: str, conn: sqlite3.Connection, cursor: sqlite3.Cursor):
+        self.token = token
+        self.conn = conn
+        self.cursor = cursor
+        self.columns = [c[0] for c in cursor.description or []]
+        self.position = 0
+        self.last_used = time.monotonic()
+        self.lock = threading.Lock()
+        self._pending: List[Dict] = []
+        self.exhausted = False
+
+    def _next_row(self) -> Optional[Dict]:
+        if self._pending:
+            return self._pending.pop()
+        if self.exhausted:
+            return None
+        row = self.cursor.fetchone()
+        if row is None:
+            self.exhausted = True
+            return None
+        return {column: _jsonable(value) for column, value in zip(self.columns, row)}
+
+    @staticmethod
+    def _row_size(row: Dict) -> int:
+        return len(json.dumps(row, default=str, ensure_ascii=False).encode()) + 1
+
+    def page(self, page_size: int, max_bytes: int) -> Dict:
+        rows, size, capped = [], 2, False
+        while len(rows) < page_size:
+            row = self._next_row()
+            if row is None:
+                break
+            row_size = self._row_size(row)
+            if size + row_size > max_bytes:
+                if rows:
+                    self._pending.append(row)
+                else:
+                    row = _shrink(row, max_bytes)
+                    rows.append(row)
+                    size += self._row_size(row)
+                capped = True
+                break
+            rows.append(row)
+            size += row_size
+        # Look one row ahead so the last page says there is no next one
+        upcoming = self._next_row()
+        if upcoming is not None:
+            self._pending.append(upcoming)
+        offset = self.position
+        self.position += len(rows)
+        self.last_used = time.monotonic()
+        return {"columns": self.columns, "rows": rows, "count": len(rows), "offset": offset,
+                "bytes": size, "capped_by_bytes": capped, "done": upcoming is None}
+
+
+# ---------- Connections ----------
+class StatementCacheStats:
+    """Mirror of one connection's LRU statement cache, keyed like sqlite3's (by SQL text)"""
+
+    def __init__(self, size: int):
+        self.size = size
+        self._keys = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def record(self, sql: str):
+        if sql in self._keys:
+            self._keys.move_to_end(sql)
+            self.hits += 1
+            return
+        self.misses += 1
+        self._keys[sql] = None
+        if len(self._keys) > self.size:
+            self._keys.popitem(last=False)
+
+
+class SQLitePool:
+    def __init__(self, path=DB_PATH, readers=READERS, statement_cache_size=STATEMENT_CACHE_SIZE):
+        self.path = os.path.abspath(path)
+        self.statement_cache_size = statement_cache_size
+        self._writer = self._open(writer=True)
+        self._writer_stats = StatementCacheStats(statement_cache_size)
+        self._write_lock = threading.Lock()
+        self._readers = queue.LifoQueue()
+        self._reader_stats: Dict[int, StatementCacheStats] = {}
+        self._stats_lock = threading.Lock()
+        self.reader_count = max(1, readers)
+        # Open cursors hold a reader each, so up to MAX_OPEN_CURSORS more
+        # connections are opened on demand
+        self._reader_limit = self.reader_count + MAX_OPEN_CURSORS
+        self._readers_open = 0
+        for _ in range(self.reader_count):
+            self._readers.put(self._new_reader())
+        self._cursors: "OrderedDict[str, ResultCursor]" = OrderedDict()
+        self._cursors_lock = threading.Lock()
+        self.reads = 0
+        self.writes = 0
+
+    def _open(self, writer: bool) -> sqlite3.Connection:
+        if writer:
+            conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False,
+                                   cached_statements=self.statement_cache_size)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+        else:
+            conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, isolation_level=None,
+                                   check_same_thread=False, cached_statements=self.statement_cache_size)
+            conn.execute("PRAGMA query_only=ON")
+        conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _new_reader(self) -> sqlite3.Connection:
+        conn = self._open(writer=False)
+        with self._stats_lock:
+            self._reader_stats[id(conn)] = StatementCacheStats(self.statement_cache_size)
+            self._readers_open += 1
+        return conn
+
+    def _acquire_reader(self) -> sqlite3.Connection:
+        try:
+            return self._readers.get_nowait()
+        except queue.Empty:
+            pass
+        with self._stats_lock:
+            can_open = self._readers_open < self._reader_limit
+        return self._new_reader() if can_open else self._readers.get()
+
+    def _release_reader(self, conn: sqlite3.Connection):
+        if conn.in_transaction:
+            conn.rollback()
+        self._readers.put(conn)
+
+    @contextmanager
+    def reader(self):
+        conn = self._acquire_reader()
+        try:
+            yield conn
+        finally:
+            self._release_reader(conn)
+
+    @contextmanager
+    def writer(self):
+        """The writer connection inside BEGIN IMMEDIATE ... COMMIT (ROLLBACK on error)"""
+        with self._write_lock:
+            self._writer.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._writer
+            except BaseException:
+                self._writer.execute("ROLLBACK")
+                raise
+            self._writer.execute("COMMIT")
+
+    # -----------------------------
+    # Statements
+    # -----------------------------
+    @staticmethod
+    def _rows(cursor) -> Dict:
+        columns = [c[0] for c in cursor.description or []]
+        rows = [{c: _jsonable(v) for c, v in zip(columns, row)} for row in cursor.fetchall()]
+        return {"columns": columns, "rows": rows, "count": len(rows)}
+
+    def _record(self, conn, sql: str):
+        stats = self._writer_stats if conn is self._writer else self._reader_stats[id(conn)]
+        with self._stats_lock:
+            stats.record(sql)
+
+    def query(self, sql: str, params: Sequence = (), page_size: Optional[int] = None,
+              max_bytes: Optional[int] = None) -> Dict:
+        """
+        First page of a read-only query. If more rows follow, the result has
+        a next_cursor token for fetch_page() and an estimated row_count.
+        """
+        if classify(sql) != READ:
+            raise StatementError("not a read-only statement; use update_database")
+        page_size = min(max(1, page_size or PAGE_SIZE), MAX_PAGE_SIZE)
+        max_bytes = max(1024, min(max_bytes or MAX_RESULT_BYTES, MAX_RESULT_BYTES))
+
+        conn = self._acquire_reader()
+        try:
+            self._record(conn, sql)
+            result = ResultCursor(secrets.token_urlsafe(12), conn, conn.execute(sql, params))
+            page = result.page(page_size, max_bytes)
+        except BaseException:
+            self._release_reader(conn)
+            raise
+        self.reads += 1
+
+        if page.pop("done"):
+            result.cursor.close()
+            self._release_reader(conn)
+            return {"type": "query", **page, "next_cursor": None,
+                    "row_count": {"value": page["count"], "exact": True}}
+        self._register(result)
+        return {"type": "query", **page, "next_cursor": result.token,
+                "row_count": self.estimate_rows(sql, params)}
+
+    def fetch_page(self, token: str, page_size: Optional[int] = None, max_bytes: Optional[int] = None) -> Dict:
+        """Next page of an open cursor; the cursor is closed after its last page"""
+        page_size = min(max(1, page_size or PAGE_SIZE), MAX_PAGE_SIZE)
+        max_bytes = max(1024, min(max_bytes or MAX_RESULT_BYTES, MAX_RESULT_BYTES))
+        self._expire_cursors()
+        with self._cursors_lock:
+            result = self._cursors.get(token)
+            if result is not None:
+                self._cursors.move_to_end(token)
+        if result is None:
+            raise StatementError("unknown or expired cursor; run the query again")
+        with result.lock:
+            page = result.page(page_size, max_bytes)
+        if page.pop("done"):
+            self.close_cursor(token)
+            return {"type": "query", **page, "next_cursor": None}
+        return {"type": "query", **page, "next_cursor": token}
+
+    def close_cursor(self, token: str) -> bool:
+        with self._cursors_lock:
+            result = self._cursors.pop(token, None)
+        if result is None:
+            return False
+        with result.lock:
+            result.cursor.close()
+            self._release_reader(result.conn)
+        return True
+
+    def _register(self, result: ResultCursor):
+        self._expire_cursors()
+        with self._cursors_lock:
+            self._cursors[result.token] = result
+            oldest = next(iter(self._cursors)) if len(self._cursors) > MAX_OPEN_CURSORS else None
+        if oldest is not None:
+            self.close_cursor(oldest)
+
+    def _expire_cursors(self):
+        now = time.monotonic()
+        with self._cursors_lock:
+            stale = [t for t, c in self._cursors.items() if now - c.last_used > CURSOR_TTL_SECONDS]
+        for token in stale:
+            self.close_cursor(token)
+
+    def estimate_rows(self, sql: str, params: Sequence = ()) -> Optional[Dict]:
+        """
+        COUNT(*) of the query if it finishes within COUNT_BUDGET; otherwise
+        the largest rowid of the first table it reads from, as an estimate
+        """
+        steps = [0]
+
+        def budget():
+            steps[0] += 1
+            return steps[0] > COUNT_BUDGET
+
+        with self.reader() as conn:
+            conn.set_progress_handler(budget, 1000)
+            try:
+                inner = COMMENTS.sub(" ", sql).strip().rstrip(";")
+                count = conn.execute(f"SELECT COUNT(*) FROM ({inner})", params).fetchone()[0]
+                return {"value": count, "exact": True}
+            except sqlite3.OperationalError:
+                pass
+            finally:
+                conn.set_progress_handler(None, 0)
+
+            table = re.search(r"\bFROM\s+[\"`\[]?(\w+)", COMMENTS.sub(" ", sql), re.I)
+            if table is None:
+                return None
+            try:
+                estimate = conn.execute(f'SELECT MAX(rowid) FROM "{table.group(1)}"').fetchone()[0]
+            except sqlite3.Error:
+                return None
+            return {"value": estimate, "exact": False} if estimate is not None else None
+
+    def update(self, sql: str, params: Sequence = ()) -> Dict:
+        kind = classify(sql)
+        if kind == READ:
+            return self.query(sql, params)
+        if kind == TRANSACTION:
+            raise StatementError("transaction control is managed by the server; each call is one transaction")
+
+        keyword = WORD.match(COMMENTS.sub(" ", sql).strip()).group().upper()
+        if keyword in NO_TRANSACTION_KEYWORDS:
+            with self._write_lock:
+                self._record(self._writer, sql)
+                cursor = self._writer.execute(sql, params)
+                returned = self._rows(cursor) if cursor.description else None
+        else:
+            with self.writer() as conn:
+                self._record(conn, sql)
+                cursor = conn.execute(sql, params)
+                # INSERT ... RETURNING
+                returned = self._rows(cursor) if cursor.description else None
+        self.writes += 1
+        result = {"type": "update", "changes": cursor.rowcount if cursor.rowcount >= 0 else 0,
+                  "lastID": cursor.lastrowid}
+        if returned is not None:
+            result.update(returned)
+        return result
+
+    def execute_batch(self, statements: Optional[List[Dict]] = None, sql: Optional[str] = None,
+                      param_rows: Optional[List[Sequence]] = None) -> Dict:
+        """
+        Many writes in one transaction: either sql run once per row of
+        param_rows, or a list of {"sql", "params"} statements. Consecutive
+        statements with the same SQL share one prepared statement
+        (executemany). All or nothing: any error rolls back the whole batch
+        and names the row/statement that failed. An empty batch does nothing.
+        """
+        if sql:
+            # No param_rows: run sql once without parameters (e.g. DDL)
+            runs = [(sql, [[]] if param_rows is None else list(param_rows))]
+            unit = "row"
+        else:
+            runs = []
+            for statement in statements or []:
+                params = statement.get("params") or []
+                if runs and runs[-1][0] == statement["sql"]:
+                    runs[-1][1].append(params)
+                else:
+                    runs.append((statement["sql"], [params]))
+            unit = "statement"
+        total_rows = sum(len(rows) for _, rows in runs)
+        if total_rows > MAX_BATCH_ROWS:
+            raise StatementError(f"batch of {total_rows} rows exceeds the limit of {MAX_BATCH_ROWS}")
+        for run_sql, _ in runs:
+            keyword = WORD.match(COMMENTS.sub(" ", run_sql).strip())
+            if classify(run_sql) != WRITE or keyword.group().upper() in NO_TRANSACTION_KEYWORDS:
+                raise StatementError(f"only INSERT/UPDATE/DELETE/DDL statements can be batched: {run_sql[:80]}")
+        runs = [(run_sql, rows) for run_sql, rows in runs if rows]
+        if not runs:
+            return {"type": "batch", "statements": 0, "prepared_statements": 0, "changes": 0, "lastID": None,
+                    "elapsed_ms": 0.0, "runs": []}
+
+        results, index = [], 0
+        started = time.perf_counter()
+        with self.writer() as conn:
+            for run_sql, rows in runs:
+                self._record(conn, run_sql)
+                conn.execute("SAVEPOINT batch_run")
+                try:
+                    cursor = conn.executemany(run_sql, rows)
+                except sqlite3.Error as e:
+                    failed = index + self._failing_row(conn, run_sql, rows)
+                    raise sqlite3.Error(f"{unit} {failed} ({run_sql[:80]}): {e}") from e
+                conn.execute("RELEASE batch_run")
+                results.append({"sql": run_sql, "rows": len(rows), "changes": max(cursor.rowcount, 0)})
+                index += len(rows)
+            last_id = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+        self.writes += 1
+        return {
+            "type": "batch",
+            "statements": total_rows,
+            "prepared_statements": len(runs),
+            "changes": sum(r["changes"] for r in results),
+            "lastID": last_id,
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 2),
+            "runs": results
+        }
+
+    @staticmethod
+    def _failing_row(conn, sql: str, rows: List[Sequence]) -> int:
+        """
+        Index of the row executemany() failed on: the run is undone and
+        replayed row by row (only on the error path; the batch is rolled
+        back afterwards anyway)
+        """
+        conn.execute("ROLLBACK TO batch_run")
+        for i, row in enumerate(rows):
+            try:
+                conn.execute(sql, row)
+            except sqlite3.Error:
+                return i
+        return 0
+
+    def execute(self, sql: str, params: Sequence = ()) -> Dict:
+        """query() or update(), by classification"""
+        return self.query(sql, params) if classify(sql) == READ else self.update(sql, params)
+
+    # -----------------------------
+    # Introspection
+    # -----------------------------
+    def _query_all(self, sql: str, params: Sequence = ()) -> List[Dict]:
+        with self.reader() as conn:
+            self._record(conn, sql)
+            return self._rows(conn.execute(sql, params))["rows"]
+
+    def list_tables(self) -> List[str]:
+        return [row["name"] for row in self._query_all("SELECT name FROM sqlite_master WHERE type='table' ORDER BY name")]
+
+    def table_schema(self, table: str) -> Optional[List[Dict]]:
+        return self._query_all("SELECT * FROM pragma_table_info(?)", (table,)) or None
+
+    def stats(self) -> Dict:
+        with self._stats_lock:
+            caches = [self._writer_stats, *self._reader_stats.values()]
+            hits, misses = sum(c.hits for c in caches), sum(c.misses for c in caches)
+        with self._write_lock:
+            journal_mode = self._writer.execute("PRAGMA journal_mode").fetchone()[0]
+        return {
+            "path": self.path,
+            "journal_mode": journal_mode,
+            "readers": self.reader_count,
+            "reader_connections": self._readers_open,
+            "open_cursors": len(self._cursors),
+            "reads": self.reads,
+            "writes": self.writes,
+            "statement_cache": {"size": self.statement_cache_size, "hits": hits, "misses": misses,
+                                "hit_rate": round(hits / (hits + misses), 3) if hits + misses else None},
+            "classification_cache": classify.cache_info()._asdict()
+        }
+
+    def close(self):
+        for token in list(self._cursors):
+            self.close_cursor(token)
+        self._writer.close()
+        while not self._readers.empty():
+            self._readers.get().close()
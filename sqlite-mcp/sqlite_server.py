@@ -0,0 +1,119 @@
+# sqlite_server.py
+import sys
+import sqlite3
+import logging
+from typing import Dict, List, Optional
+from mcp.server.fastmcp import FastMCP
+from sqlite_pool import DB_PATH, SQLitePool, StatementError
+
+# IMPORTANT: MCP servers must not print to STDOUT.
+logging.basicConfig(stream=sys.stderr, level=logging.INFO)
+
+mcp = FastMCP("sqlite-mcp")
+
+# Opened once: the writer, the readers and their statement caches are
+# shared by every call (SQLITE_MCP_DB selects the database file)
+pool: Optional[SQLitePool] = None
+
+
+def get_pool() -> SQLitePool:
+    global pool
+    if pool is None:
+        pool = SQLitePool(DB_PATH)
+        logging.info(f"SQLite MCP server using {pool.path}")
+    return pool
+
+
+def _error(e: Exception) -> dict:
+    return {"ok": False, "error": f"❌ {e}"}
+
+
+@mcp.tool()
+def query_database(sql: str = "", params: Optional[List] = None, page_size: int = 0, cursor: str = "",
+                   max_bytes: int = 0) -> dict:
+    """
+    Execute a read-only SQL query (SELECT, WITH ... SELECT, read-only PRAGMA) to fetch data.
+    Results come in pages of page_size rows (default 200) and at most max_bytes of JSON;
+    pass the returned next_cursor as cursor (without sql) to get the next page.
+    A single row over max_bytes comes back with its long values cut to
+    {"text" or "base64": ..., "truncated": true}.
+    """
+    try:
+        if cursor:
+            return {"ok": True, **get_pool().fetch_page(cursor, page_size or None, max_bytes or None)}
+        if not sql:
+            return {"ok": False, "error": "❌ Missing SQL query"}
+        return {"ok": True, **get_pool().query(sql, params or [], page_size or None, max_bytes or None)}
+    except (StatementError, sqlite3.Error) as e:
+        return _error(e)
+
+
+@mcp.tool()
+def close_cursor(cursor: str) -> dict:
+    """
+    Release a query cursor before reading all of its pages.
+    """
+    return {"ok": get_pool().close_cursor(cursor)}
+
+
+@mcp.tool()
+def update_database(sql: str, params: Optional[List] = None) -> dict:
+    """
+    Execute a SQL insert/update/delete (or DDL) statement in its own transaction.
+    """
+    try:
+        return {"ok": True, **get_pool().update(sql, params or [])}
+    except (StatementError, sqlite3.Error) as e:
+        return _error(e)
+
+
+@mcp.tool()
+def execute_batch(statements: Optional[List[Dict]] = None, sql: str = "",
+                  param_rows: Optional[List[List]] = None) -> dict:
+    """
+    Run many writes in a single transaction: either sql with one params list per row in
+    param_rows (one prepared statement), or statements as [{"sql": ..., "params": [...]}].
+    Returns the total changes; any error rolls back the whole batch.
+    """
+    try:
+        return {"ok": True, **get_pool().execute_batch(statements, sql or None, param_rows)}
+    except (StatementError, sqlite3.Error, KeyError) as e:
+        return _error(e)
+
+
+@mcp.tool()
+def get_table_schema(table_name: str) -> dict:
+    """
+    Get the columns of a specific table.
+    """
+    try:
+        columns = get_pool().table_schema(table_name)
+    except sqlite3.Error as e:
+        return _error(e)
+    if columns is None:
+        return {"ok": False, "error": f"❌ No such table: {table_name}"}
+    return {"ok": True, "table": table_name, "columns": columns}
+
+
+@mcp.tool()
+def list_tables() -> dict:
+    """
+    List all tables in the database.
+    """
+    try:
+        return {"ok": True, "tables": get_pool().list_tables()}
+    except sqlite3.Error as e:
+        return _error(e)
+
+
+@mcp.tool()
+def db_stats() -> dict:
+    """
+    Connection pool and prepared-statement cache statistics.
+    """
+    return {"ok": True, **get_pool().stats()}
+
+
+if __name__ == "__main__":
+    # Run over stdio so Claude Desktop can talk to it
+    mcp.run(transport="stdio")
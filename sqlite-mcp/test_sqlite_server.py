@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Tests for sqlite_server.py against a throwaway database per test:
+    python -m pytest sqlite-mcp/test_sqlite_server.py
+"""
+import pytest
+
+import sqlite_server
+from sqlite_pool import READ, TRANSACTION, WRITE, SQLitePool, classify
+
+
+@pytest.fixture
+def server(tmp_path):
+    sqlite_server.pool = SQLitePool(str(tmp_path / "test_lms.db"))
+    yield sqlite_server
+    sqlite_server.pool.close()
+    sqlite_server.pool = None
+
+
+@pytest.fixture
+def students(server):
+    server.update_database("CREATE TABLE students (id INTEGER PRIMARY KEY, name TEXT NOT NULL)")
+    server.update_database("INSERT INTO students (name) VALUES (?)", ["Ali"])
+    return server
+
+
+@pytest.mark.parametrize("sql, expected", [
+    ("SELECT * FROM students", READ),
+    ("  -- comment\n select 1", READ),
+    ("WITH t AS (SELECT 1 AS x) SELECT * FROM t", READ),
+    ("WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < 5) SELECT i FROM n", READ),
+    ("WITH old AS (SELECT id FROM students WHERE id < 2) DELETE FROM students WHERE id IN old", WRITE),
+    ("PRAGMA table_info(students)", READ),
+    ("PRAGMA journal_mode", READ),
+    ("PRAGMA user_version = 3", WRITE),
+    ("PRAGMA optimize", WRITE),
+    ("EXPLAIN QUERY PLAN SELECT * FROM students", READ),
+    ("INSERT INTO students (name) VALUES ('x')", WRITE),
+    ("/* c */ UPDATE students SET name = 'y'", WRITE),
+    ("BEGIN", TRANSACTION),
+])
+def test_classify(sql, expected):
+    assert classify(sql) == expected
+
+
+def test_schema_tools(students):
+    assert students.list_tables()["tables"] == ["students"]
+    assert [c["name"] for c in students.get_table_schema("students")["columns"]] == ["id", "name"]
+    assert not students.get_table_schema("nope")["ok"]
+
+
+def test_reads_and_writes(students):
+    rows = students.query_database("WITH t AS (SELECT * FROM students) SELECT name FROM t WHERE id = ?", [1])
+    assert rows["ok"] and rows["rows"] == [{"name": "Ali"}]
+    assert not students.query_database("DELETE FROM students")["ok"]
+    assert not students.update_database("BEGIN")["ok"]
+    returning = students.update_database("INSERT INTO students (name) VALUES ('Sara') RETURNING id")
+    assert returning["rows"] == [{"id": 2}]
+
+
+def test_pool_stats(students):
+    for _ in range(3):
+        students.query_database("SELECT COUNT(*) AS n FROM students")
+    stats = students.db_stats()
+    assert stats["journal_mode"] == "wal"
+    assert stats["statement_cache"]["hits"] >= 2
+
+
+@pytest.fixture
+def attendance(server):
+    server.update_database("CREATE TABLE attendance (id INTEGER PRIMARY KEY, student TEXT, note TEXT)")
+    server.execute_batch(sql="INSERT INTO attendance (student, note) VALUES (?, ?)",
+                         param_rows=[[f"s{i}", "x" * 100] for i in range(1050)])
+    return server
+
+
+def test_pagination(attendance):
+    page = attendance.query_database("SELECT * FROM attendance ORDER BY id", page_size=400)
+    assert page["count"] == 400 and page["next_cursor"]
+    assert page["row_count"] == {"value": 1050, "exact": True}
+    seen = page["count"]
+    while page["next_cursor"]:
+        page = attendance.query_database(cursor=page["next_cursor"], page_size=400)
+        seen += page["count"]
+    assert seen == 1050 and page["rows"][-1]["student"] == "s1049"
+
+
+def test_byte_cap_and_cursor_release(attendance):
+    capped = attendance.query_database("SELECT * FROM attendance", max_bytes=4096)
+    assert capped["capped_by_bytes"] and capped["bytes"] <= 4096
+    assert attendance.close_cursor(capped["next_cursor"])["ok"]
+    assert not attendance.query_database(cursor=capped["next_cursor"])["ok"]
+    small = attendance.query_database("SELECT COUNT(*) AS n FROM attendance")
+    assert small["next_cursor"] is None and small["rows"] == [{"n": 1050}]
+
+
+def test_oversized_row_is_flagged(server):
+    server.update_database("CREATE TABLE notes (id INTEGER PRIMARY KEY, body TEXT, data BLOB)")
+    server.update_database("INSERT INTO notes (body, data) VALUES (?, ?)", ["y" * 5000, "z" * 5000])
+    server.update_database("UPDATE notes SET data = CAST(data AS BLOB)")
+    page = server.query_database("SELECT * FROM notes", max_bytes=1024)
+    row = page["rows"][0]
+    assert row["id"] == 1 and row["body"]["truncated"] and row["data"]["truncated"]
+    assert 2 < page["bytes"] <= 1024 and page["capped_by_bytes"]
+
+
+@pytest.fixture
+def grades(server):
+    server.update_database("CREATE TABLE grades (student TEXT, course TEXT, grade TEXT, UNIQUE(student, course))")
+    return server
+
+
+def test_batch_param_rows(grades):
+    batch = grades.execute_batch(sql="INSERT INTO grades VALUES (?, ?, ?)",
+                                 param_rows=[[f"s{i}", "CS101", "A"] for i in range(500)])
+    assert batch["ok"] and batch["changes"] == 500 and batch["prepared_statements"] == 1
+    assert batch["lastID"] == 500
+
+
+def test_empty_batch_does_nothing(grades):
+    empty = grades.execute_batch(sql="INSERT INTO grades VALUES (?, ?, ?)", param_rows=[])
+    assert empty["ok"] and empty["changes"] == 0 and empty["statements"] == 0
+
+
+def test_batch_statement_list(grades):
+    grades.execute_batch(sql="INSERT INTO grades VALUES (?, ?, ?)", param_rows=[["s1", "CS101", "A"],
+                                                                              ["s2", "CS101", "A"],
+                                                                              ["s3", "CS101", "A"]])
+    mixed = grades.execute_batch(statements=[
+        {"sql": "UPDATE grades SET grade = ? WHERE student = ?", "params": ["B", "s1"]},
+        {"sql": "UPDATE grades SET grade = ? WHERE student = ?", "params": ["C", "s2"]},
+        {"sql": "DELETE FROM grades WHERE student = ?", "params": ["s3"]},
+    ])
+    assert mixed["ok"] and mixed["changes"] == 3 and mixed["prepared_statements"] == 2
+
+
+def test_batch_rolls_back(grades):
+    grades.update_database("INSERT INTO grades VALUES ('s0', 'CS101', 'A')")
+    failed = grades.execute_batch(sql="INSERT INTO grades VALUES (?, ?, ?)",
+                                  param_rows=[["new", "CS101", "A"], ["s0", "CS101", "A"]])
+    assert not failed["ok"] and failed["error"].startswith("❌ row 1 ")
+    count = grades.query_database("SELECT COUNT(*) AS n FROM grades WHERE student = 'new'")["rows"][0]["n"]
+    assert count == 0
+
+
+def test_batch_names_the_failing_statement(grades):
+    failed = grades.execute_batch(statements=[
+        {"sql": "INSERT INTO grades VALUES (?, ?, ?)", "params": ["a", "CS101", "A"]},
+        {"sql": "INSERT INTO grades VALUES (?, ?, ?)", "params": ["b", "CS101", "A"]},
+        {"sql": "INSERT INTO grades VALUES (?, ?, ?)", "params": ["a", "CS101", "B"]},
+    ])
+    assert failed["error"].startswith("❌ statement 2 ")
+
+
+def test_batch_refuses_reads(grades):
+    assert not grades.execute_batch(sql="SELECT 1", param_rows=[[]])["ok"]